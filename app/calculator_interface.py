@@ -1,25 +1,123 @@
 # Wraps the existing calculator so the rest of the system doesn’t care about internals.
 
+import math
+import time
+from decimal import Decimal, InvalidOperation
+
 try:
     from calculator import Calculator  # your existing class
 except Exception:
     Calculator = None
 
+from app import metrics
+from app.sessions import SessionManager
+
+# Shared calculator used when no session id is given.
 calculator = Calculator() if Calculator is not None else None
 
+# One calculator per conversation, created on first use.
+sessions = SessionManager(Calculator) if Calculator is not None else None
 
-def call_tool(name, args):
-    if calculator is None:
-        raise RuntimeError("Calculator backend not available")
-    if name == "add":
-        # Expect a single argument named "number". Callers should invoke add
-        # multiple times for multiple numbers rather than passing lists.
-        if "number" not in args:
-            raise ValueError("Missing required argument: 'number'")
-        calculator.add(args["number"])
-    elif name == "get_total":
-        return calculator.get_total()
-    elif name == "clear_all":
-        calculator.clear_all()
+_NUMBER_TYPES = (int, float, str, Decimal)  # exact types; bool is rejected
+
+
+def _number_argument(args):
+    # Expect a single argument named "number". Callers should invoke the tool
+    # multiple times for multiple numbers rather than passing lists.
+    try:
+        number = args["number"]
+    except (KeyError, TypeError):
+        raise ValueError("Missing required argument: 'number'") from None
+    cls = type(number)
+    if cls is int:
+        return (number,)
+    if cls not in _NUMBER_TYPES:
+        raise ValueError(f"Invalid 'number' argument: {number!r}")
+    # NaN and Infinity parse (JSON, Decimal("nan")) but are not numbers to add
+    if cls is float:
+        finite = math.isfinite(number)
     else:
+        try:
+            finite = Decimal(number).is_finite()
+        except InvalidOperation:
+            finite = False
+    if not finite:
+        raise ValueError(f"Invalid 'number' argument: {number!r}")
+    return (number,)
+
+
+def _no_arguments(args):
+    if not isinstance(args, dict):
+        raise ValueError(f"Invalid arguments: {args!r}")
+    return ()
+
+
+# Tool registry: name -> validator turning the JSON arguments into the
+# positional operands of the Calculator method of the same name.
+TOOLS = {
+    "add": _number_argument,
+    "subtract": _number_argument,
+    "multiply": _number_argument,
+    "divide": _number_argument,
+    "percent": _number_argument,
+    "percent_add": _number_argument,
+    "percent_substract": _number_argument,
+    "get_total": _no_arguments,
+    "clear": _no_arguments,
+    "clear_all": _no_arguments,
+}
+
+
+def validate_call(name, args):
+    """Return the Calculator operands for a tool call or raise ValueError."""
+    validate = TOOLS.get(name)
+    if validate is None:
         raise ValueError(f"Unknown tool: {name}")
+    return validate(args)
+
+
+def call_tool(name, args, session_id=None):
+    """Apply one tool call. Returns the total for get_total, otherwise None."""
+    if calculator is None:
+        raise RuntimeError("Calculator backend not available")
+    operands = validate_call(name, args)
+    start = time.perf_counter() if metrics.enabled else None
+    try:
+        if session_id is None:
+            result = getattr(calculator, name)(*operands)
+        else:
+            with sessions.session(session_id) as calc:
+                result = getattr(calc, name)(*operands)
+    except InvalidOperation:
+        raise ValueError(f"Number out of range: {operands[0]!r}") from None
+    if start is not None:
+        metrics.observe("call_tool", time.perf_counter() - start)
+    return result if name == "get_total" else None
+
+
+def call_tools(calls, session_id=None):
+    """Apply a whole list of tool calls as one Calculator.run program.
+
+    Every call is validated before any is applied, and the program commits
+    atomically: an unknown tool, a missing argument or an overflow anywhere
+    leaves the total unchanged. Returns what call_tool would have returned
+    for the last call (the total for get_total, otherwise None).
+    """
+    if calculator is None:
+        raise RuntimeError("Calculator backend not available")
+    program = [(call["name"],) + validate_call(call["name"], call.get("arguments", {}))
+               for call in calls]
+    start = time.perf_counter() if metrics.enabled else None
+    try:
+        if session_id is None:
+            total = calculator.run(program)
+        else:
+            with sessions.session(session_id) as calc:
+                total = calc.run(program)
+    except InvalidOperation:  # a finite number the calculator cannot represent, e.g. 1e999999
+        raise ValueError("Number out of range") from None
+    if start is not None:
+        metrics.observe("call_tool", time.perf_counter() - start)
+    if program and program[-1][0] == "get_total":
+        return total
+    return None
@@ -1,26 +1,120 @@
 # Takes model output JSON → calls calculator methods.
 
 import json
-from app.calculator_interface import call_tool
+import time
+from app import metrics
+from app.calculator_interface import call_tool, call_tools
 
 
-def dispatch(model_output: str):
+def _calls_from_payload(payload):
+    """Normalize a decoded model output to a list of call objects."""
+    if isinstance(payload, dict):
+        return payload.get("tool_calls") or ([payload] if "name" in payload else [])
+    if isinstance(payload, list):
+        return payload
+    raise ValueError("Unsupported model output")
+
+
+def dispatch(model_output: str, session_id=None):
     """
+    Applies the calls to the calculator of ``session_id`` (the shared one
+    when None).
+
     Accepts:
       - single call: {"name":"add","arguments":{"number":27}}
       - dict with tool_calls: {"tool_calls":[{...}, {...}]}
       - a JSON array: [{...}, {...}]
     """
-    payload = json.loads(model_output)
-    # Normalize to a list of calls
-    if isinstance(payload, dict):
-        calls = payload.get("tool_calls") or ([payload] if "name" in payload else [])
-    elif isinstance(payload, list):
-        calls = payload
-    else:
-        raise ValueError("Unsupported model output")
-    results = []
-    for call in calls:
-        results.append(call_tool(call["name"], call.get("arguments", {})))
-    # return the most recent (useful for get_total-like calls)
-    return results[-1] if results else None
+    start = time.perf_counter() if metrics.enabled else None
+    calls = _calls_from_payload(json.loads(model_output))
+    if start is not None:
+        metrics.observe("dispatch", time.perf_counter() - start)
+    # the calls run as a single atomic program; the result is that of the
+    # most recent call (useful for get_total-like calls)
+    return call_tools(calls, session_id)
+
+
+class StreamDispatcher:
+    """Dispatch tool calls from model output as it is being generated.
+
+    feed() takes text chunks in any split (mid-string, mid-number) and
+    applies each {"name": ..., "arguments": ...} object as soon as its
+    closing brace arrives, so calculation overlaps with decoding. Calls are
+    applied one at a time with call_tool, not as one atomic program.
+
+    Text outside objects is skipped. A closed object that is not valid JSON
+    or fails validation is recorded in ``errors`` and scanning continues, so
+    a malformed tail never discards the calls already applied. Feed only the
+    generated text: a prompt echo containing example calls would be applied
+    too.
+    """
+
+    def __init__(self, session_id=None):
+        self.session_id = session_id
+        self.results = []  # one entry per applied call
+        self.errors = []   # (source text, exception) for rejected objects
+        self._buffer = ""
+        self._pos = 0         # next unscanned index in _buffer
+        self._starts = []     # _buffer index of each open '{'
+        self._in_string = False
+        self._escape = False
+
+    def feed(self, chunk: str):
+        """Scan a chunk and apply every call object it completes.
+
+        Returns the results of the calls applied during this chunk.
+        """
+        self._buffer += chunk
+        applied = []
+        buffer, starts = self._buffer, self._starts
+        in_string, escape = self._in_string, self._escape
+        for i in range(self._pos, len(buffer)):
+            ch = buffer[i]
+            if in_string:
+                if escape:
+                    escape = False
+                elif ch == "\\":
+                    escape = True
+                elif ch == '"':
+                    in_string = False
+            elif ch == '"':
+                in_string = bool(starts)
+            elif ch == "{":
+                starts.append(i)
+            elif ch == "}" and starts:
+                self._close_object(buffer[starts.pop():i + 1], applied)
+        self._in_string, self._escape = in_string, escape
+        if starts:
+            self._pos = len(buffer)
+        else:
+            # nothing open: drop the consumed text so the buffer stays small
+            self._buffer, self._pos = "", 0
+        return applied
+
+    def close(self):
+        """Finish the stream; returns the most recent result, like dispatch().
+
+        An unterminated object left at the end is recorded in ``errors``.
+        """
+        if self._starts:
+            tail = self._buffer[self._starts[0]:]
+            self.errors.append((tail, ValueError("Unterminated JSON object")))
+            self._starts.clear()
+        self._buffer, self._pos = "", 0
+        return self.results[-1] if self.results else None
+
+    def _close_object(self, text, applied):
+        # only objects with a "name" are calls; argument objects and the
+        # enclosing {"tool_calls": [...]} wrapper close without effect
+        if '"name"' not in text:
+            return
+        try:
+            call = json.loads(text)
+            if not isinstance(call, dict) or "name" not in call:
+                return
+            result = call_tool(call["name"], call.get("arguments", {}), self.session_id)
+        except (ValueError, TypeError) as exc:
+            self.errors.append((text, exc))
+            return
+        self.results.append(result)
+        applied.append(result)
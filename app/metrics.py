@@ -0,0 +1,216 @@
+# Per-stage latency histograms for the utterance pipeline.
+#
+#   from app import metrics
+#   metrics.enable()
+#   with metrics.stage("dispatch"):
+#       ...
+#   metrics.count("tokens_generated", 12)
+#   metrics.snapshot()                    # {"stages": {...}, "counters": {...}}
+#   metrics.export_prometheus("metrics.prom")
+#   metrics.export_jsonl("metrics.jsonl")
+#   stop = metrics.export_every(10, prom="metrics.prom")   # background writer
+#
+# Instrumentation is off unless enable() is called (or CALC_METRICS=1 is set).
+# While off, stage() hands back one shared do-nothing context manager and
+# count() returns immediately: no clock reads, no allocation, no locking.
+# Even a do-nothing ``with`` costs a few hundred nanoseconds, which matters
+# next to a microsecond-scale calculator call, so those stages (dispatch,
+# call_tool) test ``metrics.enabled`` themselves and call observe():
+#
+#   start = time.perf_counter() if metrics.enabled else None
+#   ...
+#   if start is not None:
+#       metrics.observe("call_tool", time.perf_counter() - start)
+
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+
+# Histogram upper bounds in seconds: 1 us doubling up to ~16 s.
+BUCKETS = tuple(1e-6 * 2 ** k for k in range(25))
+
+enabled = False
+
+_lock = threading.Lock()
+_stages = {}    # name -> _Histogram
+_counters = {}  # name -> int
+
+
+class _Histogram:
+    __slots__ = ("counts", "total", "count", "max")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)  # last slot: above the largest bound
+        self.total = 0.0
+        self.count = 0
+        self.max = 0.0
+
+    def add(self, seconds):
+        self.counts[bisect_left(BUCKETS, seconds)] += 1
+        self.total += seconds
+        self.count += 1
+        if seconds > self.max:
+            self.max = seconds
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-quantile."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, n in zip(BUCKETS, self.counts):
+            seen += n
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+
+class _Stage:
+    __slots__ = ("name", "start")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        observe(self.name, time.perf_counter() - self.start)
+        return False
+
+
+class _Off:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_OFF = _Off()
+
+
+def enable():
+    global enabled
+    enabled = True
+
+
+def disable():
+    global enabled
+    enabled = False
+
+
+def reset():
+    with _lock:
+        _stages.clear()
+        _counters.clear()
+
+
+def stage(name):
+    """Context manager timing one pass through ``name``."""
+    return _Stage(name) if enabled else _OFF
+
+
+def observe(name, seconds):
+    with _lock:
+        histogram = _stages.get(name)
+        if histogram is None:
+            histogram = _stages[name] = _Histogram()
+        histogram.add(seconds)
+
+
+def count(name, n=1):
+    if not enabled:
+        return
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + n
+
+
+def snapshot():
+    """Summary per stage (count, mean, p50/p95/p99, max in ms) and counters."""
+    with _lock:
+        stages = {
+            name: {
+                "count": h.count,
+                "mean_ms": h.total / h.count * 1e3 if h.count else 0.0,
+                "p50_ms": h.quantile(0.50) * 1e3,
+                "p95_ms": h.quantile(0.95) * 1e3,
+                "p99_ms": h.quantile(0.99) * 1e3,
+                "max_ms": h.max * 1e3,
+            }
+            for name, h in _stages.items()
+        }
+        return {"stages": stages, "counters": dict(_counters)}
+
+
+def export_jsonl(path):
+    """Append one line per stage and one for the counters, timestamped."""
+    now = time.time()
+    data = snapshot()
+    with open(path, "a") as f:
+        for name, summary in data["stages"].items():
+            f.write(json.dumps({"time": now, "stage": name, **summary}) + "\n")
+        f.write(json.dumps({"time": now, "counters": data["counters"]}) + "\n")
+
+
+def prometheus_text():
+    """The histograms and counters in Prometheus text exposition format."""
+    lines = ["# HELP calc_stage_seconds Time spent per pipeline stage.",
+             "# TYPE calc_stage_seconds histogram"]
+    with _lock:
+        for name, h in sorted(_stages.items()):
+            cumulative = 0
+            for bound, n in zip(BUCKETS, h.counts):
+                cumulative += n
+                lines.append(f'calc_stage_seconds_bucket{{stage="{name}",le="{bound:.6g}"}} {cumulative}')
+            lines.append(f'calc_stage_seconds_bucket{{stage="{name}",le="+Inf"}} {h.count}')
+            lines.append(f'calc_stage_seconds_sum{{stage="{name}"}} {h.total:.9f}')
+            lines.append(f'calc_stage_seconds_count{{stage="{name}"}} {h.count}')
+        for name, value in sorted(_counters.items()):
+            lines.append(f"# TYPE calc_{name}_total counter")
+            lines.append(f"calc_{name}_total {value}")
+    return "\n".join(lines) + "\n"
+
+
+def export_prometheus(path):
+    """Write prometheus_text() atomically (for node_exporter's textfile collector)."""
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        f.write(prometheus_text())
+    os.replace(tmp, path)
+
+
+def export_every(seconds, jsonl=None, prom=None):
+    """Export from a daemon thread every ``seconds``; returns a stop function.
+
+    Stopping writes one final export.
+    """
+    stop = threading.Event()
+
+    def export():
+        if jsonl:
+            export_jsonl(jsonl)
+        if prom:
+            export_prometheus(prom)
+
+    def loop():
+        while not stop.wait(seconds):
+            export()
+        export()
+
+    thread = threading.Thread(target=loop, name="metrics-export", daemon=True)
+    thread.start()
+
+    def close():
+        stop.set()
+        thread.join()
+    return close
+
+
+if os.environ.get("CALC_METRICS") == "1":
+    enable()
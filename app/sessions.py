@@ -0,0 +1,156 @@
+# Per-session calculators with LRU / idle-TTL eviction and per-session locks.
+
+import sys
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+
+class _Session:
+    __slots__ = ("calculator", "lock", "last_used", "evicted")
+
+    def __init__(self, calculator, now):
+        self.calculator = calculator
+        self.lock = threading.Lock()
+        self.last_used = now
+        self.evicted = False
+
+
+def _estimate_session_bytes(calculator):
+    """Rough resident size of one session: the entry, its lock and calculator."""
+    size = sys.getsizeof(calculator) + sys.getsizeof(threading.Lock())
+    size += _Session.__basicsize__ + 100  # OrderedDict slot and key
+    for name in getattr(type(calculator), "__slots__", ()):
+        size += sys.getsizeof(getattr(calculator, name, None))
+    return size
+
+
+class SessionManager:
+    """
+    Holds one Calculator per session id.
+
+      - session(session_id)   # context manager: locked calculator for the id
+      - drop(session_id)
+      - stats()               # live sessions, evictions, lock wait time
+
+    Sessions are evicted least recently used first when more than
+    ``max_sessions`` are live or their estimated memory passes
+    ``max_memory_bytes``, and once idle for longer than ``idle_ttl`` seconds.
+    A session that is in use is never evicted.
+
+    The manager lock only guards the session table; each session has its own
+    lock held while its calculator is in use, so independent sessions never
+    wait on each other.
+    """
+
+    def __init__(self, factory, max_sessions=10000, idle_ttl=1800.0,
+                 max_memory_bytes=None, clock=time.monotonic):
+        self.factory = factory
+        self.idle_ttl = idle_ttl
+        self.clock = clock
+        self._sessions = OrderedDict()  # least recently used first
+        self._lock = threading.Lock()
+        self.max_sessions = max_sessions
+        if max_memory_bytes is not None:
+            per_session = _estimate_session_bytes(factory())
+            self.max_sessions = min(max_sessions, max(1, max_memory_bytes // per_session))
+        self._created = 0
+        self._evicted_lru = 0
+        self._evicted_idle = 0
+        self._lock_waits = 0
+        self._lock_wait_seconds = 0.0
+
+    @contextmanager
+    def session(self, session_id):
+        """Yield the session's calculator while holding its lock."""
+        while True:
+            entry = self._entry(session_id)
+            if not entry.lock.acquire(blocking=False):
+                start = time.perf_counter()
+                entry.lock.acquire()
+                waited = time.perf_counter() - start
+                with self._lock:
+                    self._lock_waits += 1
+                    self._lock_wait_seconds += waited
+            if not entry.evicted:
+                break
+            # evicted between lookup and lock: start over with a fresh entry
+            entry.lock.release()
+        try:
+            yield entry.calculator
+        finally:
+            entry.last_used = self.clock()
+            entry.lock.release()
+
+    def drop(self, session_id):
+        """Forget a session. Returns True if it existed."""
+        with self._lock:
+            entry = self._sessions.pop(session_id, None)
+        if entry is None:
+            return False
+        entry.evicted = True
+        return True
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def __contains__(self, session_id):
+        return session_id in self._sessions
+
+    def stats(self):
+        with self._lock:
+            return {
+                "live_sessions": len(self._sessions),
+                "max_sessions": self.max_sessions,
+                "created": self._created,
+                "evicted_lru": self._evicted_lru,
+                "evicted_idle": self._evicted_idle,
+                "lock_waits": self._lock_waits,
+                "lock_wait_seconds": self._lock_wait_seconds,
+            }
+
+    # Internal helpers (non-public) -------------------------------------
+
+    def _entry(self, session_id):
+        now = self.clock()
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is not None:
+                self._sessions.move_to_end(session_id)
+                entry.last_used = now
+            self._evict_idle(now)
+            if entry is None:
+                entry = _Session(self.factory(), now)
+                self._sessions[session_id] = entry
+                self._created += 1
+                self._evict_lru(keep=session_id)
+        return entry
+
+    def _evict_idle(self, now):
+        if self.idle_ttl is None:
+            return
+        cutoff = now - self.idle_ttl
+        expired = []
+        for session_id, entry in self._sessions.items():
+            if entry.last_used > cutoff:
+                break  # table is in recency order: the rest are newer
+            if not entry.lock.locked():
+                expired.append(session_id)
+        for session_id in expired:
+            self._sessions.pop(session_id).evicted = True
+        self._evicted_idle += len(expired)
+
+    def _evict_lru(self, keep):
+        excess = len(self._sessions) - self.max_sessions
+        if excess <= 0:
+            return
+        victims = []
+        for session_id, entry in self._sessions.items():
+            if len(victims) == excess:
+                break
+            if session_id != keep and not entry.lock.locked():
+                victims.append(session_id)
+        for session_id in victims:
+            self._sessions.pop(session_id).evicted = True
+        self._evicted_lru += len(victims)
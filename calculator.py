@@ -1,7 +1,32 @@
-from decimal import Decimal, ROUND_HALF_EVEN, InvalidOperation
-from typing import Union, Optional
+from decimal import (
+    Context,
+    Decimal,
+    DivisionByZero,
+    InvalidOperation,
+    Overflow,
+    ROUND_HALF_EVEN,
+)
+from typing import Iterable, List, Optional, Tuple, Union
 
 Number = Union[int, float, str, Decimal]
+Step = Tuple  # (name,) or (name, value); see Calculator.run
+
+# Working precision for intermediate arithmetic; matches the decimal module
+# default so results are the same as before the dedicated context existed.
+_CONTEXT_PREC = 28
+_HUNDRED = Decimal(100)
+
+# run() step names: value operations map to their (total, value) helper
+_PROGRAM_OPS = {
+    "add": "_added",
+    "subtract": "_subtracted",
+    "multiply": "_multiplied",
+    "divide": "_divided",
+    "percent": "_percented",
+    "percent_add": "_percent_added",
+    "percent_substract": "_percent_subtracted",
+}
+_PROGRAM_NULLARY = ("get_total", "clear", "clear_all")
 
 
 class Calculator:
@@ -17,16 +42,40 @@ class Calculator:
       - get_total()
       - clear()       # one-shot undo (restore previous total, then forget it)
       - clear_all()   # wipe everything
+      - run(program)  # evaluate a list of steps, commit once
 
     Internals (_total, _last_total) are intentionally non-public.
+
+    precision and max_value are fixed at construction: the quantum, the zero
+    total and the decimal context are derived from them once.
     """
 
+    __slots__ = (
+        "precision",
+        "max_value",
+        "_quantum",
+        "_zero",
+        "_ctx",
+        "_int_limit",
+        "_total",
+        "_last_total",
+    )
+
     def __init__(self, precision: int = 2, max_value: Number = 1000):
         self.precision = int(precision)
         self.max_value = self._to_decimal(max_value)
+        # private context so a caller's thread-local decimal settings cannot
+        # change rounding or precision of the calculator's arithmetic
+        self._ctx = Context(
+            prec=_CONTEXT_PREC,
+            rounding=ROUND_HALF_EVEN,
+            traps=[InvalidOperation, DivisionByZero, Overflow],
+        )
+        self._quantum = Decimal(1).scaleb(-self.precision)  # e.g. precision=2 -> Decimal('0.01')
         # store totals as already-quantized Decimals
-        zero = Decimal("0").quantize(Decimal("1").scaleb(-self.precision))
-        self._total: Decimal = zero
+        self._zero = self._quantize(Decimal(0))
+        self._int_limit = self._exact_int_limit()
+        self._total: Decimal = self._zero
         self._last_total: Optional[Decimal] = None  # None == no undo available
 
     # Public API ---------------------------------------------------------
@@ -56,27 +105,30 @@ class Calculator:
         Clear everything: reset both current total and last total to zero and remove undo.
         Returns the new current total.
         """
-        zero = Decimal("0").quantize(Decimal("1").scaleb(-self.precision))
         self._last_total = None
-        self._total = zero
+        self._total = self._zero
         return self._total
 
     def add(self, value: Number) -> Decimal:
+        if type(value) is int and -self._int_limit < value < self._int_limit:
+            # fast path: on-grid total plus a small int is exact, no quantize
+            return self._set_total_with_check(self._ctx.add(self._total, Decimal(value)))
         return self._apply_delta(self._to_decimal(value))
 
     def subtract(self, value: Number) -> Decimal:
-        return self._apply_delta(-self._to_decimal(value))
+        if type(value) is int and -self._int_limit < value < self._int_limit:
+            return self._set_total_with_check(self._ctx.add(self._total, Decimal(-value)))
+        return self._apply_delta(self._ctx.minus(self._to_decimal(value)))
 
     def multiply(self, factor: Number) -> Decimal:
-        dec_factor = self._to_decimal(factor)
-        new_total = self._quantize(self._total * dec_factor)
+        new_total = self._multiplied(self._total, self._to_decimal(factor))
         return self._set_total_with_check(new_total)
 
     def divide(self, divisor: Number) -> Decimal:
         dec_div = self._to_decimal(divisor)
         if dec_div == 0:
             raise ValueError("Division by zero")
-        new_total = self._quantize(self._total / dec_div)
+        new_total = self._divided(self._total, dec_div)
         return self._set_total_with_check(new_total)
 
     def percent(self, value: Number) -> Decimal:
@@ -85,8 +137,7 @@ class Calculator:
         Accepts the same input types as other operations; result is quantized and
         checked against max_value. Undo (clear) will restore the previous total.
         """
-        dec_value = self._to_decimal(value)
-        new_total = self._quantize(self._total * dec_value / Decimal("100"))
+        new_total = self._percented(self._total, self._to_decimal(value))
         return self._set_total_with_check(new_total)
 
     def percent_add(self, value: Number) -> Decimal:
@@ -95,9 +146,7 @@ class Calculator:
         Accepts the same input types as other operations; result is quantized and
         checked against max_value. Undo (clear) will restore the previous total.
         """
-        dec_value = self._to_decimal(value)
-        increment = (self._total * dec_value) / Decimal("100")
-        new_total = self._quantize(self._total + increment)
+        new_total = self._percent_added(self._total, self._to_decimal(value))
         return self._set_total_with_check(new_total)
 
     def percent_substract(self, value: Number) -> Decimal:
@@ -106,17 +155,117 @@ class Calculator:
         Accepts the same input types as other operations; result is quantized and
         checked against max_value. Undo (clear) will restore the previous total.
         """
-        dec_value = self._to_decimal(value)
-        decrement = (self._total * dec_value) / Decimal("100")
-        new_total = self._quantize(self._total - decrement)
+        new_total = self._percent_subtracted(self._total, self._to_decimal(value))
         return self._set_total_with_check(new_total)
 
+    def run(self, program: Iterable[Step]) -> Decimal:
+        """Evaluate a sequence of operations and commit the result once.
+
+        Each step is a tuple ``(name, value)`` for the value operations
+        (add, subtract, multiply, divide, percent, percent_add,
+        percent_substract) or ``(name,)`` for get_total, clear and clear_all.
+
+        All names and operands are validated and converted before anything is
+        evaluated, then the steps run in order on a local accumulator with the
+        same rounding and per-step max_value check as the individual methods.
+
+        The program is atomic: if any step fails (bad operand, division by
+        zero, max_value exceeded) a ValueError/TypeError is raised and neither
+        the total nor the undo state changes. On success the whole program is
+        a single commit: one clear() restores the total from before it. Inside
+        the program clear and clear_all act on the local accumulator, and a
+        program whose last state-changing step is clear or clear_all leaves no
+        undo, exactly as calling them directly would. A program of only
+        get_total steps leaves the undo state untouched.
+
+        Returns the new current total.
+        """
+        steps = self._compile(program)
+
+        total = self._total
+        step_undo = self._last_total
+        undo_available: Optional[bool] = None  # None == no state-changing step
+        max_value = self.max_value
+        for name, value in steps:
+            if name == "get_total":
+                continue
+            if name == "clear":
+                if step_undo is not None:
+                    total, step_undo = step_undo, None
+                undo_available = False
+                continue
+            if name == "clear_all":
+                total, step_undo = self._zero, None
+                undo_available = False
+                continue
+            new_total = getattr(self, _PROGRAM_OPS[name])(total, value)
+            if abs(new_total) > max_value:
+                raise ValueError("Total max value reached")
+            total, step_undo = new_total, total
+            undo_available = True
+
+        if undo_available is not None:
+            self._last_total = self._total if undo_available else None
+            self._total = total
+        return self._total
+
     # Internal helpers (non-public) -------------------------------------
 
     def _apply_delta(self, delta: Decimal) -> Decimal:
-        new_total = self._quantize(self._total + delta)
+        new_total = self._added(self._total, delta)
         return self._set_total_with_check(new_total)
 
+    # The _<op>ed helpers compute a quantized new total from ``total`` and an
+    # already-converted operand without touching instance state; the public
+    # methods and run() share them so both round identically.
+
+    def _added(self, total: Decimal, value: Decimal) -> Decimal:
+        return self._quantize(self._ctx.add(total, value))
+
+    def _subtracted(self, total: Decimal, value: Decimal) -> Decimal:
+        return self._added(total, self._ctx.minus(value))
+
+    def _multiplied(self, total: Decimal, value: Decimal) -> Decimal:
+        return self._quantize(self._ctx.multiply(total, value))
+
+    def _divided(self, total: Decimal, value: Decimal) -> Decimal:
+        return self._quantize(self._ctx.divide(total, value))
+
+    def _percent_of(self, total: Decimal, value: Decimal) -> Decimal:
+        ctx = self._ctx
+        return ctx.divide(ctx.multiply(total, value), _HUNDRED)
+
+    def _percented(self, total: Decimal, value: Decimal) -> Decimal:
+        return self._quantize(self._percent_of(total, value))
+
+    def _percent_added(self, total: Decimal, value: Decimal) -> Decimal:
+        return self._quantize(self._ctx.add(total, self._percent_of(total, value)))
+
+    def _percent_subtracted(self, total: Decimal, value: Decimal) -> Decimal:
+        return self._quantize(self._ctx.subtract(total, self._percent_of(total, value)))
+
+    def _compile(self, program: Iterable[Step]) -> List[Tuple[str, Optional[Decimal]]]:
+        """Validate program steps and convert their operands to Decimal."""
+        steps = []
+        for index, step in enumerate(program):
+            if not isinstance(step, (tuple, list)) or not step:
+                raise ValueError(f"Step {index}: expected (name,) or (name, value), got {step!r}")
+            name = step[0]
+            if name in _PROGRAM_OPS:
+                if len(step) != 2:
+                    raise ValueError(f"Step {index}: {name!r} takes exactly one value")
+                value = self._to_decimal(step[1])
+                if name == "divide" and value == 0:
+                    raise ValueError("Division by zero")
+            elif name in _PROGRAM_NULLARY:
+                if len(step) != 1:
+                    raise ValueError(f"Step {index}: {name!r} takes no value")
+                value = None
+            else:
+                raise ValueError(f"Step {index}: unknown operation {name!r}")
+            steps.append((name, value))
+        return steps
+
     def _set_total_with_check(self, new_total: Decimal) -> Decimal:
         """
         Atomically check max_value, update last_total then commit or restore.
@@ -134,8 +283,23 @@ class Calculator:
 
     def _quantize(self, value: Decimal) -> Decimal:
         """Round value to configured precision using ROUND_HALF_EVEN."""
-        exp = Decimal("1").scaleb(-self.precision)  # e.g. precision=2 -> Decimal('0.01')
-        return value.quantize(exp, rounding=ROUND_HALF_EVEN)
+        return value.quantize(self._quantum, ROUND_HALF_EVEN, self._ctx)
+
+    def _exact_int_limit(self) -> int:
+        """Bound below which int add/subtract can skip quantization.
+
+        The total is always on the quantum grid and ints never have digits
+        below it, so their sum is exact as long as it fits in the context
+        precision. That holds when both |total| (bounded by max_value) and
+        |value| stay under 10**(prec - 1 - precision). Returns 0 (fast path
+        disabled) when max_value or precision make that impossible.
+        """
+        if self.precision < 0 or not self.max_value.is_finite():
+            return 0
+        limit = 10 ** (_CONTEXT_PREC - 1 - self.precision) if self.precision < _CONTEXT_PREC else 0
+        if abs(self.max_value) >= limit:
+            return 0
+        return limit
 
     def _to_decimal(self, value: Number) -> Decimal:
         """Convert accepted inputs to Decimal.
@@ -144,6 +308,10 @@ class Calculator:
         Rejects: bytes, None, arbitrary objects, and non-decimal numeric strings
                  (e.g. '0x10' will raise ValueError).
         """
+        cls = type(value)
+        if cls is int or cls is Decimal:
+            # exact types first: the common inputs skip the isinstance chain
+            return Decimal(value) if cls is int else value
         if isinstance(value, Decimal):
             return value
         if isinstance(value, int):
@@ -0,0 +1,400 @@
+"""Many calculator sessions stored as fixed-point integer arrays.
+
+A Calculator's total is always quantized to ``precision`` decimal places, so
+it is really an integer count of quanta (``total * 10**precision``).
+CalculatorBank keeps those counts for N sessions in NumPy arrays and applies a
+batch of operations across sessions with vectorized integer arithmetic,
+including ROUND_HALF_EVEN for multiply, divide and the percent operations.
+
+Results match the scalar Calculator exactly, down to the sign of a zero
+total (Decimal keeps -0.00, so a flag array tracks it). Rows whose integer
+result could differ from Decimal's 28-digit working precision (huge operands,
+or a divide within 1e-8 of a rounding tie) are recomputed with the
+Calculator's own helpers.
+"""
+
+from decimal import Decimal, InvalidOperation, ROUND_FLOOR
+from typing import Iterable, List, Tuple
+
+import numpy as np
+
+from calculator import Calculator, Number, _PROGRAM_OPS
+
+_OPS = list(_PROGRAM_OPS) + ["clear", "clear_all"]
+_OP_CODES = {name: code for code, name in enumerate(_OPS)}
+_N_VALUE_OPS = len(_PROGRAM_OPS)  # codes below this take a value
+
+# Largest magnitude kept in int64 arithmetic; leaves headroom for 2 * x.
+_INT64_SAFE = 2 ** 62
+# Decimal working precision used by Calculator (coefficients below this are exact).
+_EXACT = 10 ** 28
+# Divide results within this relative distance of a rounding tie are
+# recomputed, since Decimal rounds the quotient to 28 digits before quantizing.
+_TIE_GUARD = 10 ** 8
+_QUOTIENT_LIMIT = 10 ** 20
+
+BatchRow = Tuple  # (session_id, name) or (session_id, name, value)
+
+
+def _pow10(exponents, dtype):
+    """10**e for each e, as an array of ``dtype`` (int64 or object)."""
+    if dtype is np.int64:
+        return np.power(10, exponents.astype(np.int64))
+    return np.array([10 ** int(e) for e in exponents], dtype=object)
+
+
+def _round_half_even(n, d):
+    """Divide integer array n by positive integer array d, rounding half to even."""
+    q = n // d
+    twice_r = 2 * (n - q * d)
+    up = (twice_r > d) | ((twice_r == d) & (q % 2 == 1))
+    return q + up
+
+
+class CalculatorBank:
+    """
+    A fixed number of calculator sessions sharing precision and max_value.
+
+      - apply(batch)          # vectorized batch of (session_id, name, value)
+      - apply_columns(session_ids, names, values)
+      - get_total(session_id)
+      - totals()              # all totals as Decimals
+
+    Each session behaves exactly like its own Calculator: the same operations,
+    rounding, max_value magnitude check and one-shot clear() undo. Totals are
+    stored as int64 quanta, or as Python ints in object arrays when
+    max_value * 10**precision does not fit in int64.
+    """
+
+    def __init__(self, n_sessions: int, precision: int = 2, max_value: Number = 1000):
+        self._ref = Calculator(precision, max_value)
+        self.precision = self._ref.precision
+        self.max_value = self._ref.max_value
+        if self.precision < 0:
+            raise ValueError("CalculatorBank requires a non-negative precision")
+        if self.max_value.is_finite():
+            self._max_quanta = int(self.max_value.scaleb(self.precision).to_integral_value(ROUND_FLOOR))
+        else:
+            self._max_quanta = None
+        if self._max_quanta is not None and abs(self._max_quanta) < _INT64_SAFE:
+            dtype = np.int64
+        else:
+            dtype = object
+        self._total = np.zeros(n_sessions, dtype=dtype)
+        self._neg_zero = np.zeros(n_sessions, dtype=bool)  # total is -0
+        self._last = np.zeros(n_sessions, dtype=dtype)
+        self._last_neg_zero = np.zeros(n_sessions, dtype=bool)
+        self._has_last = np.zeros(n_sessions, dtype=bool)  # False == no undo available
+
+    def __len__(self) -> int:
+        return len(self._total)
+
+    # Public API ---------------------------------------------------------
+
+    def get_total(self, session_id: int) -> Decimal:
+        """Return one session's total as Decimal (quantized to precision)."""
+        return self._from_quanta(self._total[session_id], self._neg_zero[session_id])
+
+    def totals(self) -> List[Decimal]:
+        """Return every session's total as Decimal, indexed by session id."""
+        return [self._from_quanta(q, neg) for q, neg in zip(self._total, self._neg_zero)]
+
+    def apply(self, batch: Iterable[BatchRow]) -> np.ndarray:
+        """Apply a batch of operations and return a per-row overflow mask.
+
+        Rows are ``(session_id, name, value)`` for the value operations and
+        ``(session_id, name)`` for clear and clear_all. Rows for the same
+        session are applied in batch order; rows for different sessions are
+        independent and evaluated together.
+
+        The whole batch is validated first (unknown session or operation,
+        bad operand, division by zero, non-finite operand) and nothing is
+        applied if any row is invalid. A row whose result exceeds max_value
+        is not applied but, like Calculator, still records the previous total
+        for undo; its entry in the returned mask is True. A result too large
+        to quantize at this precision (where Calculator raises
+        decimal.InvalidOperation) is also flagged, without recording undo.
+        """
+        return self._run(self._compile(batch))
+
+    def apply_columns(self, session_ids, names, values) -> np.ndarray:
+        """Columnar form of apply(): three equal-length sequences.
+
+        ``values`` entries for clear and clear_all rows are ignored. When
+        ``values`` is an integer NumPy array, validation and operand
+        conversion are vectorized as well, so no per-row Python work remains.
+        Semantics and the returned overflow mask are the same as apply().
+        """
+        sessions = np.asarray(session_ids, dtype=np.int64)
+        names = np.asarray(names)
+        n = len(sessions)
+        if len(names) != n or len(values) != n:
+            raise ValueError("session_ids, names and values must have the same length")
+        if n == 0:
+            return np.zeros(0, dtype=bool)
+        bad = np.flatnonzero((sessions < 0) | (sessions >= len(self._total)))
+        if len(bad):
+            raise ValueError(f"Row {bad[0]}: unknown session {sessions[bad[0]]!r}")
+        codes = np.full(n, -1, dtype=np.int64)
+        for name, code in _OP_CODES.items():
+            codes[names == name] = code
+        bad = np.flatnonzero(codes < 0)
+        if len(bad):
+            raise ValueError(f"Row {bad[0]}: unknown operation {str(names[bad[0]])!r}")
+        takes_value = codes < _N_VALUE_OPS
+
+        if isinstance(values, np.ndarray) and values.dtype.kind in "iu":
+            quanta = np.where(takes_value, values, 0).astype(np.int64)
+            scales = np.zeros(n, dtype=np.int64)
+            signs = quanta < 0
+            split_values = [None] * n
+        else:
+            quanta = np.zeros(n, dtype=object)
+            scales = np.zeros(n, dtype=np.int64)
+            signs = np.zeros(n, dtype=bool)
+            split_values = [None] * n
+            split_cache = {}
+            for index in np.flatnonzero(takes_value):
+                raw = values[index]
+                if isinstance(raw, np.integer):
+                    raw = int(raw)
+                if type(raw) is int:
+                    split = (raw, 0, raw < 0, None)
+                elif type(raw) is str and raw in split_cache:
+                    split = split_cache[raw]
+                else:
+                    split = self._split(index, raw)
+                    if type(raw) is str:
+                        split_cache[raw] = split
+                quanta[index], scales[index], signs[index], split_values[index] = split
+        zero_div = np.flatnonzero((codes == _OP_CODES["divide"]) & (quanta == 0))
+        if len(zero_div):
+            raise ValueError("Division by zero")
+        return self._run((sessions, codes, quanta, scales, signs, split_values))
+
+    # Internal helpers (non-public) -------------------------------------
+
+    def _run(self, operands):
+        """Apply validated columnar operands; see apply()."""
+        sessions, codes = operands[0], operands[1]
+        overflow = np.zeros(len(codes), dtype=bool)
+        if not len(codes):
+            return overflow
+
+        # rank of each row among the rows for the same session: every rank is
+        # one vectorized round touching each session at most once
+        order = np.argsort(sessions, kind="stable")
+        sorted_sessions = sessions[order]
+        starts = np.r_[0, np.flatnonzero(np.diff(sorted_sessions)) + 1]
+        group_start = np.repeat(starts, np.diff(np.r_[starts, len(order)]))
+        rank = np.empty(len(order), dtype=np.int64)
+        rank[order] = np.arange(len(order)) - group_start
+
+        for r in range(int(rank.max()) + 1):
+            in_round = rank == r
+            for code in np.unique(codes[in_round]):
+                rows = np.flatnonzero(in_round & (codes == code))
+                self._apply_rows(_OPS[code], rows, operands, overflow)
+        return overflow
+
+    def _apply_rows(self, name, rows, operands, overflow):
+        sessions, _, quanta, scales, signs, values = operands
+        sess = sessions[rows]
+        if name == "clear":
+            undo = sess[self._has_last[sess]]
+            self._total[undo] = self._last[undo]
+            self._neg_zero[undo] = self._last_neg_zero[undo]
+            self._has_last[undo] = False
+            return
+        if name == "clear_all":
+            self._total[sess] = 0
+            self._neg_zero[sess] = False
+            self._has_last[sess] = False
+            return
+
+        t = self._total[sess]
+        t_neg_zero = self._neg_zero[sess]
+        new, neg_zero, unsure = self._compute(name, t, t_neg_zero, quanta[rows], scales[rows], signs[rows])
+        # results Decimal cannot quantize at this precision fail before
+        # Calculator records undo, so those rows leave the undo state alone
+        invalid = np.zeros(len(rows), dtype=bool)
+        for i in np.flatnonzero(unsure):
+            value = values[rows[i]]
+            if value is None:
+                # int operands skip Decimal conversion in _compile
+                value = Decimal(int(quanta[rows[i]]))
+            result = self._scalar(name, t[i], t_neg_zero[i], value)
+            if result is None:
+                invalid[i] = True
+                new[i], neg_zero[i] = 0, False
+            else:
+                new[i], neg_zero[i] = result
+        too_big = invalid.copy()
+        if self._max_quanta is not None:
+            too_big |= np.abs(new) > self._max_quanta
+
+        commit = sess[~invalid]
+        self._last[commit] = t[~invalid]
+        self._last_neg_zero[commit] = t_neg_zero[~invalid]
+        self._has_last[commit] = True
+        self._total[sess] = np.where(too_big, t, new)
+        self._neg_zero[sess] = np.where(too_big, t_neg_zero, neg_zero)
+        overflow[rows] = too_big
+
+    def _compute(self, name, t, t_neg_zero, m, s, m_neg):
+        """Return (new quanta, new -0 flags, rows needing the scalar path).
+
+        Operands are ``m / 10**s`` with sign bits ``m_neg`` (set for -0 too);
+        totals ``t`` are in quanta of 10**-precision.
+        """
+        p = self.precision
+        t_max = int(np.abs(t).max())
+        m_max = int(np.abs(m).max())
+        s_max = int(s.max())
+        if name in ("add", "subtract"):
+            bound = 2 * (t_max + m_max) * 10 ** (s_max + p)
+        elif name == "multiply":
+            bound = 2 * (t_max * m_max + 10 ** s_max)
+        elif name == "divide":
+            bound = 2 * max(t_max * 10 ** s_max, m_max * _TIE_GUARD)
+        else:
+            bound = 2 * (t_max * 10 ** (s_max + 2) + t_max * m_max)
+        # the operands and powers of ten themselves must fit too
+        bound = max(bound, 2 * t_max, 2 * m_max, 2 * 10 ** (s_max + p + 2))
+        fits_int64 = bound < _INT64_SAFE
+        dtype = np.int64 if fits_int64 else object
+        t = t.astype(dtype)
+        m = m.astype(dtype)
+        pow_s = _pow10(s, dtype)
+        unsure = np.zeros(len(t), dtype=bool)
+        t_neg = (t < 0) | t_neg_zero
+
+        # sign of an exactly-zero result follows Decimal: x + y keeps -0 only
+        # when both are -0, products and quotients xor the signs
+        if name in ("add", "subtract"):
+            if name == "subtract":
+                # Calculator adds ctx.minus(value), which turns -0 into +0
+                m_neg = ~m_neg & (m != 0)
+                m = -m
+            zero_neg = t_neg & m_neg
+            # common unit 10**-max(p, s); operands never lose digits there
+            u = np.maximum(s, p)
+            up_t = _pow10(u - p, dtype)
+            up_m = _pow10(u - s, dtype)
+            n = t * up_t + m * up_m
+            d = up_t
+            if not fits_int64:
+                unsure = (np.abs(n) >= _EXACT) | (np.abs(m) >= _EXACT)
+        elif name == "multiply":
+            zero_neg = t_neg ^ m_neg
+            n = t * m
+            d = pow_s
+            if not fits_int64:
+                unsure = np.abs(n) >= _EXACT
+        elif name == "divide":
+            zero_neg = t_neg ^ m_neg
+            n = t * pow_s * np.sign(m)
+            d = np.abs(m)
+            floor = n // d
+            # quotient close to a tie: Decimal's 28-digit rounding may land on it
+            unsure = np.abs(2 * (n - floor * d) - d) * _TIE_GUARD <= d
+            if not fits_int64:
+                unsure |= np.abs(floor) >= _QUOTIENT_LIMIT
+        else:
+            # percent family: t * m / 100 in units of 10**-(p + s + 2)
+            product = t * m
+            d = pow_s * 100
+            inc_neg = t_neg ^ m_neg
+            if name == "percent":
+                zero_neg = inc_neg
+                n = product
+            elif name == "percent_add":
+                zero_neg = t_neg & inc_neg
+                n = t * d + product
+            else:
+                zero_neg = t_neg & ~inc_neg
+                n = t * d - product
+            if not fits_int64:
+                unsure = (np.abs(product) >= _EXACT) | (np.abs(n) >= _EXACT)
+
+        q = _round_half_even(n, d)
+        # a result that rounds to zero keeps the sign of the unrounded value
+        neg_zero = (q == 0) & np.where(n != 0, n < 0, zero_neg)
+        return q, neg_zero, unsure
+
+    def _scalar(self, name, quanta, neg_zero, value):
+        """Compute one row with the Calculator helpers; None if unrepresentable."""
+        try:
+            total = self._from_quanta(quanta, neg_zero)
+            result = getattr(self._ref, _PROGRAM_OPS[name])(total, value)
+        except InvalidOperation:
+            return None
+        return self._to_quanta(result)
+
+    def _from_quanta(self, quanta, neg_zero=False) -> Decimal:
+        q = int(quanta)
+        sign = 1 if q < 0 or (q == 0 and neg_zero) else 0
+        return Decimal((sign, tuple(int(c) for c in str(abs(q))), -self.precision))
+
+    def _to_quanta(self, value: Decimal) -> Tuple[int, bool]:
+        sign, digits, exp = value.as_tuple()
+        q = int("".join(map(str, digits))) * 10 ** (exp + self.precision)
+        return (-q if sign else q), bool(sign and q == 0)
+
+    def _compile(self, batch):
+        """Validate batch rows and split operands into integer (m, s) pairs."""
+        n_sessions = len(self._total)
+        parsed = []
+        split_cache = {}  # str operands repeat a lot; ints need no Decimal at all
+        for index, row in enumerate(batch):
+            if not isinstance(row, (tuple, list)) or len(row) < 2:
+                raise ValueError(f"Row {index}: expected (session_id, name[, value]), got {row!r}")
+            session_id, name = row[0], row[1]
+            if not 0 <= session_id < n_sessions:
+                raise ValueError(f"Row {index}: unknown session {session_id!r}")
+            code = _OP_CODES.get(name)
+            if code is None:
+                raise ValueError(f"Row {index}: unknown operation {name!r}")
+            if code < _N_VALUE_OPS:
+                if len(row) != 3:
+                    raise ValueError(f"Row {index}: {name!r} takes exactly one value")
+                raw = row[2]
+                if type(raw) is int:
+                    split = (raw, 0, raw < 0, None)
+                elif type(raw) is str and raw in split_cache:
+                    split = split_cache[raw]
+                else:
+                    split = self._split(index, raw)
+                    if type(raw) is str:
+                        split_cache[raw] = split
+                if split[0] == 0 and name == "divide":
+                    raise ValueError("Division by zero")
+                parsed.append((session_id, code) + split)
+            else:
+                if len(row) != 2:
+                    raise ValueError(f"Row {index}: {name!r} takes no value")
+                parsed.append((session_id, code, 0, 0, False, None))
+        if not parsed:
+            return tuple(np.zeros(0, dtype=np.int64) for _ in range(5)) + ([],)
+        sessions, codes, quanta, scales, signs, values = zip(*parsed)
+        return (
+            np.array(sessions, dtype=np.int64),
+            np.array(codes, dtype=np.int64),
+            np.array(quanta, dtype=object),
+            np.array(scales, dtype=np.int64),
+            np.array(signs, dtype=bool),
+            values,
+        )
+
+    def _split(self, index, raw):
+        """Convert one operand to (m, s, sign, Decimal) with value m / 10**s."""
+        value = self._ref._to_decimal(raw)
+        if not value.is_finite():
+            raise ValueError(f"Row {index}: non-finite value {raw!r}")
+        sign, digits, exp = value.as_tuple()
+        m = int("".join(map(str, digits)))
+        if exp >= 0:
+            m, s = m * 10 ** exp, 0
+        else:
+            s = -exp
+        return (-m if sign else m), s, bool(sign), value
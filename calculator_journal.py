@@ -0,0 +1,389 @@
+"""Append-only journal of Calculator commits, with snapshots and replay.
+
+A journal file holds one calculator session. Every committed change (an
+operation, a run() program, clear, clear_all, a multi-level undo, and the
+undo bookkeeping of a rejected overflow) is written as a fixed-size binary
+record carrying the resulting total as integer quanta (total * 10**precision).
+Every ``snapshot_every`` records a snapshot record stores the complete state.
+
+Records are packed straight into a memory-mapped file, so an operation costs
+a struct pack into memory rather than a write() call; the mapping is msync'ed
+every ``sync_every`` records and on sync()/close(). Restoring a session reads
+back from the end to a snapshot and replays only the records after it.
+
+Record layout (little endian, 24 bytes):
+
+    kind u8 | op u8 | flags u8 | pad 5 | total i64 | aux i64
+
+``aux`` is the undo total for snapshots and the step count for undo records.
+"""
+
+import mmap
+import os
+import struct
+from collections import deque
+from decimal import Context, Decimal
+from typing import Iterable, Iterator, NamedTuple, Optional
+
+from calculator import Calculator, Number, Step, _PROGRAM_OPS
+
+MAGIC = b"TCJ1"
+_HEADER = struct.Struct("<4sHHi4x")  # magic, version, record size, precision
+_RECORD = struct.Struct("<BBB5xqq")
+_VERSION = 1
+_GROW_BYTES = 1 << 20
+
+# record kinds; 0 marks unused (preallocated) space
+SNAPSHOT = 1
+OP = 2
+RUN = 3
+CLEAR = 4
+CLEAR_ALL = 5
+UNDO = 6
+REJECT = 7  # overflow: total unchanged but undo now points at it
+
+# flags
+_TOTAL_NEG_ZERO = 1
+_AUX_NEG_ZERO = 2
+_HAS_UNDO = 4
+
+_OP_CODES = {name: code for code, name in enumerate(_PROGRAM_OPS, start=1)}
+_INT64_MAX = 2 ** 63 - 1
+_CONTEXT = Context(prec=40)  # wide enough for any int64 quanta
+
+
+class Record(NamedTuple):
+    kind: int
+    op: int
+    flags: int
+    total: int
+    aux: int
+
+
+class CalculatorJournal:
+    """
+    Memory-mapped, append-only journal file for one calculator session.
+
+      - append(kind, total, ...)  # low level; JournaledCalculator calls it
+      - records()                 # iterate every record from the start
+      - restore(calculator)       # latest snapshot + tail replay
+      - sync() / close()
+
+    Totals are stored as int64 quanta, so precision and max_value must keep
+    max_value * 10**precision within int64.
+    """
+
+    def __init__(self, path, precision: int = 2, snapshot_every: int = 1024,
+                 sync_every: int = 4096):
+        self.path = os.fspath(path)
+        self.precision = int(precision)
+        self.snapshot_every = int(snapshot_every)
+        self.sync_every = int(sync_every)
+        self._unsynced = 0
+        self._since_snapshot = 0
+
+        exists = os.path.exists(self.path) and os.path.getsize(self.path) >= _HEADER.size
+        self._file = open(self.path, "r+b" if exists else "w+b")
+        if exists:
+            magic, version, record_size, file_precision = _HEADER.unpack(self._file.read(_HEADER.size))
+            if magic != MAGIC or version != _VERSION or record_size != _RECORD.size:
+                raise ValueError(f"Not a calculator journal: {self.path}")
+            if file_precision != self.precision:
+                raise ValueError(
+                    f"Journal precision {file_precision} does not match requested {self.precision}")
+        else:
+            self._file.write(_HEADER.pack(MAGIC, _VERSION, _RECORD.size, self.precision))
+            self._file.truncate(_HEADER.size + _GROW_BYTES)
+        self._file.flush()
+        self._mm = mmap.mmap(self._file.fileno(), 0)
+        self._size = len(self._mm)
+        self._end = self._find_end()
+        self._synced_end = self._end
+        self._since_snapshot = self._records_since_snapshot()
+
+    def __len__(self) -> int:
+        """Number of records in the journal."""
+        return (self._end - _HEADER.size) // _RECORD.size
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # Public API ---------------------------------------------------------
+
+    def append(self, kind: int, total: Decimal, op: int = 0,
+               aux: int = 0, flags: int = 0) -> None:
+        """Append one record whose resulting total is ``total``.
+
+        ``total`` must fit in int64 quanta; JournaledCalculator guarantees
+        this by checking max_value once instead of every total.
+        """
+        quanta = int(total.scaleb(self.precision, _CONTEXT))
+        if not quanta and total.is_signed():
+            flags |= _TOTAL_NEG_ZERO
+        end = self._end
+        if end + _RECORD.size > self._size:
+            self._grow()
+        # a single copy into the shared mapping: a crashed process leaves
+        # either the whole record or none of it in the page cache
+        _RECORD.pack_into(self._mm, end, kind, op, flags, quanta, aux)
+        self._end = end + _RECORD.size
+
+        self._unsynced += 1
+        if self._unsynced >= self.sync_every:
+            self.sync()
+        if kind == SNAPSHOT:
+            self._since_snapshot = 0
+        else:
+            self._since_snapshot += 1
+
+    def needs_snapshot(self) -> bool:
+        return self._since_snapshot >= self.snapshot_every
+
+    def snapshot(self, total: Decimal, last_total: Optional[Decimal]) -> None:
+        """Append a snapshot of the complete undo state."""
+        flags = 0
+        aux = 0
+        if last_total is not None:
+            flags |= _HAS_UNDO
+            aux = self.to_quanta(last_total)
+            if last_total.is_signed() and not aux:
+                flags |= _AUX_NEG_ZERO
+        self.append(SNAPSHOT, total, aux=aux, flags=flags)
+
+    def records(self, start: int = 0) -> Iterator[Record]:
+        """Yield records from index ``start`` to the end."""
+        for offset in range(_HEADER.size + start * _RECORD.size, self._end, _RECORD.size):
+            yield Record(*_RECORD.unpack_from(self._mm, offset))
+
+    def restore(self, calculator: "JournaledCalculator", undo_depth: int = 64) -> Decimal:
+        """Load the journaled state into ``calculator`` and return its total.
+
+        Starts from the latest snapshot, or an earlier one when needed to
+        rebuild ``undo_depth`` entries of undo history (see _replay_start).
+        Replay only assigns recorded totals; no arithmetic is redone.
+        """
+        start = self._replay_start(undo_depth)
+        total = last = None
+        history = deque(maxlen=calculator.undo_depth)
+        for rec in self.records(start):
+            kind = rec.kind
+            if kind == SNAPSHOT:
+                if total is None:
+                    total = self.from_quanta(rec.total, rec.flags & _TOTAL_NEG_ZERO)
+                    last = (self.from_quanta(rec.aux, rec.flags & _AUX_NEG_ZERO)
+                            if rec.flags & _HAS_UNDO else None)
+                continue
+            if total is None:
+                raise ValueError("Journal replay must start at a snapshot")
+            if kind == REJECT:
+                last = total
+                continue
+            new_total = self.from_quanta(rec.total, rec.flags & _TOTAL_NEG_ZERO)
+            if kind == UNDO:
+                for _ in range(min(rec.aux, len(history))):
+                    history.pop()
+                last = None
+            else:
+                history.append(total)
+                if kind == OP or (kind == RUN and rec.flags & _HAS_UNDO):
+                    last = total
+                else:
+                    last = None
+            total = new_total
+        if total is None:
+            return calculator.get_total()
+        calculator._total = total
+        calculator._last_total = last
+        calculator._history = history
+        return total
+
+    def sync(self) -> None:
+        """Flush the records appended since the last sync to disk."""
+        start = self._synced_end - self._synced_end % mmap.PAGESIZE
+        if self._end > start:
+            self._mm.flush(start, self._end - start)
+        self._synced_end = self._end
+        self._unsynced = 0
+
+    def close(self) -> None:
+        if self._mm.closed:
+            return
+        self.sync()
+        self._mm.close()
+        self._file.close()
+
+    def to_quanta(self, total: Decimal) -> int:
+        quanta = int(total.scaleb(self.precision, _CONTEXT))
+        if abs(quanta) > _INT64_MAX:
+            raise ValueError("Total too large for the journal")
+        return quanta
+
+    def from_quanta(self, quanta: int, neg_zero: int = 0) -> Decimal:
+        value = Decimal(quanta).scaleb(-self.precision, _CONTEXT)
+        return value.copy_negate() if neg_zero else value
+
+    # Internal helpers (non-public) -------------------------------------
+
+    def _find_end(self) -> int:
+        """Binary search for the first unused record slot."""
+        lo, hi = 0, (len(self._mm) - _HEADER.size) // _RECORD.size
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._mm[_HEADER.size + mid * _RECORD.size]:
+                lo = mid + 1
+            else:
+                hi = mid
+        return _HEADER.size + lo * _RECORD.size
+
+    def _records_since_snapshot(self) -> int:
+        count = len(self)
+        for index in range(count - 1, -1, -1):
+            if self._mm[_HEADER.size + index * _RECORD.size] == SNAPSHOT:
+                return count - 1 - index
+        return count
+
+    def _replay_start(self, undo_depth: int) -> int:
+        """Index of the snapshot to replay from (scanning back from the end).
+
+        Snapshots do not hold the undo history, so the replay has to push
+        ``undo_depth`` entries of it again. Every committed change pushes
+        one; an UNDO record popped ``aux`` entries that were pushed before
+        it, so those have to be replayed as well.
+        """
+        needed = undo_depth
+        for index in range(len(self) - 1, -1, -1):
+            offset = _HEADER.size + index * _RECORD.size
+            kind = self._mm[offset]
+            if kind == SNAPSHOT:
+                if needed <= 0:
+                    return index
+            elif kind == UNDO:
+                needed += _RECORD.unpack_from(self._mm, offset)[4]
+            elif kind != REJECT:
+                needed -= 1
+        return 0
+
+    def _grow(self) -> None:
+        size = len(self._mm) + _GROW_BYTES
+        self._mm.flush()
+        self._mm.close()
+        self._file.truncate(size)
+        self._mm = mmap.mmap(self._file.fileno(), 0)
+        self._size = size
+
+
+class JournaledCalculator(Calculator):
+    """
+    Calculator whose committed changes are recorded in a CalculatorJournal.
+
+    Same public API as Calculator, plus:
+      - undo(steps)   # multi-level undo, up to undo_depth commits back
+
+    Opening an existing journal restores the session. Each operation costs
+    one record packed into the memory-mapped journal; a plain Calculator is
+    unaffected.
+    """
+
+    __slots__ = ("journal", "undo_depth", "_history")
+
+    def __init__(self, journal: CalculatorJournal, max_value: Number = 1000,
+                 undo_depth: int = 64):
+        super().__init__(journal.precision, max_value)
+        if self.max_value.is_finite() and abs(journal.to_quanta(self.max_value)) > _INT64_MAX:
+            raise ValueError("max_value too large for the journal")
+        self.journal = journal
+        self.undo_depth = int(undo_depth)
+        self._history = deque(maxlen=self.undo_depth)
+        if len(journal):
+            journal.restore(self, self.undo_depth)
+        else:
+            journal.snapshot(self._total, self._last_total)
+
+    # Public API ---------------------------------------------------------
+
+    def add(self, value: Number) -> Decimal:
+        return self._journaled(Calculator.add, "add", value)
+
+    def subtract(self, value: Number) -> Decimal:
+        return self._journaled(Calculator.subtract, "subtract", value)
+
+    def multiply(self, factor: Number) -> Decimal:
+        return self._journaled(Calculator.multiply, "multiply", factor)
+
+    def divide(self, divisor: Number) -> Decimal:
+        return self._journaled(Calculator.divide, "divide", divisor)
+
+    def percent(self, value: Number) -> Decimal:
+        return self._journaled(Calculator.percent, "percent", value)
+
+    def percent_add(self, value: Number) -> Decimal:
+        return self._journaled(Calculator.percent_add, "percent_add", value)
+
+    def percent_substract(self, value: Number) -> Decimal:
+        return self._journaled(Calculator.percent_substract, "percent_substract", value)
+
+    def clear(self) -> Decimal:
+        if self._last_total is None:
+            return self._total
+        self._history.append(self._total)
+        total = super().clear()
+        self._record(CLEAR)
+        return total
+
+    def clear_all(self) -> Decimal:
+        self._history.append(self._total)
+        total = super().clear_all()
+        self._record(CLEAR_ALL)
+        return total
+
+    def run(self, program: Iterable[Step]) -> Decimal:
+        prev, prev_last = self._total, self._last_total
+        total = super().run(program)
+        if total is not prev or self._last_total is not prev_last:
+            self._history.append(prev)
+            self._record(RUN, flags=_HAS_UNDO if self._last_total is not None else 0)
+        return total
+
+    def undo(self, steps: int = 1) -> Decimal:
+        """Restore the total from ``steps`` commits ago.
+
+        Steps beyond the available history stop at the oldest kept total.
+        Like clear(), this leaves no one-shot undo behind. Returns the new
+        current total.
+        """
+        if steps < 1 or not self._history:
+            return self._total
+        taken = min(steps, len(self._history))
+        for _ in range(taken):
+            total = self._history.pop()
+        self._total = total
+        self._last_total = None
+        self._record(UNDO, aux=taken)
+        return self._total
+
+    # Internal helpers (non-public) -------------------------------------
+
+    def _journaled(self, method, name: str, value: Number) -> Decimal:
+        prev, prev_last = self._total, self._last_total
+        try:
+            total = method(self, value)
+        except ValueError:
+            if self._last_total is not prev_last:
+                # overflow still moved the one-shot undo onto the current total
+                self._record(REJECT)
+            raise
+        self._history.append(prev)
+        journal = self.journal
+        journal.append(OP, total, _OP_CODES[name])
+        if journal.needs_snapshot():
+            journal.snapshot(total, self._last_total)
+        return total
+
+    def _record(self, kind: int, op: int = 0, aux: int = 0, flags: int = 0) -> None:
+        journal = self.journal
+        journal.append(kind, self._total, op, aux, flags)
+        if journal.needs_snapshot():
+            journal.snapshot(self._total, self._last_total)
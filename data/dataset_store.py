@@ -0,0 +1,215 @@
+# SQLite store for the synthetic examples (PLAN.md Phase 1: "store synthetic
+# data in an sqlite db in /data", with an "add_results" column holding the
+# correct answer).
+#
+#   store = DatasetStore("data/calculator.sqlite")
+#   store.ingest(examples, eval_fraction=0.05)     # batched, duplicates skipped
+#   for example in store.iter_examples(split="eval", operation="add"):
+#       ...                                        # streamed, fetchmany batches
+#   store.stats()
+#
+#   python -m data.dataset_store ingest data/calculator.sqlite calculator_dataset.jsonl --eval_fraction 0.05
+#   python -m data.dataset_store stats data/calculator.sqlite
+#
+# The database runs in WAL mode so evaluation or training can read while an
+# ingest is writing. Each example gets a deterministic split from its content
+# hash, so re-ingesting the same corpus reproduces the same held-out set, and
+# add_results is the total after replaying its tool_calls on a fresh
+# Calculator (NULL when the calls do not run, e.g. an unknown tool).
+
+import argparse
+import gzip
+import hashlib
+import json
+import sqlite3
+
+from app.calculator_interface import validate_call
+from calculator import Calculator
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS examples (
+    id          INTEGER PRIMARY KEY,
+    hash        INTEGER NOT NULL UNIQUE,
+    user        TEXT NOT NULL,
+    tool_calls  TEXT NOT NULL,
+    template    TEXT,
+    operation   TEXT NOT NULL,
+    split       TEXT NOT NULL,
+    add_results TEXT
+);
+CREATE INDEX IF NOT EXISTS examples_template ON examples (template);
+CREATE INDEX IF NOT EXISTS examples_operation ON examples (operation);
+CREATE INDEX IF NOT EXISTS examples_split ON examples (split);
+"""
+
+_COLUMNS = "user, tool_calls, template, add_results"
+
+# hash buckets for the deterministic train/eval split
+_SPLIT_BUCKETS = 10000
+
+# the labelling Calculator's max_value: the app's default of 1000 would leave
+# ordinary totals such as 999 + 999 unlabelled, so allow a few sums of the
+# largest numbers data.number_words writes (below 10**18)
+_MAX_TOTAL = 10 ** 21
+
+
+def expected_total(calls):
+    """Total after running ``calls`` on a fresh Calculator; None if they fail."""
+    try:
+        program = [(call["name"],) + validate_call(call["name"], call.get("arguments", {}))
+                   for call in calls]
+        return Calculator(max_value=_MAX_TOTAL).run(program)
+    except (KeyError, TypeError, ValueError, ArithmeticError):
+        return None
+
+
+def example_hash(example):
+    """Signed 64-bit content hash of an example's user text and tool_calls."""
+    content = json.dumps([example["user"], example["tool_calls"]], separators=(",", ":"))
+    return int.from_bytes(hashlib.blake2b(content.encode(), digest_size=8).digest(), "big", signed=True)
+
+
+def operation_of(calls):
+    """The distinct tool names of ``calls``, sorted and joined by '+'."""
+    return "+".join(sorted({call["name"] for call in calls}))
+
+
+def read_jsonl(path):
+    """Yield the examples of a JSONL (or .jsonl.gz) file one at a time."""
+    opener = gzip.open if str(path).endswith(".gz") else open
+    with opener(path, "rt") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+class DatasetStore:
+    """
+    Examples in SQLite.
+
+      - ingest(examples, split=None, eval_fraction=0.0)  # rows added
+      - iter_examples(split=, template=, operation=)     # streamed dicts
+      - count(split=, template=, operation=)
+      - stats()                                          # counts per split/operation/template
+      - close()
+    """
+
+    def __init__(self, path, batch_size=1000):
+        self.path = str(path)
+        self.batch_size = batch_size
+        self._db = sqlite3.connect(self.path)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+
+    def ingest(self, examples, split=None, eval_fraction=0.0):
+        """Insert examples in transactions of ``batch_size``; returns rows added.
+
+        With ``split`` every example goes to that split; otherwise it is
+        "eval" for a deterministic ``eval_fraction`` of content hashes and
+        "train" for the rest. Examples already stored are skipped.
+        """
+        added = 0
+        batch = []
+        for example in examples:
+            batch.append(self._row(example, split, eval_fraction))
+            if len(batch) == self.batch_size:
+                added += self._insert(batch)
+                batch = []
+        if batch:
+            added += self._insert(batch)
+        return added
+
+    def iter_examples(self, split=None, template=None, operation=None):
+        """Yield matching examples in insertion order without loading them all.
+
+        Each is ``{"user", "tool_calls", "template", "add_results"}``, with
+        add_results as a string (or None).
+        """
+        where, params = self._where(split, template, operation)
+        # a separate connection, so a long read never blocks ingest() on this one
+        db = sqlite3.connect(self.path)
+        try:
+            cursor = db.execute(f"SELECT {_COLUMNS} FROM examples{where} ORDER BY id", params)
+            while True:
+                rows = cursor.fetchmany(self.batch_size)
+                if not rows:
+                    return
+                for user, tool_calls, template_, add_results in rows:
+                    yield {"user": user, "tool_calls": json.loads(tool_calls),
+                           "template": template_, "add_results": add_results}
+        finally:
+            db.close()
+
+    def count(self, split=None, template=None, operation=None):
+        where, params = self._where(split, template, operation)
+        return self._db.execute(f"SELECT COUNT(*) FROM examples{where}", params).fetchone()[0]
+
+    def stats(self):
+        out = {"examples": self.count()}
+        for column in ("split", "operation", "template"):
+            rows = self._db.execute(
+                f"SELECT {column}, COUNT(*) FROM examples GROUP BY {column} ORDER BY {column}")
+            out[column] = {key: n for key, n in rows}
+        return out
+
+    def close(self):
+        self._db.close()
+
+    # Internal helpers (non-public) -------------------------------------
+
+    def _row(self, example, split, eval_fraction):
+        calls = example["tool_calls"]
+        digest = example_hash(example)
+        if split is None:
+            split = "eval" if digest % _SPLIT_BUCKETS < eval_fraction * _SPLIT_BUCKETS else "train"
+        total = expected_total(calls)
+        return (digest, example["user"], json.dumps(calls, separators=(",", ":")),
+                example.get("template"), operation_of(calls), split,
+                None if total is None else str(total))
+
+    def _insert(self, rows):
+        with self._db:
+            before = self._db.total_changes
+            self._db.executemany(
+                "INSERT OR IGNORE INTO examples (hash, user, tool_calls, template, operation, split, add_results)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+            return self._db.total_changes - before
+
+    @staticmethod
+    def _where(split, template, operation):
+        clauses, params = [], []
+        for column, value in (("split", split), ("template", template), ("operation", operation)):
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    commands = parser.add_subparsers(dest='command', required=True)
+    ingest = commands.add_parser('ingest', help='add JSONL (or .jsonl.gz) files to the store')
+    ingest.add_argument('db')
+    ingest.add_argument('inputs', nargs='+')
+    ingest.add_argument('--split', default=None, help='put everything in this split')
+    ingest.add_argument('--eval_fraction', type=float, default=0.0,
+                        help='fraction of examples held out as the "eval" split')
+    ingest.add_argument('--batch_size', type=int, default=1000)
+    stats = commands.add_parser('stats', help='counts per split, operation and template')
+    stats.add_argument('db')
+    args = parser.parse_args()
+
+    if args.command == 'ingest':
+        store = DatasetStore(args.db, args.batch_size)
+        for path in args.inputs:
+            added = store.ingest(read_jsonl(path), args.split, args.eval_fraction)
+            print(f"{path}: {added} examples added")
+    else:
+        store = DatasetStore(args.db)
+    print(json.dumps(store.stats(), indent=1))
+    store.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,16 +1,38 @@
 # Creates training examples.
+#
+#   python -m data.generate_dataset                                 # 500 add examples → calculator_dataset.jsonl
+#   python -m data.generate_dataset --count 1000000 --shards 16 --workers 8 \
+#       --mix add=8,total=1,clear=1 --compress --output corpus/calc.jsonl
+#
+# Examples are produced lazily from a stream of fixed-size chunks; chunk i is
+# generated with its own Random seeded from (seed, i), so the output depends
+# only on --seed, --chunk_size and --mix, not on the number of workers.
+# Chunks are generated in a process pool; the main process drops duplicates
+# (by content hash) and writes the first --count unique examples, split
+# evenly over --shards files, optionally gzip-compressed. Operations with
+# few distinct sentences (total, clear) therefore appear only a handful of
+# times whatever their weight; pass --no_dedup to keep the mix exact.
+#
+# GENERATORS maps an operation name (as used in --mix) to a function
+# ``make(rng) -> example``; new operations only need an entry there.
 
+import argparse
+import gzip
+import hashlib
 import json
 import random
-from .templates import ADD_TEMPLATES
+import time
+from collections import deque
+
+from .templates import ADD_TEMPLATES, CLEAR_TEMPLATES, TOTAL_TEMPLATES
 from .number_words import to_words
 
 
-def make_add_example():
-    a, b = random.randint(1, 100), random.randint(1, 100)
-    template = random.choice(ADD_TEMPLATES)
+def make_add_example(rng=random):
+    a, b = rng.randint(1, 100), rng.randint(1, 100)
+    template = rng.choice(ADD_TEMPLATES)
     if "{c}" in template:
-        c = random.randint(1, 100)
+        c = rng.randint(1, 100)
         sentence = template.format(a=to_words(a), b=to_words(b), c=to_words(c))
         numbers = [a, b, c]
     else:
@@ -18,10 +40,186 @@ def make_add_example():
         numbers = [a, b]
     # Emit a sequence of tool calls (one add per number)
     tool_calls = [{"name": "add", "arguments": {"number": n}} for n in numbers]
-    return {"user": sentence, "tool_calls": tool_calls}
+    return {"user": sentence, "tool_calls": tool_calls, "template": template}
+
+
+def make_total_example(rng=random):
+    template = rng.choice(TOTAL_TEMPLATES)
+    return {"user": template, "tool_calls": [{"name": "get_total", "arguments": {}}], "template": template}
+
+
+def make_clear_example(rng=random):
+    template = rng.choice(CLEAR_TEMPLATES)
+    return {"user": template, "tool_calls": [{"name": "clear_all", "arguments": {}}], "template": template}
+
+
+GENERATORS = {
+    "add": make_add_example,
+    "total": make_total_example,
+    "clear": make_clear_example,
+}
+
+DEFAULT_MIX = {"add": 1.0}
+
+
+def parse_mix(text):
+    """"add=8,total=1" → {"add": 8.0, "total": 1.0}; raises ValueError."""
+    mix = {}
+    for part in text.split(","):
+        name, sep, weight = part.partition("=")
+        name = name.strip()
+        if name not in GENERATORS:
+            raise ValueError(f"Unknown operation {name!r}; expected one of {', '.join(GENERATORS)}")
+        mix[name] = float(weight) if sep else 1.0
+        if mix[name] < 0:
+            raise ValueError(f"Negative weight for {name!r}")
+    if not sum(mix.values()):
+        raise ValueError("The mix needs at least one positive weight")
+    return mix
+
+
+def iter_examples(seed=0, mix=None, chunk_size=1024):
+    """Endless example stream: the chunks of generate_chunk() in order."""
+    index = 0
+    while True:
+        yield from chunk_examples(seed, index, chunk_size, mix)
+        index += 1
+
+
+def chunk_examples(seed, index, size, mix=None):
+    """The ``size`` examples of chunk ``index``, drawn with Random(f"{seed}:{index}")."""
+    mix = mix or DEFAULT_MIX
+    rng = random.Random(f"{seed}:{index}")
+    for name in rng.choices(list(mix), list(mix.values()), k=size):
+        yield GENERATORS[name](rng)
+
+
+def generate_chunk(task):
+    """Chunk ``index`` of the stream as [(content hash, JSON line)].
+
+    ``task`` is ``(seed, index, size, mix)``; the same task always gives
+    the same chunk.
+    """
+    out = []
+    for example in chunk_examples(*task):
+        line = json.dumps(example)
+        digest = int.from_bytes(hashlib.blake2b(line.encode(), digest_size=8).digest(), "big")
+        out.append((digest, line))
+    return out
+
+
+def shard_paths(output, shards, compress=False):
+    """File names for ``shards`` shards of ``output`` (one shard keeps the name)."""
+    suffix = ".gz" if compress else ""
+    if shards == 1:
+        return [output + suffix]
+    stem, dot, ext = output.rpartition(".")
+    if not dot:
+        stem, ext = output, "jsonl"
+    return [f"{stem}-{i:05d}-of-{shards:05d}.{ext}{suffix}" for i in range(shards)]
+
+
+def write_dataset(output, count, shards=1, workers=1, seed=0, mix=None, chunk_size=1024,
+                  compress=False, dedup=True, progress=None):
+    """Write ``count`` examples over ``shards`` files; returns a stats dict.
+
+    Stops early (with fewer examples) when a whole chunk adds nothing new,
+    i.e. the mix cannot produce more distinct examples.
+    """
+    start = time.perf_counter()
+    paths = shard_paths(output, shards, compress)
+    per_shard = [count // shards + (i < count % shards) for i in range(shards)]
+    opener = gzip.open if compress else open
+    files = [opener(path, "wt") for path in paths]
+    seen = set()
+    written = generated = duplicates = 0
+    shard, in_shard = 0, 0
+    try:
+        for chunk in _chunks(seed, mix, chunk_size, workers):
+            new = 0
+            for digest, line in chunk:
+                generated += 1
+                if dedup:
+                    if digest in seen:
+                        duplicates += 1
+                        continue
+                    seen.add(digest)
+                while in_shard == per_shard[shard]:
+                    shard, in_shard = shard + 1, 0
+                files[shard].write(line + "\n")
+                in_shard += 1
+                written += 1
+                new += 1
+                if written == count:
+                    break
+            if progress is not None:
+                progress(written, time.perf_counter() - start)
+            if written == count or not new:
+                break
+    finally:
+        for f in files:
+            f.close()
+    elapsed = time.perf_counter() - start
+    return {
+        "paths": paths,
+        "written": written,
+        "generated": generated,
+        "duplicates": duplicates,
+        "seconds": elapsed,
+        "examples_per_sec": written / elapsed if elapsed else 0.0,
+    }
+
+
+# Internal helpers (non-public) -------------------------------------
+
+def _chunks(seed, mix, chunk_size, workers):
+    """Chunks 0, 1, 2, ... in order, generated by ``workers`` processes.
+
+    At most two chunks per worker are in flight; the consumer stops the
+    stream by breaking out of the loop.
+    """
+    if workers <= 1:
+        index = 0
+        while True:
+            yield generate_chunk((seed, index, chunk_size, mix))
+            index += 1
+
+    import multiprocessing
+
+    with multiprocessing.Pool(workers) as pool:
+        pending, index = deque(), 0
+        while True:
+            while len(pending) < 2 * workers:
+                pending.append(pool.apply_async(generate_chunk, ((seed, index, chunk_size, mix),)))
+                index += 1
+            yield pending.popleft().get()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--output', default='calculator_dataset.jsonl')
+    parser.add_argument('--count', type=int, default=500)
+    parser.add_argument('--shards', type=int, default=1)
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--mix', default='add', help='operation weights, e.g. add=8,total=1,clear=1')
+    parser.add_argument('--chunk_size', type=int, default=1024)
+    parser.add_argument('--compress', action='store_true', help='gzip each shard (.jsonl.gz)')
+    parser.add_argument('--no_dedup', action='store_true', help='keep duplicate examples')
+    args = parser.parse_args()
+
+    def progress(written, seconds):
+        print(f"\r{written}/{args.count} examples, {written / seconds:,.0f}/s", end="", flush=True)
+
+    stats = write_dataset(args.output, args.count, args.shards, args.workers, args.seed,
+                          parse_mix(args.mix), args.chunk_size, args.compress,
+                          dedup=not args.no_dedup, progress=progress)
+    print(f"\nWrote {stats['written']} examples to {len(stats['paths'])} file(s) in {stats['seconds']:.1f}s "
+          f"({stats['examples_per_sec']:,.0f}/s); dropped {stats['duplicates']} duplicates "
+          f"of {stats['generated']} generated")
+    if stats["written"] < args.count:
+        print("Stopped early: the mix produced no new examples in a whole chunk")
 
 
-with open("calculator_dataset.jsonl", "w") as f:
-    for _ in range(500):
-        example = make_add_example()
-        f.write(json.dumps(example) + "\n")
+if __name__ == '__main__':
+    main()
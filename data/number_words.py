@@ -1,6 +1,172 @@
-# Converts numbers to words to create synthetic data
+# Converts numbers to words to create synthetic data, and back.
+#
+#   to_words(1234.5)   # "one thousand, two hundred and thirty-four point five"
+#   to_number("one hundred and one thousand")   # Decimal('101000')
+#   read_words(["add", "seven", "and", "nine"], 1)  # (Decimal('7'), 2), for parsers
+#
+# to_words gives the same text as num2words(n) (English) without calling it:
+# every number below 1000 is a precomputed table entry, and larger numbers are
+# composed from those with num2words' rules (PLAN.md Phase 3):
+#
+#   - a scale word after each group: "two million", "one hundred thousand"
+#   - " and " before a final part below 100: "one thousand and five"
+#   - ", " before a final part of 100 or more: "one thousand, two hundred"
+#   - decimals digit by digit after "point", negatives after "minus"
+#
+# The one deliberate difference: num2words drops the sign of numbers between
+# -1 and 0 ("zero point five" for -0.5); to_words writes "minus zero point five".
+# Magnitudes of 10**18 and above are passed on to num2words.
+#
+# to_number reads that text back through a trie of the 0..999 phrases;
+# read_words is the same reader for a number inside a longer utterance
+# (inference/fast_path.py).
+
+from decimal import Decimal
+
+_UNITS = "zero one two three four five six seven eight nine".split()
+_TEENS = "ten eleven twelve thirteen fourteen fifteen sixteen seventeen eighteen nineteen".split()
+_TENS = "_ _ twenty thirty forty fifty sixty seventy eighty ninety".split()
+_SCALES = ((10 ** 15, "quadrillion"), (10 ** 12, "trillion"), (10 ** 9, "billion"),
+           (10 ** 6, "million"), (10 ** 3, "thousand"))
+_LIMIT = 10 ** 18
+
+
+def _below_100(n):
+    if n < 10:
+        return _UNITS[n]
+    if n < 20:
+        return _TEENS[n - 10]
+    tens, units = divmod(n, 10)
+    return _TENS[tens] + ("-" + _UNITS[units] if units else "")
+
+
+def _below_1000(n):
+    hundreds, rest = divmod(n, 100)
+    if not hundreds:
+        return _below_100(rest)
+    head = _UNITS[hundreds] + " hundred"
+    return head + " and " + _below_100(rest) if rest else head
+
+
+WORDS = tuple(_below_1000(n) for n in range(1000))
 
-from num2words import num2words
 
 def to_words(n):
-    return num2words(n)
+    """English words for an int, float or Decimal, as num2words writes them."""
+    if n == int(n):
+        n = int(n)
+        if n < 0:
+            return "minus " + to_words(-n)
+        if n < 1000:
+            return WORDS[n]
+        if n >= _LIMIT:
+            from num2words import num2words
+            return num2words(n)
+        return _compose(n)
+    # num2words reads the digits of the float, so Decimal("1.10") is "one point one"
+    text = format(Decimal(repr(float(n))), "f")
+    sign = "minus " if text.startswith("-") else ""
+    whole, _, fraction = text.lstrip("-").partition(".")
+    digits = " ".join(_UNITS[int(d)] for d in fraction)
+    return f"{sign}{to_words(int(whole))} point {digits}"
+
+
+def to_number(text):
+    """The Decimal that ``text`` (as written by to_words) names; raises ValueError."""
+    tokens = text.lower().replace("-", " ").replace(",", " , ").split()
+    if not tokens:
+        raise ValueError("No number words")
+    sign, i = 1, 0
+    if tokens[0] == "minus":
+        sign, i = -1, 1
+    number = read_words(tokens, i)
+    if number is None or number[1] != len(tokens):
+        raise ValueError(f"Not a number: {text!r}")
+    return sign * number[0]
+
+
+def read_words(tokens, i=0):
+    """Read the longest unsigned number in words at ``tokens[i]``.
+
+    ``tokens`` are lowercase words with hyphens split and "," as a token of
+    its own. Returns ``(Decimal value, next index)``, or None when no number
+    starts at ``i``. Reading stops before anything that cannot continue the
+    number, so "one thousand two thousand" is read as 1000 first.
+    """
+    if i >= len(tokens) or (tokens[i] not in _TRIE and tokens[i] != "zero"):
+        return None  # the common case in an utterance: not a number word
+    if tokens[i] == "zero":
+        value, i = 0, i + 1
+    else:
+        value, i = _read_groups(tokens, i)
+        if value is None:
+            return None
+    result = Decimal(value)
+    if i + 1 < len(tokens) and tokens[i] == "point" and tokens[i + 1] in _DIGITS:
+        i += 1
+        digits = []
+        while i < len(tokens) and tokens[i] in _DIGITS:
+            digits.append(_DIGITS[tokens[i]])
+            i += 1
+        result += Decimal("0." + "".join(digits))
+    return result, i
+
+
+# Internal helpers (non-public) -------------------------------------
+
+def _compose(n):
+    for scale, name in _SCALES:
+        if n >= scale:
+            high, rest = divmod(n, scale)
+            head = f"{to_words(high)} {name}"
+            if not rest:
+                return head
+            return f"{head} and {WORDS[rest]}" if rest < 100 else f"{head}, {to_words(rest)}"
+    return WORDS[n]
+
+
+def _build_trie():
+    trie = {}
+    for value in range(1, 1000):
+        node = trie
+        for token in WORDS[value].replace("-", " ").split():
+            node = node.setdefault(token, {})
+        node[None] = value  # None marks the end of a phrase
+    return trie
+
+
+_TRIE = _build_trie()
+_SCALE_VALUES = {name: scale for scale, name in _SCALES}
+_DIGITS = {word: str(d) for d, word in enumerate(_UNITS)}
+
+
+def _match(tokens, i):
+    """Longest 1..999 phrase at tokens[i]: (value, next index) or (None, i)."""
+    node, best = _TRIE, (None, i)
+    while i < len(tokens) and tokens[i] in node:
+        node = node[tokens[i]]
+        i += 1
+        if None in node:
+            best = (node[None], i)
+    return best
+
+
+def _read_groups(tokens, i):
+    """Groups like "two million, three hundred thousand and five": (value, next index).
+
+    The value is None when no group starts at ``i``.
+    """
+    total, smallest, end = None, None, i
+    while True:
+        value, i = _match(tokens, i)
+        if value is None:
+            return total, end  # a separator not followed by a group is left unread
+        scale = _SCALE_VALUES.get(tokens[i]) if i < len(tokens) else None
+        if scale is not None and smallest is not None and scale >= smallest:
+            return total, end  # "one thousand and two thousand": the next number starts there
+        if scale is None:
+            return (total or 0) + value, i
+        total, smallest = (total or 0) + value * scale, scale
+        end = i = i + 1
+        if i < len(tokens) and tokens[i] in (",", "and"):
+            i += 1
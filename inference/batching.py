@@ -0,0 +1,186 @@
+"""Dynamic micro-batching for model generation.
+
+MicroBatcher collects prompts submitted from many threads for up to
+``max_wait_ms`` (or until ``max_batch_size`` are pending) and runs them as one
+batch; generate_batch is the batched greedy decoder it is normally given:
+
+  batcher = MicroBatcher(run_agent.generate_many, max_batch_size=8, max_wait_ms=10)
+  text = batcher("What is 7 and 9?")   # blocks until this prompt's batch is done
+
+generate_batch left-pads the prompts, prefills them together and then decodes
+one token per step for the rows that are still running. A row that emits an
+end-of-sequence token is dropped from the batch (and from the KV cache), so
+short answers stop costing compute as soon as they finish instead of padding
+along until the longest one is done. Outputs match the new tokens of an
+unbatched greedy ``model.generate`` decoded with ``skip_special_tokens=True``;
+the prompt is not part of them.
+"""
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+_STOP = object()
+
+
+class MicroBatcher:
+    """
+    Runs ``run_batch(items) -> results`` on batches of submitted items.
+
+      - submit(item)   # Future of the item's result
+      - batcher(item)  # blocking: submit(item).result()
+      - stats()        # batches run, items, mean and largest batch
+      - close()
+
+    A batch starts when the first item arrives and closes once it holds
+    ``max_batch_size`` items or ``max_wait_ms`` has passed. If ``run_batch``
+    raises, every item in that batch gets the exception.
+    """
+
+    def __init__(self, run_batch, max_batch_size=8, max_wait_ms=10.0):
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1")
+        self.run_batch = run_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1e3
+        self._queue = queue.Queue()
+        self._batches = 0
+        self._items = 0
+        self._largest = 0
+        self._thread = threading.Thread(target=self._loop, name="micro-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, item):
+        future = Future()
+        self._queue.put((item, future))
+        return future
+
+    def __call__(self, item):
+        return self.submit(item).result()
+
+    def stats(self):
+        return {
+            "batches": self._batches,
+            "items": self._items,
+            "mean_batch": self._items / self._batches if self._batches else 0.0,
+            "largest_batch": self._largest,
+        }
+
+    def close(self):
+        self._queue.put(_STOP)
+        self._thread.join()
+
+    # Internal helpers (non-public) -------------------------------------
+
+    def _loop(self):
+        stopping = False
+        while not stopping:
+            first = self._queue.get()
+            if first is _STOP:
+                break
+            batch = [first]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    entry = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if entry is _STOP:
+                    stopping = True
+                    break
+                batch.append(entry)
+            self._run(batch)
+
+    def _run(self, batch):
+        # skip callers that cancelled while waiting for the window to close
+        batch = [(item, future) for item, future in batch if future.set_running_or_notify_cancel()]
+        if not batch:
+            return
+        self._batches += 1
+        self._items += len(batch)
+        self._largest = max(self._largest, len(batch))
+        try:
+            results = self.run_batch([item for item, _ in batch])
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        for (_, future), result in zip(batch, results):
+            future.set_result(result)
+
+
+def generate_batch(tokenizer, model, prompts, max_new_tokens=200):
+    """Greedy-decode several prompts in one left-padded batch.
+
+    Returns the decoded completion (new tokens only) of each prompt, in
+    order, like ``tokenizer.decode(model.generate(...)[0][len(prompt_ids):],
+    skip_special_tokens=True)``.
+    """
+    import torch
+
+    device = model.device
+    eos_ids = _eos_token_ids(tokenizer, model)
+    pad_id = tokenizer.pad_token_id
+    if pad_id is None:
+        pad_id = min(eos_ids)
+
+    encoded = [tokenizer(prompt)["input_ids"] for prompt in prompts]
+    width = max(len(ids) for ids in encoded)
+    input_ids = torch.full((len(encoded), width), pad_id, dtype=torch.long)
+    mask = torch.zeros((len(encoded), width), dtype=torch.long)
+    for row, ids in enumerate(encoded):
+        input_ids[row, width - len(ids):] = torch.tensor(ids, dtype=torch.long)
+        mask[row, width - len(ids):] = 1
+    input_ids, mask = input_ids.to(device), mask.to(device)
+    # left padding: real tokens keep the positions they would have unpadded
+    positions = (mask.cumsum(-1) - 1).clamp(min=0)
+
+    generated = [[] for _ in encoded]
+    active = list(range(len(encoded)))  # prompt index of each live row
+    past = None
+    with torch.no_grad():
+        for _ in range(max_new_tokens):
+            out = model(input_ids=input_ids, attention_mask=mask, position_ids=positions,
+                        past_key_values=past, use_cache=True)
+            past = out.past_key_values
+            next_tokens = out.logits[:, -1, :].argmax(-1).tolist()
+            keep = []
+            for row, token in enumerate(next_tokens):
+                generated[active[row]].append(token)
+                if token not in eos_ids:
+                    keep.append(row)
+            if not keep:
+                break
+            if len(keep) < len(active):
+                # retire finished rows before the next step
+                rows = torch.tensor(keep, device=device)
+                past = _select_rows(past, rows)
+                mask, positions = mask[rows], positions[rows]
+                active = [active[row] for row in keep]
+                next_tokens = [next_tokens[row] for row in keep]
+            input_ids = torch.tensor(next_tokens, dtype=torch.long, device=device).unsqueeze(-1)
+            mask = torch.cat([mask, mask.new_ones((len(active), 1))], dim=1)
+            positions = positions[:, -1:] + 1
+
+    return [tokenizer.decode(tokens, skip_special_tokens=True) for tokens in generated]
+
+
+def _eos_token_ids(tokenizer, model):
+    ids = set()
+    config_eos = getattr(getattr(model, "generation_config", None), "eos_token_id", None)
+    for value in (config_eos, tokenizer.eos_token_id):
+        if isinstance(value, int):
+            ids.add(value)
+        elif value is not None:
+            ids.update(value)
+    return ids
+
+
+def _select_rows(past, rows):
+    """Keep only ``rows`` of a KV cache (Cache object or legacy tuples)."""
+    if hasattr(past, "batch_select_indices"):
+        past.batch_select_indices(rows)
+        return past
+    return tuple(tuple(tensor[rows] for tensor in layer) for layer in past)
@@ -0,0 +1,291 @@
+"""Schema-constrained greedy decoding of the tool_calls JSON.
+
+The model may only produce text of the shape described in SYSTEM_PROMPT,
+written compactly:
+
+  {"tool_calls":[{"name":"add","arguments":{"number":7}},{"name":"get_total","arguments":{}}]}
+
+ToolCallGrammar tracks where the output is in that shape. Wherever the
+grammar admits exactly one continuation (the braces, keys and quotes, the
+``"arguments"`` part for a known tool, the rest of a tool name once its
+prefix is unambiguous) that text is appended as forced tokens without a
+model step. Forced tokens are fed to the model together with the next step.
+The model is only consulted at real choice points, and only tokens valid at
+that point compete:
+
+  - which tool to call   (known tool names only)
+  - the number argument  (digits, '-', '.' forming a JSON number, then '}')
+  - another call or end  (',' or ']')
+
+Decoding stops as soon as the top-level object closes, and the result is
+exactly that object, so no extraction heuristic is needed afterwards.
+
+ConstrainedDecoder holds the token-level tables for one tokenizer;
+decode(step, ...) drives any ``step(new_token_ids) -> next-token scores``
+callable, and model_step() builds one (a ModelStepper) for a causal LM.
+"""
+
+import re
+
+from app import metrics
+from app.calculator_interface import TOOLS, _number_argument
+
+_NUMBER_TOOLS = tuple(name for name, validate in TOOLS.items() if validate is _number_argument)
+
+_PARTIAL_NUMBER = re.compile(r"-?(?:0|[1-9][0-9]*)?(?:(?<=[0-9])\.[0-9]*)?\Z")
+_COMPLETE_NUMBER = re.compile(r"-?(?:0|[1-9][0-9]*)(?:\.[0-9]+)?\Z")
+
+_NAME, _NUMBER, _NEXT, _DONE = range(4)
+
+_OPEN = '{"tool_calls":['
+_CALL = '{"name":"'
+_NUMBER_ARGS = ',"arguments":{"number":'
+_NO_ARGS = ',"arguments":{}}'
+
+
+class ToolCallGrammar:
+    """
+    Character-level state of a tool_calls object being generated.
+
+      - forced()         # text that must come next ('' at a choice point)
+      - options(index)   # candidate pieces at the current choice point
+      - accepts(piece)   # whether a piece is a valid continuation here
+      - advance(text)    # append forced text or an accepted piece
+      - text, done, steps
+    """
+
+    def __init__(self, tools=TOOLS, max_calls=16, max_number_chars=24):
+        self.names = [name + '"' for name in tools]
+        self.number_tools = {name for name in tools if name in _NUMBER_TOOLS}
+        self.max_calls = max_calls
+        self.max_number_chars = max_number_chars
+        self.text = ""
+        self.calls = 0
+        self.steps = 0  # choices made by the model
+        self._state = _NAME
+        self._buffer = ""  # tool name or number so far
+        self._pending = _OPEN + _CALL
+
+    @property
+    def done(self):
+        return self._state == _DONE and not self._pending
+
+    def forced(self):
+        return self._pending
+
+    def options(self, index):
+        if self._state == _NAME:
+            out = set()
+            for name in self.names:
+                if name.startswith(self._buffer):
+                    rest = name[len(self._buffer):]
+                    out.update(rest[:k] for k in range(1, len(rest) + 1))
+            return out
+        if self._state == _NUMBER:
+            return index.numeric + ["}"]
+        if self._state == _NEXT:
+            return [",", "]"]
+        return []
+
+    def accepts(self, piece):
+        if self._pending or not piece:
+            return False
+        if self._state == _NAME:
+            text = self._buffer + piece
+            return any(name.startswith(text) for name in self.names)
+        if self._state == _NUMBER:
+            if piece == "}":
+                return bool(_COMPLETE_NUMBER.match(self._buffer))
+            text = self._buffer + piece
+            return len(text) <= self.max_number_chars and bool(_PARTIAL_NUMBER.match(text))
+        if self._state == _NEXT:
+            return piece in (",", "]")
+        return False
+
+    def advance(self, text):
+        if self._pending:
+            if not self._pending.startswith(text):
+                raise ValueError(f"Expected {self._pending!r}, got {text!r}")
+            self.text += text
+            self._pending = self._pending[len(text):]
+            return
+        if not self.accepts(text):
+            raise ValueError(f"Invalid continuation {text!r}")
+        self.text += text
+        self.steps += 1
+        if self._state == _NAME:
+            self._buffer += text
+            self._after_name_piece()
+        elif self._state == _NUMBER:
+            if text == "}":
+                # the model closed "arguments"; the call's own brace is forced
+                self._end_call("}")
+            else:
+                self._buffer += text
+        elif self._state == _NEXT:
+            if text == ",":
+                self._start_call()
+            else:
+                self._state, self._pending = _DONE, "}"
+
+    # Internal helpers (non-public) -------------------------------------
+
+    def _after_name_piece(self):
+        matches = [name for name in self.names if name.startswith(self._buffer)]
+        if self._buffer in matches:
+            self._name_done(self._buffer[:-1])
+        elif len(matches) == 1:
+            # unambiguous prefix: the rest of the name is forced
+            self._pending = matches[0][len(self._buffer):]
+            self._buffer = matches[0]
+            self._name_done(self._buffer[:-1], pending=self._pending)
+
+    def _name_done(self, name, pending=""):
+        self._buffer = ""
+        if name in self.number_tools:
+            self._state, self._pending = _NUMBER, pending + _NUMBER_ARGS
+        else:
+            self._end_call(pending + _NO_ARGS)
+
+    def _end_call(self, pending):
+        self._pending = pending
+        self._buffer = ""
+        self.calls += 1
+        if self.calls >= self.max_calls:
+            self._state = _DONE
+            self._pending += "]}"
+        else:
+            self._state = _NEXT
+
+    def _start_call(self):
+        self._state, self._buffer, self._pending = _NAME, "", _CALL
+
+
+class ConstrainedDecoder:
+    """
+    Token tables for constrained decoding with one tokenizer.
+
+      - decode(step, max_calls=16)   # JSON text of the tool_calls object
+      - choose(grammar, scores)      # best valid piece at a choice point
+      - model_step(model, ...)       # ModelStepper for a causal LM
+
+    Only vocabulary pieces that are plain printable ASCII without spaces are
+    used: the compact JSON never needs anything else.
+    """
+
+    def __init__(self, tokenizer):
+        self.tokenizer = tokenizer
+        special = set(getattr(tokenizer, "all_special_tokens", ()))
+        self.pieces = {}
+        for piece, token_id in tokenizer.get_vocab().items():
+            if piece in special or not piece.isascii() or not piece.isprintable() or " " in piece:
+                continue
+            # keep the lowest id if a piece string occurs twice
+            if piece not in self.pieces or token_id < self.pieces[piece]:
+                self.pieces[piece] = token_id
+        self.numeric = [p for p in self.pieces if p and all(c in "-.0123456789" for c in p)]
+        self._max_piece = max(map(len, self.pieces), default=1)
+        self._encoded = {}
+
+    def encode(self, text):
+        """Token ids for forced text: greedy longest match over the pieces."""
+        ids = self._encoded.get(text)
+        if ids is not None:
+            return ids
+        ids, i = [], 0
+        while i < len(text):
+            for k in range(min(self._max_piece, len(text) - i), 0, -1):
+                token_id = self.pieces.get(text[i:i + k])
+                if token_id is not None:
+                    ids.append(token_id)
+                    i += k
+                    break
+            else:
+                ids.extend(self.tokenizer(text[i], add_special_tokens=False)["input_ids"])
+                i += 1
+        self._encoded[text] = ids
+        return ids
+
+    def decode(self, step, prompt_ids, max_calls=16):
+        """Run the grammar to completion.
+
+        ``step(ids)`` feeds new token ids (the prompt first) and returns the
+        scores of the next token, indexable by token id. Returns the JSON
+        text and the grammar (for its ``steps`` / ``calls`` counters).
+        """
+        grammar = ToolCallGrammar(max_calls=max_calls)
+        pending = list(prompt_ids)
+        while True:
+            forced = grammar.forced()
+            if forced:
+                pending.extend(self.encode(forced))
+                grammar.advance(forced)
+            if grammar.done:
+                return grammar.text, grammar
+            best = self.choose(grammar, step(pending))
+            grammar.advance(best)
+            pending = [self.pieces[best]]
+
+    def choose(self, grammar, scores):
+        """The highest-scoring piece the grammar accepts at a choice point."""
+        best, best_score = None, None
+        for piece in grammar.options(self):
+            token_id = self.pieces.get(piece)
+            if token_id is None or not grammar.accepts(piece):
+                continue
+            score = float(scores[token_id])
+            if best is None or score > best_score:
+                best, best_score = piece, score
+        if best is None:
+            raise ValueError(f"No valid token after {grammar.text!r}")
+        return best
+
+    def model_step(self, model, past_key_values=None, past_length=0):
+        """A ModelStepper running ``model`` incrementally on a KV cache."""
+        return ModelStepper(model, past_key_values, past_length)
+
+
+class ModelStepper:
+    """
+    Feeds tokens to a causal LM on a growing KV cache.
+
+      - stepper(ids)       # scores of the next token after ids
+      - forward(ids)       # scores after every one of ids, shape (len(ids), vocab)
+      - crop(length)       # drop cached tokens past ``length``
+      - length             # tokens in the cache
+
+    ``past_length`` is the number of tokens already in ``past_key_values``;
+    the attention mask is passed explicitly so exported (ONNX Runtime)
+    models work as well. The first forward pass is timed as the "prefill"
+    stage, later ones as "decode" (see app.metrics).
+    """
+
+    def __init__(self, model, past_key_values=None, past_length=0):
+        self.model = model
+        self.past = past_key_values
+        self.length = past_length
+        self.forwards = 0
+
+    def __call__(self, ids):
+        return self.forward(ids)[-1]
+
+    def forward(self, ids):
+        import torch
+
+        device = self.model.device
+        self.length += len(ids)
+        input_ids = torch.tensor([ids], device=device)
+        mask = torch.ones((1, self.length), dtype=torch.long, device=device)
+        with metrics.stage("decode" if self.forwards else "prefill"), torch.no_grad():
+            out = self.model(input_ids=input_ids, attention_mask=mask,
+                             past_key_values=self.past, use_cache=True)
+        self.past = out.past_key_values
+        self.forwards += 1
+        return out.logits[0]
+
+    def crop(self, length):
+        if hasattr(self.past, "crop"):
+            self.past.crop(length)
+        else:
+            self.past = tuple(tuple(t[..., :length, :] for t in layer) for layer in self.past)
+        self.length = length
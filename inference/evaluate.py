@@ -0,0 +1,296 @@
+"""Offline evaluation of the agent over a held-out dataset.
+
+Streams ``{"user": ..., "tool_calls": [...]}`` examples from a JSONL file
+(as written by data/generate_dataset.py) or from one split of a
+data/dataset_store.py database, answers them in batches across worker
+processes and scores every answer two ways:
+
+  - exact: the predicted tool_calls equal the expected ones (numbers compared
+    by value, so 7 and 7.0 match)
+  - total: replaying the predicted calls into a fresh Calculator gives the
+    same total as replaying the expected ones
+
+Accuracy is reported overall, per template (the example's "template" field,
+or the data/templates.py template its sentence matches) and per operation
+(every tool the expected calls use), along with examples/sec and latency
+percentiles. Modes:
+
+  pipeline   run_agent.generate: fast path, response cache, model
+  model      run_agent.generate_model: the constrained model alone
+  batched    run_agent.generate_many: one free-form batched decode per batch
+
+  python -m inference.evaluate calculator_dataset.jsonl --workers 4 --batch_size 16
+  python -m inference.evaluate heldout.jsonl --mode model --limit 1000 --report eval.json
+  python -m inference.evaluate data/calculator.sqlite --split eval --workers 4
+"""
+
+import argparse
+import json
+import os
+import re
+import time
+from collections import deque
+from decimal import Decimal
+
+from app.dispatcher import _calls_from_payload
+from data.dataset_store import DatasetStore, expected_total, read_jsonl
+from data.templates import ADD_TEMPLATES, CLEAR_TEMPLATES, TOTAL_TEMPLATES
+from inference.run_agent import _extract_json
+
+MODES = ("pipeline", "model", "batched")
+
+_TEMPLATES = [(template, re.compile(re.sub(r"\\\{\w+\\\}", "(.+?)", re.escape(template))))
+              for template in ADD_TEMPLATES + TOTAL_TEMPLATES + CLEAR_TEMPLATES]
+
+
+def iter_examples(path, limit=None, split=None):
+    """Yield the examples of a JSONL file, or of ``split`` of a SQLite store."""
+    store = None
+    if str(path).endswith((".sqlite", ".db")):
+        store = DatasetStore(path)
+        examples = store.iter_examples(split=split)
+    else:
+        examples = read_jsonl(path)
+    try:
+        for n, example in enumerate(examples):
+            if limit is not None and n >= limit:
+                return
+            yield example
+    finally:
+        if store is not None:
+            store.close()
+
+
+def template_of(example):
+    """The template an example was generated from, or "other"."""
+    if example.get("template"):
+        return example["template"]
+    for template, pattern in _TEMPLATES:
+        if pattern.fullmatch(example["user"]):
+            return template
+    return "other"
+
+
+def parse_calls(response):
+    """The tool calls of a response with numbers as Decimal, or None if unparseable."""
+    text = response.strip()
+    if not text.startswith("{"):
+        text = _extract_json(text)
+    try:
+        calls = _calls_from_payload(json.loads(text, parse_float=Decimal, parse_int=Decimal))
+    except (ValueError, TypeError):
+        return None
+    if not isinstance(calls, list) or not all(isinstance(call, dict) for call in calls):
+        return None
+    return calls
+
+
+def score(example, response):
+    """Per-example record: template, operations, exact, total."""
+    expected = parse_calls(json.dumps(example["tool_calls"]))
+    predicted = parse_calls(response)
+    total = expected_total(expected)
+    return {
+        "template": template_of(example),
+        "operations": sorted({call["name"] for call in expected}),
+        "exact": predicted == expected,
+        "total": predicted is not None and total is not None and expected_total(predicted) == total,
+    }
+
+
+class Report:
+    """
+    Running totals for an evaluation.
+
+      - add(record)       # a score() record plus "latency_ms"
+      - summary()         # accuracy overall/per template/per operation, latency
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.exact = 0
+        self.total = 0
+        self.by_template = {}   # template -> [count, exact, total]
+        self.by_operation = {}  # tool name -> [count, exact, total]
+        self.latencies = []
+        self.started = time.perf_counter()
+
+    def add(self, record):
+        self.count += 1
+        self.exact += record["exact"]
+        self.total += record["total"]
+        rows = [(self.by_template, record["template"])]
+        rows += [(self.by_operation, op) for op in record["operations"]]
+        for table, key in rows:
+            row = table.setdefault(key, [0, 0, 0])
+            row[0] += 1
+            row[1] += record["exact"]
+            row[2] += record["total"]
+        self.latencies.append(record["latency_ms"])
+
+    def summary(self):
+        elapsed = time.perf_counter() - self.started
+        latencies = sorted(self.latencies)
+
+        def pct(q):
+            return latencies[min(len(latencies) - 1, int(q * len(latencies)))] if latencies else 0.0
+
+        def table(rows):
+            return {key: {"count": n, "exact": exact / n, "total": total / n}
+                    for key, (n, exact, total) in sorted(rows.items())}
+
+        return {
+            "count": self.count,
+            "exact": self.exact / self.count if self.count else 0.0,
+            "total": self.total / self.count if self.count else 0.0,
+            "by_template": table(self.by_template),
+            "by_operation": table(self.by_operation),
+            "examples_per_sec": self.count / elapsed if elapsed else 0.0,
+            "latency_ms": {"p50": pct(0.50), "p95": pct(0.95), "p99": pct(0.99)},
+        }
+
+
+def evaluate(examples, run, workers=1, batch_size=16, init=None):
+    """Score ``examples`` and return the Report.
+
+    ``run`` is a picklable ``run(utterances) -> (responses, latencies_ms)``
+    (see model_runner); with ``workers`` > 1 batches go to a process pool
+    whose workers first call ``init()``. At most two batches per worker are
+    in flight, so the dataset is never held in memory.
+    """
+    report = Report()
+    batches = _batches(examples, batch_size)
+    if workers <= 1:
+        if init is not None:
+            init()
+        for batch in batches:
+            for record in _score_batch(run, batch):
+                report.add(record)
+        return report
+
+    import multiprocessing
+
+    with multiprocessing.Pool(workers, initializer=init) as pool:
+        pending = deque()
+        for batch in batches:
+            pending.append(pool.apply_async(_score_batch, (run, batch)))
+            if len(pending) >= 2 * workers:
+                for record in pending.popleft().get():
+                    report.add(record)
+        while pending:
+            for record in pending.popleft().get():
+                report.add(record)
+    return report
+
+
+def model_runner(mode):
+    """A ``run`` for evaluate() answering with inference.run_agent in ``mode``."""
+    if mode not in MODES:
+        raise ValueError(f"Unknown mode {mode!r}; expected one of {', '.join(MODES)}")
+    return _RUNNERS[mode]
+
+
+# Internal helpers (non-public) -------------------------------------
+
+def _batches(examples, size):
+    batch = []
+    for example in examples:
+        batch.append(example)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _score_batch(run, batch):
+    responses, latencies = run([example["user"] for example in batch])
+    records = []
+    for example, response, latency in zip(batch, responses, latencies):
+        record = score(example, response)
+        record["latency_ms"] = latency
+        records.append(record)
+    return records
+
+
+def _one_at_a_time(generate, utterances):
+    responses, latencies = [], []
+    for utterance in utterances:
+        start = time.perf_counter()
+        responses.append(generate(utterance))
+        latencies.append((time.perf_counter() - start) * 1e3)
+    return responses, latencies
+
+
+def _run_pipeline(utterances):
+    from inference import run_agent
+    return _one_at_a_time(run_agent.generate, utterances)
+
+
+def _run_model(utterances):
+    from inference import run_agent
+    return _one_at_a_time(run_agent.generate_model, utterances)
+
+
+def _run_batched(utterances):
+    from inference import run_agent
+
+    start = time.perf_counter()
+    responses = run_agent.generate_many(utterances)
+    elapsed = (time.perf_counter() - start) * 1e3
+    return responses, [elapsed] * len(utterances)
+
+
+_RUNNERS = {"pipeline": _run_pipeline, "model": _run_model, "batched": _run_batched}
+
+
+class _LoadModel:
+    """Worker initializer: pin threads, then load and warm up the model."""
+
+    def __init__(self, backend, snapshot, threads):
+        self.backend, self.snapshot, self.threads = backend, snapshot, threads
+
+    def __call__(self):
+        import torch
+        from inference import run_agent
+
+        if self.threads:
+            torch.set_num_threads(self.threads)
+        run_agent.ensure_loaded(self.backend, self.snapshot)
+        run_agent.warm_up()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('dataset', help='held-out JSONL from data/generate_dataset.py, or a .sqlite store')
+    parser.add_argument('--split', default='eval', help='split to read from a .sqlite store')
+    parser.add_argument('--mode', default='pipeline', choices=MODES)
+    parser.add_argument('--workers', type=int, default=1, help='worker processes, each with its own model')
+    parser.add_argument('--batch_size', type=int, default=16)
+    parser.add_argument('--threads', type=int, default=None,
+                        help='torch threads per worker (default: cores / workers)')
+    parser.add_argument('--limit', type=int, default=None, help='evaluate only the first N examples')
+    parser.add_argument('--backend', default=None, help='see inference/load_model.py')
+    parser.add_argument('--snapshot', default=None, help='local model snapshot directory')
+    parser.add_argument('--report', default=None, help='also write the summary as JSON here')
+    args = parser.parse_args()
+
+    threads = args.threads or max(1, (os.cpu_count() or 1) // args.workers)
+    report = evaluate(iter_examples(args.dataset, args.limit, args.split), model_runner(args.mode),
+                      args.workers, args.batch_size, _LoadModel(args.backend, args.snapshot, threads))
+    summary = report.summary()
+
+    print(f"{summary['count']} examples  exact {summary['exact']:.1%}  total {summary['total']:.1%}  "
+          f"{summary['examples_per_sec']:.1f} ex/s  latency p50 {summary['latency_ms']['p50']:.1f} ms  "
+          f"p95 {summary['latency_ms']['p95']:.1f} ms  p99 {summary['latency_ms']['p99']:.1f} ms")
+    for title in ("by_template", "by_operation"):
+        print(f"\n{title.replace('_', ' ')}:")
+        for key, row in summary[title].items():
+            print(f"  {row['count']:6d}  exact {row['exact']:6.1%}  total {row['total']:6.1%}  {key}")
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump(summary, f, indent=1)
+
+
+if __name__ == '__main__':
+    main()
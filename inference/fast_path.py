@@ -0,0 +1,195 @@
+"""Rule-based fast path: answer template-shaped utterances without the model.
+
+Most traffic has the shapes in data/templates.py ("What is 7 and 9?", "Add
+seven, nine and twelve", "Reset calculator"). FastPath recognizes those
+shapes and emits the same ``{"tool_calls": [...]}`` object the model would,
+with a confidence in [0, 1]. Numbers may be written as:
+
+  - digits, with optional thousands separators and decimals: 7, -3, 1,234.56
+  - words, as produced by data.number_words.to_words (num2words) and read
+    back with its read_words: "twenty-one", "one quadrillion and five",
+    "one thousand, two hundred and thirty-four",
+    "one thousand two hundred point five", "minus five"
+
+Anything it is unsure about is left to the model:
+
+  fast_path = FastPath(threshold=0.9)
+  text = fast_path.answer("Add seven and nine", fallback=model_generate)
+  fast_path.stats()  # hits per route, fallbacks, mean latency of each path
+"""
+
+import json
+import re
+import threading
+import time
+from decimal import Decimal
+from typing import List, NamedTuple, Optional
+
+from data.number_words import read_words
+from data.templates import ADD_TEMPLATES, CLEAR_TEMPLATES, TOTAL_TEMPLATES
+
+_SIGNS = ("minus", "negative")
+
+# a "-" is a sign only at the start of a word ("-3", not the "-" of "10-3");
+# any other character the rules don't know ("-", "*", "/", "%", "^", "=")
+# is kept as a token of its own so it lowers the confidence, and so is a
+# "." before a digit that is not a decimal point ("1.2.3", ".5")
+_TOKEN = re.compile(r"(?:(?<!\w)-)?\d{1,3}(?:,\d{3})+(?:\.\d+)?|(?:(?<!\w)-)?\d+(?:\.\d+)?|[a-z]+"
+                    r"|\.(?=\d)|[^\s?.!]")
+_DIGITS = re.compile(r"-?\d")
+
+# an utterance whose parse merged a possible separator ("hundred and five")
+# into a number is ambiguous: it could also be two numbers
+_AMBIGUOUS_CONFIDENCE = 0.6
+
+
+def _template_words(templates):
+    words = set()
+    for template in templates:
+        words.update(re.findall(r"[a-z]+", re.sub(r"\{\w+\}", " ", template.lower())))
+    return frozenset(words)
+
+
+_ADD_WORDS = _template_words(ADD_TEMPLATES) | {"sum", "plus", "please"}
+_TOTAL_WORDS = _template_words(TOTAL_TEMPLATES) | {"whats", "show", "please"}
+_CLEAR_WORDS = _template_words(CLEAR_TEMPLATES) | {"all", "the", "please"}
+
+
+class Parse(NamedTuple):
+    route: Optional[str]     # "add", "get_total", "clear_all" or None
+    tool_calls: List[dict]
+    confidence: float
+
+
+def tokenize(text):
+    """Lowercased words, digit numbers and other characters; '?', '!' and a final '.' are dropped."""
+    text = text.lower().replace("'", "")
+    text = re.sub(r"(?<=[a-z])-(?=[a-z])", " ", text)  # twenty-one
+    return _TOKEN.findall(text)
+
+
+def read_number(tokens, i, signed=True):
+    """Read one number starting at ``tokens[i]``.
+
+    Returns ``(value, next_index, merged_separator)`` or None. Number words
+    are read by data.number_words.read_words, the inverse of to_words;
+    ``merged_separator`` is True when an "and" or "," was taken as part of
+    the number. With ``signed`` a leading "minus"/"negative" makes the
+    number negative.
+    """
+    if signed and tokens[i] in _SIGNS and i + 1 < len(tokens):
+        number = _read_unsigned(tokens, i + 1)
+        if number is not None:
+            value, j, merged = number
+            return -value, j, merged
+    return _read_unsigned(tokens, i)
+
+
+def parse(text):
+    """Classify one utterance. Never raises; unknown shapes get route None."""
+    tokens = tokenize(text)
+    numbers, words, merged = [], [], False
+    last_was_number = False
+    i = 0
+    while i < len(tokens):
+        # "ten minus three" is a subtraction, not ten and minus three
+        number = read_number(tokens, i, signed=not last_was_number)
+        if number is not None:
+            value, i, was_merged = number
+            numbers.append(value)
+            merged = merged or was_merged
+            last_was_number = True
+            continue
+        if tokens[i] not in (",", "&", "+"):
+            words.append(tokens[i])
+        last_was_number = False
+        i += 1
+
+    if numbers:
+        known = sum(word in _ADD_WORDS for word in words)
+        if len(numbers) < 2 and "add" not in words:
+            return Parse(None, [], 0.0)
+        calls = [{"name": "add", "arguments": {"number": _json_number(v)}} for v in numbers]
+        confidence = known / len(words) if words else 1.0
+        if merged:
+            confidence = min(confidence, _AMBIGUOUS_CONFIDENCE)
+        return Parse("add", calls, confidence)
+    if words and {"clear", "reset"} & set(words):
+        known = sum(word in _CLEAR_WORDS for word in words)
+        return Parse("clear_all", [{"name": "clear_all", "arguments": {}}], known / len(words))
+    if "total" in words:
+        known = sum(word in _TOTAL_WORDS for word in words)
+        return Parse("get_total", [{"name": "get_total", "arguments": {}}], known / len(words))
+    return Parse(None, [], 0.0)
+
+
+class FastPath:
+    """
+    Front stage for generation.
+
+      - parse(text)              # Parse(route, tool_calls, confidence)
+      - answer(text, fallback)   # tool_calls JSON, from the rules or fallback(text)
+      - stats()                  # hits per route, fallbacks, mean latencies
+
+    An utterance is answered by the rules when its confidence is at least
+    ``threshold``; otherwise ``fallback`` (the model) is called.
+    """
+
+    def __init__(self, threshold=0.9):
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        self._hits = {}
+        self._fallbacks = 0
+        self._fast_seconds = 0.0
+        self._model_seconds = 0.0
+
+    parse = staticmethod(parse)
+
+    def answer(self, text, fallback):
+        start = time.perf_counter()
+        result = parse(text)
+        if result.route is not None and result.confidence >= self.threshold:
+            out = json.dumps({"tool_calls": result.tool_calls}, separators=(",", ":"))
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self._hits[result.route] = self._hits.get(result.route, 0) + 1
+                self._fast_seconds += elapsed
+            return out
+        out = fallback(text)
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self._fallbacks += 1
+            self._model_seconds += elapsed
+        return out
+
+    def stats(self):
+        with self._lock:
+            hits = sum(self._hits.values())
+            total = hits + self._fallbacks
+            return {
+                "requests": total,
+                "hits": dict(self._hits),
+                "fallbacks": self._fallbacks,
+                "hit_rate": hits / total if total else 0.0,
+                "fast_mean_ms": self._fast_seconds / hits * 1e3 if hits else 0.0,
+                "model_mean_ms": self._model_seconds / self._fallbacks * 1e3 if self._fallbacks else 0.0,
+            }
+
+
+def _json_number(value):
+    # int when integral, so the JSON matches what the model is trained on
+    if value == value.to_integral_value():
+        return int(value)
+    return float(value)
+
+
+def _read_unsigned(tokens, i):
+    token = tokens[i]
+    if _DIGITS.match(token):
+        return Decimal(token.replace(",", "")), i + 1, False
+    number = read_words(tokens, i)
+    if number is None:
+        return None
+    value, j = number
+    # num2words: "one hundred and five", "one thousand, two hundred"
+    return value, j, any(t in ("and", ",") for t in tokens[i:j])
@@ -0,0 +1,143 @@
+"""Local load generator for inference.server.
+
+Sends utterances built from data/templates.py from ``--clients`` concurrent
+connections and reports throughput, p50/p95/p99 latency and how many
+requests were rejected as overloaded (HTTP 429).
+
+  python -m inference.load_generator --port 8088 --requests 200 --clients 8
+
+With ``--fake_ms`` no server is needed: an in-process AgentServer is started
+whose "model" sleeps for that long and answers get_total, which measures
+the front end's own overhead and queueing behaviour.
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+
+from data.templates import ADD_TEMPLATES, CLEAR_TEMPLATES, TOTAL_TEMPLATES
+
+
+def _utterances(rng):
+    while True:
+        pick = rng.random()
+        if pick < 0.7:
+            yield rng.choice(ADD_TEMPLATES).format(
+                a=rng.randint(1, 999), b=rng.randint(1, 999), c=rng.randint(1, 999))
+        elif pick < 0.9:
+            yield rng.choice(TOTAL_TEMPLATES)
+        else:
+            yield rng.choice(CLEAR_TEMPLATES)
+
+
+async def _post(host, port, unix_path, body):
+    if unix_path:
+        reader, writer = await asyncio.open_unix_connection(unix_path)
+    else:
+        reader, writer = await asyncio.open_connection(host, port)
+    payload = json.dumps(body).encode()
+    writer.write(
+        b"POST /utterance HTTP/1.1\r\nHost: localhost\r\n"
+        b"Content-Type: application/json\r\n"
+        + f"Content-Length: {len(payload)}\r\n\r\n".encode() + payload
+    )
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    return int(response.split(b" ", 2)[1])
+
+
+def _percentile(sorted_values, q):
+    if not sorted_values:
+        return float("nan")
+    index = min(len(sorted_values) - 1, int(round(q * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+async def run_load(host, port, unix_path, n_requests, clients, sessions, seed=0):
+    rng = random.Random(seed)
+    utterances = _utterances(rng)
+    work = [(f"user{i % sessions}", next(utterances)) for i in range(n_requests)]
+    latencies, statuses = [], {}
+    next_item = iter(work)
+
+    async def client():
+        for session_id, text in next_item:
+            start = time.perf_counter()
+            status = await _post(host, port, unix_path, {"session_id": session_id, "text": text})
+            elapsed = time.perf_counter() - start
+            statuses[status] = statuses.get(status, 0) + 1
+            if status == 200:
+                latencies.append(elapsed)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(clients)))
+    wall = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "requests": n_requests,
+        "clients": clients,
+        "ok": statuses.get(200, 0),
+        "rejected": statuses.get(429, 0),
+        "other": n_requests - statuses.get(200, 0) - statuses.get(429, 0),
+        "wall_seconds": wall,
+        "throughput_rps": statuses.get(200, 0) / wall if wall else 0.0,
+        "p50_ms": _percentile(latencies, 0.50) * 1e3,
+        "p95_ms": _percentile(latencies, 0.95) * 1e3,
+        "p99_ms": _percentile(latencies, 0.99) * 1e3,
+    }
+
+
+async def _with_fake_server(args):
+    from inference.server import AgentServer
+
+    def fake_generate(text):
+        time.sleep(args.fake_ms / 1e3)
+        return '{"tool_calls": [{"name": "get_total", "arguments": {}}]}'
+
+    def fake_apply(response, session_id):
+        from app.dispatcher import dispatch
+        return dispatch(response, session_id)
+
+    server = AgentServer(fake_generate, fake_apply, args.max_concurrency, args.max_queue)
+    listener = await asyncio.start_server(server._handle, args.host, 0)
+    port = listener.sockets[0].getsockname()[1]
+    try:
+        async with listener:
+            return await run_load(args.host, port, None, args.requests,
+                                  args.clients, args.sessions, args.seed)
+    finally:
+        server.close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8088)
+    parser.add_argument('--unix', default=None)
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--clients', type=int, default=8)
+    parser.add_argument('--sessions', type=int, default=16)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--fake_ms', type=float, default=None,
+                        help='start an in-process server with a fake model of this latency')
+    parser.add_argument('--max_concurrency', type=int, default=2, help='with --fake_ms')
+    parser.add_argument('--max_queue', type=int, default=16, help='with --fake_ms')
+    args = parser.parse_args()
+
+    if args.fake_ms is not None:
+        report = asyncio.run(_with_fake_server(args))
+    else:
+        report = asyncio.run(run_load(args.host, args.port, args.unix, args.requests,
+                                      args.clients, args.sessions, args.seed))
+    print(f"requests={report['requests']} clients={report['clients']} "
+          f"ok={report['ok']} rejected={report['rejected']} other={report['other']}")
+    print(f"throughput={report['throughput_rps']:.1f} req/s  "
+          f"p50={report['p50_ms']:.1f}ms  p95={report['p95_ms']:.1f}ms  p99={report['p99_ms']:.1f}ms")
+
+
+if __name__ == '__main__':
+    main()
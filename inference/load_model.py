@@ -1,30 +1,342 @@
-# Loads FunctionGemma in 8-bit.
+# Loads FunctionGemma with a selectable inference backend.
+#
+#   load()                          # "auto": bitsandbytes if usable, else dynamic int8
+#   load("dynamic_int8")            # PyTorch dynamic int8 Linear layers, CPU
+#   load("onnx")                    # ONNX Runtime (exported once, then reused)
+#   load("bitsandbytes")            # 8-bit bitsandbytes, needs a CUDA device
+#   load("fp32")                    # plain full-precision weights
+#   load(snapshot="path/to/dir")    # a snapshot saved by save_snapshot()
+#   load(variant="phase4")          # a merged fine-tune in VARIANTS_DIR, by name
+#
+# The defaults can also be set with the CALC_BACKEND, CALC_SNAPSHOT and
+# CALC_VARIANT environment variables. Every backend returns (tokenizer, model) where model
+# has .device, __call__ and .generate like a transformers causal LM; the
+# chosen backend is recorded as model.inference_backend. An explicitly
+# requested backend that cannot run raises instead of silently falling back.
+#
+# torch and transformers are imported on first load, not with this module.
+#
+# A snapshot is the already-quantized model on local disk: config, tokenizer,
+# generation config and one model.safetensors that is memory-mapped on load,
+# so a cold start skips the hub checkpoint and re-quantization. Create one with
+#
+#   python -m inference.load_model --backend dynamic_int8 --save_snapshot snapshots/int8
+#
+# A variant is a snapshot of a fine-tuned model whose LoRA adapters were
+# merged into the weights before quantization (training/export_lora.py), so
+# decoding costs the same as the base model. Variants live in
+# VARIANTS_DIR/<name> (CALC_VARIANTS_DIR to move it); all are fine-tunes of
+# MODEL_ID and share its tokenizer, so load_variant(name, tokenizer) can
+# switch models without reloading it (see run_agent.use_variant).
+#
+#   python -m inference.load_model --list_variants
 
-from transformers import AutoTokenizer, AutoModelForCausalLM
-try:
-    from transformers import BitsAndBytesConfig
-except Exception:
-    BitsAndBytesConfig = None
+import argparse
+import json
+import os
+import time
 
 MODEL_ID = "google/functiongemma-270m-it"
 
+BACKENDS = ("auto", "bitsandbytes", "dynamic_int8", "onnx", "fp32")
 
-def load():
-    bnb_config = None
-    if BitsAndBytesConfig is not None:
-        try:
-            bnb_config = BitsAndBytesConfig(load_in_8bit=True)
-        except Exception:
-            bnb_config = None
+ONNX_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "onnx",
+                        MODEL_ID.replace("/", "--"))
+VARIANTS_DIR = os.environ.get("CALC_VARIANTS_DIR",
+                              os.path.join(os.path.dirname(os.path.abspath(__file__)), "variants"))
+
+_SNAPSHOT_BACKENDS = ("dynamic_int8", "fp32")
+_MANIFEST = "snapshot.json"
+_WEIGHTS = "model.safetensors"
+
+
+def load(backend=None, snapshot=None, variant=None):
+    """Returns (tokenizer, model).
+
+    With ``snapshot`` the model comes from that directory when it exists;
+    otherwise it is loaded with ``backend`` and then saved there, so the
+    next start is fast. ``variant`` names an exported fine-tune and takes
+    precedence over both.
+    """
+    variant = variant or os.environ.get("CALC_VARIANT")
+    if variant:
+        return load_variant(variant)
+    snapshot = snapshot or os.environ.get("CALC_SNAPSHOT")
+    if snapshot and os.path.isfile(os.path.join(snapshot, _MANIFEST)):
+        return load_snapshot(snapshot)
+
+    backend = backend or os.environ.get("CALC_BACKEND", "auto")
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend {backend!r}; expected one of {', '.join(BACKENDS)}")
+    if backend == "auto":
+        backend = "bitsandbytes" if bitsandbytes_usable() else "dynamic_int8"
+    if snapshot and backend not in _SNAPSHOT_BACKENDS:
+        raise ValueError(f"Snapshots support the {' and '.join(_SNAPSHOT_BACKENDS)} backends, not {backend!r}")
+
+    from transformers import AutoTokenizer
 
     tokenizer = AutoTokenizer.from_pretrained(MODEL_ID)
-    if bnb_config is not None:
-        model = AutoModelForCausalLM.from_pretrained(
-            MODEL_ID,
-            quantization_config=bnb_config,
-            device_map="auto"
-        )
-    else:
-        model = AutoModelForCausalLM.from_pretrained(MODEL_ID)
-    model.eval()
+    model = _LOADERS[backend]()
+    model.inference_backend = backend
+    if snapshot:
+        save_snapshot(tokenizer, model, snapshot)
     return tokenizer, model
+
+
+def bitsandbytes_usable():
+    """bitsandbytes 8-bit inference needs the package and a CUDA device."""
+    try:
+        import bitsandbytes  # noqa: F401
+        import torch
+        from transformers import BitsAndBytesConfig  # noqa: F401
+    except Exception:
+        return False
+    return torch.cuda.is_available()
+
+
+def variant_path(name):
+    """Directory of the exported variant ``name``."""
+    if not name or os.sep in name or name.startswith("."):
+        raise ValueError(f"Bad variant name {name!r}")
+    return os.path.join(VARIANTS_DIR, name)
+
+
+def list_variants():
+    """Names of the exported variants in VARIANTS_DIR."""
+    if not os.path.isdir(VARIANTS_DIR):
+        return []
+    return sorted(name for name in os.listdir(VARIANTS_DIR)
+                  if os.path.isfile(os.path.join(VARIANTS_DIR, name, _MANIFEST)))
+
+
+def load_variant(name, tokenizer=None):
+    """(tokenizer, model) of an exported variant; pass ``tokenizer`` to reuse a loaded one."""
+    path = variant_path(name)
+    if not os.path.isfile(os.path.join(path, _MANIFEST)):
+        available = ", ".join(list_variants()) or "none"
+        raise ValueError(f"Unknown variant {name!r} in {VARIANTS_DIR}; available: {available}")
+    return load_snapshot(path, tokenizer)
+
+
+def quantize_dynamic_int8(model):
+    """int8 weights, activations quantized on the fly: CPU-only, no calibration."""
+    import torch
+
+    model.eval()
+    return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def save_snapshot(tokenizer, model, path, info=None):
+    """Write a loaded dynamic_int8 or fp32 model to ``path``; ``info`` is added to the manifest."""
+    import torch
+    from safetensors.torch import save_file
+
+    backend = getattr(model, "inference_backend", None)
+    if backend not in _SNAPSHOT_BACKENDS:
+        raise ValueError(f"Snapshots support the {' and '.join(_SNAPSHOT_BACKENDS)} backends, not {backend!r}")
+    os.makedirs(path, exist_ok=True)
+    tensors, quantized, tied = {}, {}, {}
+    seen = {}  # id(tensor) -> first name, for tied weights
+    for module_name, module in model.named_modules():
+        prefix = module_name + "." if module_name else ""
+        if _is_dynamic_quantized_linear(module):
+            weight, bias = module._packed_params._weight_bias()
+            quantized[module_name] = _store_qweight(tensors, module_name, weight)
+            if bias is not None:
+                tensors[f"{module_name}.bias"] = bias.detach().contiguous()
+            continue
+        for name, tensor in list(module._parameters.items()) + list(module._buffers.items()):
+            if tensor is None:
+                continue
+            full = prefix + name
+            if id(tensor) in seen:
+                tied[full] = seen[id(tensor)]
+                continue
+            seen[id(tensor)] = full
+            tensors[full] = tensor.detach().contiguous()
+    save_file(tensors, os.path.join(path, _WEIGHTS))
+    model.config.save_pretrained(path)
+    if getattr(model, "generation_config", None) is not None:
+        model.generation_config.save_pretrained(path)
+    tokenizer.save_pretrained(path)
+    with open(os.path.join(path, _MANIFEST), "w") as f:
+        json.dump({"model_id": MODEL_ID, "backend": backend, "torch": torch.__version__,
+                   "quantized": quantized, "tied": tied, **(info or {})}, f, indent=1)
+
+
+def load_snapshot(path, tokenizer=None):
+    """Rebuild the model saved by save_snapshot(); weights are memory-mapped.
+
+    The snapshot's tokenizer is loaded unless ``tokenizer`` is given.
+    """
+    import torch
+    from safetensors import safe_open
+    from transformers import AutoConfig, AutoModelForCausalLM, AutoTokenizer, GenerationConfig
+
+    with open(os.path.join(path, _MANIFEST)) as f:
+        manifest = json.load(f)
+    config = AutoConfig.from_pretrained(path)
+    # build the module tree without allocating or initializing weights
+    with torch.device("meta"):
+        model = AutoModelForCausalLM.from_config(config)
+    model.eval()
+
+    with safe_open(os.path.join(path, _WEIGHTS), framework="pt") as weights:
+        names = set(weights.keys())
+        for module_name, layout in manifest["quantized"].items():
+            _set_module(model, module_name, _quantized_linear(weights, module_name, layout, names))
+        done = {k for k in names if k.rsplit(".", 1)[0] in manifest["quantized"]}
+        for name in names - done:
+            _assign(model, name, weights.get_tensor(name))
+    for name, source in manifest["tied"].items():
+        module_name, _, attr = source.rpartition(".")
+        owner = model.get_submodule(module_name) if module_name else model
+        _assign(model, name, getattr(owner, attr))
+    leftover = [n for n, t in list(model.named_parameters()) + list(model.named_buffers()) if t.is_meta]
+    if leftover:
+        raise ValueError(f"Snapshot {path} is missing tensors: {', '.join(leftover[:5])}")
+
+    try:
+        model.generation_config = GenerationConfig.from_pretrained(path)
+    except OSError:
+        pass
+    model.inference_backend = manifest["backend"]
+    model.variant = manifest.get("variant")
+    return tokenizer or AutoTokenizer.from_pretrained(path), model
+
+
+# Backends (non-public) ---------------------------------------------
+
+def _load_bitsandbytes():
+    if not bitsandbytes_usable():
+        raise RuntimeError("bitsandbytes 8-bit loading needs bitsandbytes and a CUDA device")
+    from transformers import AutoModelForCausalLM, BitsAndBytesConfig
+
+    model = AutoModelForCausalLM.from_pretrained(
+        MODEL_ID,
+        quantization_config=BitsAndBytesConfig(load_in_8bit=True),
+        device_map="auto"
+    )
+    model.eval()
+    return model
+
+
+def _load_dynamic_int8():
+    import torch
+    from transformers import AutoModelForCausalLM
+
+    return quantize_dynamic_int8(AutoModelForCausalLM.from_pretrained(MODEL_ID, torch_dtype=torch.float32))
+
+
+def _load_onnx():
+    try:
+        from optimum.onnxruntime import ORTModelForCausalLM
+    except ImportError as e:
+        raise RuntimeError("The onnx backend needs optimum[onnxruntime]") from e
+
+    if os.path.isdir(ONNX_DIR):
+        return ORTModelForCausalLM.from_pretrained(ONNX_DIR, use_cache=True)
+    model = ORTModelForCausalLM.from_pretrained(MODEL_ID, export=True, use_cache=True)
+    model.save_pretrained(ONNX_DIR)
+    return model
+
+
+def _load_fp32():
+    from transformers import AutoModelForCausalLM
+
+    model = AutoModelForCausalLM.from_pretrained(MODEL_ID)
+    model.eval()
+    return model
+
+
+_LOADERS = {
+    "bitsandbytes": _load_bitsandbytes,
+    "dynamic_int8": _load_dynamic_int8,
+    "onnx": _load_onnx,
+    "fp32": _load_fp32,
+}
+
+
+# Snapshot helpers (non-public) -------------------------------------
+
+def _is_dynamic_quantized_linear(module):
+    import torch
+    return isinstance(module, torch.ao.nn.quantized.dynamic.Linear)
+
+
+def _store_qweight(tensors, module_name, weight):
+    """Store an int8 quantized weight as plain tensors; returns its layout."""
+    import torch
+
+    tensors[f"{module_name}.weight_int8"] = weight.int_repr().contiguous()
+    if weight.qscheme() in (torch.per_channel_affine, torch.per_channel_symmetric):
+        tensors[f"{module_name}.scales"] = weight.q_per_channel_scales().contiguous()
+        tensors[f"{module_name}.zero_points"] = weight.q_per_channel_zero_points().contiguous()
+        return {"scheme": "per_channel", "axis": weight.q_per_channel_axis()}
+    return {"scheme": "per_tensor", "scale": weight.q_scale(), "zero_point": weight.q_zero_point()}
+
+
+def _quantized_linear(weights, module_name, layout, names):
+    import torch
+
+    int8 = weights.get_tensor(f"{module_name}.weight_int8")
+    if layout["scheme"] == "per_channel":
+        qweight = torch._make_per_channel_quantized_tensor(
+            int8, weights.get_tensor(f"{module_name}.scales"),
+            weights.get_tensor(f"{module_name}.zero_points"), layout["axis"])
+    else:
+        qweight = torch._make_per_tensor_quantized_tensor(int8, layout["scale"], layout["zero_point"])
+    bias_name = f"{module_name}.bias"
+    bias = weights.get_tensor(bias_name) if bias_name in names else None
+    out_features, in_features = int8.shape
+    linear = torch.ao.nn.quantized.dynamic.Linear(in_features, out_features,
+                                                  bias_=bias is not None, dtype=torch.qint8)
+    linear.set_weight_bias(qweight, bias)
+    return linear
+
+
+def _set_module(model, name, module):
+    parent_name, _, attr = name.rpartition(".")
+    parent = model.get_submodule(parent_name) if parent_name else model
+    setattr(parent, attr, module)
+
+
+def _assign(model, name, tensor):
+    """Put a loaded tensor in place of the meta parameter or buffer ``name``."""
+    import torch
+
+    module_name, _, attr = name.rpartition(".")
+    module = model.get_submodule(module_name) if module_name else model
+    if attr in module._parameters:
+        module._parameters[attr] = torch.nn.Parameter(tensor, requires_grad=False)
+    else:
+        module._buffers[attr] = tensor
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--backend', default='dynamic_int8', choices=BACKENDS)
+    parser.add_argument('--save_snapshot', default=None, help='directory to write the snapshot to')
+    parser.add_argument('--list_variants', action='store_true', help='list exported fine-tuned variants')
+    args = parser.parse_args()
+
+    if args.list_variants:
+        for name in list_variants():
+            with open(os.path.join(variant_path(name), _MANIFEST)) as f:
+                manifest = json.load(f)
+            print(f"{name}  {manifest['backend']}  adapter {manifest.get('adapter', '-')}")
+        return
+    if not args.save_snapshot:
+        parser.error("--save_snapshot is required")
+
+    start = time.perf_counter()
+    tokenizer, model = load(args.backend)
+    loaded = time.perf_counter() - start
+    save_snapshot(tokenizer, model, args.save_snapshot)
+    size = os.path.getsize(os.path.join(args.save_snapshot, _WEIGHTS))
+    print(f"Loaded {model.inference_backend} in {loaded:.1f}s; "
+          f"saved {size / 2 ** 20:.0f} MB to {args.save_snapshot}")
+
+
+if __name__ == '__main__':
+    main()
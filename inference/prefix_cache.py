@@ -0,0 +1,72 @@
+"""KV cache of the fixed SYSTEM_PROMPT prefix, prefilled once per model.
+
+Every prompt from build_prompt starts with SYSTEM_PROMPT, so its keys and
+values are the same for every request. PrefixCache runs the prefix through
+the model once and starts each generation from a copy of that cache: only
+the ``User: ...`` suffix is prefilled per request.
+
+  cache = PrefixCache(tokenizer, model)
+  text = cache.generate(build_prompt("What is 7 and 9?"))
+
+A prompt that does not start with the cached tokens is generated from
+scratch, so the result is always the same as plain greedy generate().
+"""
+
+import copy
+
+from inference.prompt_builder import SYSTEM_PROMPT
+
+
+class PrefixCache:
+    """
+    Holds ``past_key_values`` for ``prefix``.
+
+      - generate(prompt, max_new_tokens=200)  # decoded completion (new tokens only)
+      - past_for(ids)                         # (cache copy, tokens it covers)
+      - stats()                               # prefix length, hits, misses
+    """
+
+    def __init__(self, tokenizer, model, prefix=SYSTEM_PROMPT):
+        import torch
+
+        self.tokenizer = tokenizer
+        self.model = model
+        # the prefix's last token may merge with the text that follows it, so
+        # only the tokens before it are guaranteed to be shared
+        self.prefix_ids = tokenizer(prefix)["input_ids"][:-1]
+        with torch.no_grad():
+            out = model(input_ids=torch.tensor([self.prefix_ids], device=model.device),
+                        use_cache=True)
+        self._past = out.past_key_values
+        self.hits = 0
+        self.misses = 0
+
+    def past_for(self, ids):
+        """A private copy of the cached KV if ``ids`` start with the prefix.
+
+        Returns ``(past_key_values, n_cached)``, or ``(None, 0)`` on a miss.
+        """
+        n = len(self.prefix_ids)
+        if len(ids) > n and ids[:n] == self.prefix_ids:
+            self.hits += 1
+            # generation mutates the cache it is given: hand out a copy
+            return copy.deepcopy(self._past), n
+        self.misses += 1
+        return None, 0
+
+    def generate(self, prompt, max_new_tokens=200):
+        import torch
+
+        ids = self.tokenizer(prompt)["input_ids"]
+        past, _ = self.past_for(ids)
+        extra = {} if past is None else {"past_key_values": past}
+        input_ids = torch.tensor([ids], device=self.model.device)
+        with torch.no_grad():
+            outputs = self.model.generate(input_ids=input_ids,
+                                          attention_mask=torch.ones_like(input_ids),
+                                          max_new_tokens=max_new_tokens, do_sample=False,
+                                          **extra)
+        return self.tokenizer.decode(outputs[0][len(ids):], skip_special_tokens=True)
+
+    def stats(self):
+        return {"prefix_tokens": len(self.prefix_ids), "hits": self.hits, "misses": self.misses}
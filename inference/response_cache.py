@@ -0,0 +1,252 @@
+"""Cache of model responses keyed on the normalized utterance.
+
+Greedy decoding is deterministic, so the same prompt always yields the same
+tool_calls. ResponseCache keeps those responses:
+
+  - in memory, least recently used evicted past ``max_entries``
+  - optionally in SQLite (``path``, e.g. data/response_cache.sqlite), so they
+    survive restarts; memory misses fall through to it
+
+Keys are the utterance lowercased with whitespace, commas, '?', '!' and
+sentence-ending '.' removed; operator characters ("-", "*", "/", ...) and
+a '.' before a digit are kept, so "10 - 3" and "10 * 3" never share an
+entry. With ``slots=True`` numbers are also
+abstracted: "add 7 and 9" and "Add 3 and 4" share the key "add # and #",
+and a negative digit number is "-#", so "add 7 -3" does not share
+"add # #". A response is only stored under its slot key when every number
+in it maps to exactly one number of the utterance, and a hit substitutes
+the new numbers. Slot keys are stored apart from utterance keys, so the
+text "add # and #" itself never gets the template back.
+
+Every entry belongs to an ``identity`` (model, adapter, prompt, decoding
+mode). Entries of another identity are never returned, so swapping the
+model or adapter invalidates the cache without deleting anything.
+"""
+
+import json
+import sqlite3
+import threading
+from collections import OrderedDict
+from decimal import Decimal
+
+from inference.fast_path import _json_number, read_number, tokenize
+
+_SLOT = "#"
+# stored slot-template keys start with this; tokenize() drops "?", so no
+# utterance normalizes to a key that reads back a template as its response
+_TEMPLATE_PREFIX = "?"
+
+# part of the stored identity; bump when normalize() changes, so keys written
+# by an older normalization are never read back from a persistent cache
+KEY_VERSION = 4
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    identity TEXT NOT NULL,
+    key      TEXT NOT NULL,
+    response TEXT NOT NULL,
+    PRIMARY KEY (identity, key)
+) WITHOUT ROWID
+"""
+
+
+def normalize(text, slots=False):
+    """Cache key for an utterance; with slots, also the numbers it contains.
+
+    Returns ``(key, numbers)``; ``numbers`` is empty unless ``slots``.
+    """
+    tokens = [token for token in tokenize(text) if token != ","]
+    if not slots:
+        return " ".join(tokens), []
+    parts, numbers = [], []
+    i = 0
+    while i < len(tokens):
+        # unsigned: "minus" stays a word, so "ten minus three" is not "ten three"
+        number = read_number(tokens, i, signed=False)
+        if number is None:
+            parts.append(tokens[i])
+            i += 1
+        else:
+            numbers.append(number[0])
+            parts.append("-" + _SLOT if number[0] < 0 else _SLOT)
+            i = number[1]
+    return " ".join(parts), numbers
+
+
+class ResponseCache:
+    """
+    Utterance → model response cache.
+
+      - get(text, identity=None)      # cached response or None
+      - put(text, response, identity=None)
+      - get_or_generate(text, generate, identity=None)
+      - set_identity(identity)        # switch model/adapter; memory tier dropped
+      - invalidate()                  # delete this identity's entries everywhere
+      - stats()
+      - close()
+
+    With ``identity``, get() and put() only act while the cache still has
+    that identity: a response generated by a model that was switched away
+    mid-request is neither served nor stored under the new one.
+    """
+
+    def __init__(self, identity="", max_entries=4096, path=None, slots=False):
+        self.identity = identity
+        self.max_entries = max_entries
+        self.slots = slots
+        self._memory = OrderedDict()  # least recently used first
+        self._lock = threading.Lock()
+        self._db = None
+        if path is not None:
+            self._db = sqlite3.connect(str(path), check_same_thread=False)
+            self._db.execute(_SCHEMA)
+            self._db.commit()
+        self._hits_memory = 0
+        self._hits_disk = 0
+        self._hits_slot = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def get(self, text, identity=None):
+        key, numbers = normalize(text, self.slots)
+        exact = normalize(text)[0] if self.slots else key
+        with self._lock:
+            if identity is not None and identity != self.identity:
+                self._misses += 1
+                return None
+            response, tier = self._lookup(exact)
+            if response is not None:
+                if tier == "memory":
+                    self._hits_memory += 1
+                else:
+                    self._hits_disk += 1
+                return response
+            if self.slots and numbers:
+                template, _ = self._lookup(_TEMPLATE_PREFIX + key)
+                if template is not None:
+                    response = _fill(template, numbers)
+                    if response is not None:
+                        self._hits_slot += 1
+                        return response
+            self._misses += 1
+            return None
+
+    def put(self, text, response, identity=None):
+        entries = [(normalize(text)[0], response)]
+        if self.slots:
+            key, numbers = normalize(text, slots=True)
+            template = _template(response, numbers) if numbers else None
+            if template is not None:
+                entries.append((_TEMPLATE_PREFIX + key, template))
+        with self._lock:
+            if identity is not None and identity != self.identity:
+                return
+            for key, value in entries:
+                self._store(key, value)
+            if self._db is not None:
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO responses VALUES (?, ?, ?)",
+                    [(self._stored_identity(), key, value) for key, value in entries])
+                self._db.commit()
+
+    def get_or_generate(self, text, generate, identity=None):
+        response = self.get(text, identity)
+        if response is None:
+            response = generate(text)
+            self.put(text, response, identity)
+        return response
+
+    def set_identity(self, identity):
+        with self._lock:
+            if identity != self.identity:
+                self.identity = identity
+                self._memory.clear()
+
+    def invalidate(self):
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM responses WHERE identity = ?", (self._stored_identity(),))
+                self._db.commit()
+
+    def stats(self):
+        with self._lock:
+            hits = self._hits_memory + self._hits_disk + self._hits_slot
+            lookups = hits + self._misses
+            return {
+                "identity": self.identity,
+                "entries": len(self._memory),
+                "hits_memory": self._hits_memory,
+                "hits_disk": self._hits_disk,
+                "hits_slot": self._hits_slot,
+                "misses": self._misses,
+                "hit_rate": hits / lookups if lookups else 0.0,
+                "evictions": self._evictions,
+            }
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    # Internal helpers (non-public) -------------------------------------
+
+    def _stored_identity(self):
+        return f"{self.identity}|keys{KEY_VERSION}"
+
+    def _lookup(self, key):
+        """Returns (value, tier) where tier is "memory", "disk" or None."""
+        value = self._memory.get(key)
+        if value is not None:
+            self._memory.move_to_end(key)
+            return value, "memory"
+        if self._db is None:
+            return None, None
+        row = self._db.execute("SELECT response FROM responses WHERE identity = ? AND key = ?",
+                               (self._stored_identity(), key)).fetchone()
+        if row is None:
+            return None, None
+        self._store(key, row[0])  # promote to memory
+        return row[0], "disk"
+
+    def _store(self, key, value):
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self._evictions += 1
+
+
+def _template(response, numbers):
+    """The response with each number replaced by {"$slot": index}, or None.
+
+    None when a number in the response is not one of ``numbers`` or the
+    utterance repeats a number (the mapping back would be ambiguous).
+    """
+    if len(set(numbers)) != len(numbers):
+        return None
+    try:
+        payload = json.loads(response)
+        calls = payload["tool_calls"]
+        for call in calls:
+            args = call.get("arguments")
+            if isinstance(args, dict) and "number" in args:
+                value = Decimal(str(args["number"]))
+                if value not in numbers:
+                    return None
+                args["number"] = {"$slot": numbers.index(value)}
+    except (ValueError, TypeError, KeyError, AttributeError, ArithmeticError):
+        return None
+    return json.dumps(payload, separators=(",", ":"))
+
+
+def _fill(template, numbers):
+    payload = json.loads(template)
+    for call in payload["tool_calls"]:
+        args = call.get("arguments")
+        if isinstance(args, dict) and isinstance(args.get("number"), dict):
+            index = args["number"]["$slot"]
+            if index >= len(numbers):
+                return None
+            args["number"] = _json_number(numbers[index])
+    return json.dumps(payload, separators=(",", ":"))
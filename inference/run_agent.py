@@ -1,17 +1,85 @@
 # Main loop: user → model → dispatcher → calculator.
+#
+# Nothing heavy happens at import: torch, transformers and the model are
+# loaded by ensure_loaded() on the first utterance that needs the model
+# (fast-path answers never do).
 
+import argparse
+import hashlib
 import json
-import torch
-from inference.load_model import load
-from inference.prompt_builder import build_prompt
+import threading
+import time
+from typing import NamedTuple
+
+from app import metrics
+from inference.batching import generate_batch
+from inference.constrained import ConstrainedDecoder
+from inference.fast_path import FastPath
+from inference.load_model import MODEL_ID, load, load_variant
+from inference.prefix_cache import PrefixCache
+from inference.prompt_builder import SYSTEM_PROMPT, build_prompt
+from inference.response_cache import ResponseCache
+from inference.speculative import decode_speculative, draft_tool_calls
 from app.dispatcher import dispatch
 
 
-tokenizer, model = None, None
-try:
-    tokenizer, model = load()
-except Exception as e:
-    print("Warning: model load failed:", e)
+tokenizer, model = None, None  # set by ensure_loaded()
+startup = {}  # seconds spent in load / warm_up, for the startup report
+
+_prefix_caches = {}  # variant name -> PrefixCache of that model
+_decoder = None
+_variants = {}  # variant name (None for the base model) -> model, for use_variant()
+_lazy_lock = threading.RLock()
+
+
+def ensure_loaded(backend=None, snapshot=None, variant=None):
+    """Load the tokenizer and model on first use; returns (tokenizer, model).
+
+    ``backend``, ``snapshot`` and ``variant`` are passed to load_model.load
+    and only matter for the call that actually loads.
+    """
+    global tokenizer, model
+    if model is None:
+        with _lazy_lock:
+            if model is None:
+                start = time.perf_counter()
+                loaded_tokenizer, loaded_model = load(backend, snapshot, variant)
+                tokenizer, model = loaded_tokenizer, loaded_model
+                startup["load"] = time.perf_counter() - start
+    return tokenizer, model
+
+
+def use_variant(name):
+    """Switch to the exported fine-tune ``name`` (None: back to the first loaded model).
+
+    Variants share the loaded tokenizer and decoder tables; a variant is
+    loaded (memory-mapped) on its first use and kept, together with its
+    prefix cache, so switching back and forth is instant. The response cache
+    switches to the new model's identity. Utterances already running keep
+    the snapshot() they started with: they decode on the old model and
+    their responses are not cached under the new identity.
+    """
+    global model
+    ensure_loaded()
+    with _lazy_lock:
+        current = getattr(model, "variant", None)
+        if name == current:
+            return model
+        _variants.setdefault(None, model)  # the model ensure_loaded() started with
+        _variants.setdefault(current, model)
+        if name not in _variants:
+            _variants[name] = load_variant(name, tokenizer)[1]
+        model = _variants[name]
+        if response_cache.identity:
+            response_cache.set_identity(model_identity())
+    return model
+
+
+def warm_up():
+    """Build the prefix cache and decoder tables and run one model answer."""
+    start = time.perf_counter()
+    generate_model("What is 7 and 9?")
+    startup["warm_up"] = time.perf_counter() - start
 
 
 def _extract_json(text: str) -> str:
@@ -38,23 +106,170 @@ def _extract_json(text: str) -> str:
     return s[start:end+1]
 
 
+class Snapshot(NamedTuple):
+    model: object
+    prefix_cache: PrefixCache
+    identity: str               # model_identity() of ``model``
+
+
+def snapshot() -> Snapshot:
+    """The model in use with its prefix cache and cache identity, read together.
+
+    use_variant() swaps the model under the same lock, so one utterance
+    decodes, and is cached, on a single model even while a switch happens.
+    """
+    ensure_loaded()
+    with _lazy_lock:
+        current = model
+        name = getattr(current, "variant", None)
+        cache = _prefix_caches.get(name)
+        if cache is None:
+            cache = _prefix_caches[name] = PrefixCache(tokenizer, current)
+        return Snapshot(current, cache, model_identity(current))
+
+
+def prefix_cache() -> PrefixCache:
+    """The SYSTEM_PROMPT KV cache for the model in use, prefilled on first use."""
+    return snapshot().prefix_cache
+
+
+def constrained_decoder() -> ConstrainedDecoder:
+    """Token tables for schema-constrained decoding, built on first use."""
+    global _decoder
+    if _decoder is None:
+        with _lazy_lock:
+            if _decoder is None:
+                _decoder = ConstrainedDecoder(ensure_loaded()[0])
+    return _decoder
+
+
+# Answers template-shaped utterances without running the model.
+fast_path = FastPath()
+
+# Model responses by normalized utterance; replace to add a SQLite tier.
+response_cache = ResponseCache()
+
+
+def model_identity(current=None) -> str:
+    """What a cached response depends on: model, backend, adapter or variant, prompt, decoding.
+
+    ``current`` defaults to the model in use.
+    """
+    if current is None:
+        current = ensure_loaded()[1]
+    name = getattr(current, "name_or_path", None) or MODEL_ID
+    backend = getattr(current, "inference_backend", None)
+    adapter = getattr(current, "active_adapter", None) or getattr(current, "variant", None)
+    prompt = hashlib.sha1(SYSTEM_PROMPT.encode()).hexdigest()[:12]
+    return f"{name}|{backend}|{adapter}|{prompt}|constrained"
+
+
+def generate(user_input: str) -> str:
+    """Return the tool_calls JSON for one utterance.
+
+    The rule-based fast path answers when it is confident, then the
+    response cache; everything else goes to generate_model().
+    """
+    return fast_path.answer(user_input, _cached_generate_model)
+
+
+def _cached_generate_model(user_input: str) -> str:
+    current = snapshot()
+    if not response_cache.identity:
+        response_cache.set_identity(current.identity)
+    return response_cache.get_or_generate(user_input, lambda text: _generate_on(current, text),
+                                          identity=current.identity)
+
+
+def generate_model(user_input: str, speculative=True) -> str:
+    """Run the model on one utterance and return its tool_calls JSON.
+
+    Decoding is constrained to the tool_calls schema and stops as soon as
+    the object closes; the prompt prefix comes from the KV prefix cache.
+    With ``speculative`` a draft built from the utterance is verified
+    several tokens per forward pass; the output is the same either way.
+    """
+    return _generate_on(snapshot(), user_input, speculative)
+
+
+def _generate_on(current: Snapshot, user_input: str, speculative=True) -> str:
+    with metrics.stage("build_prompt"):
+        prompt = build_prompt(user_input)
+    with metrics.stage("tokenize"):
+        ids = tokenizer(prompt)["input_ids"]
+    past, cached = current.prefix_cache.past_for(ids)
+    decoder = constrained_decoder()
+    stepper = decoder.model_step(current.model, past, cached)
+    with metrics.stage("generate"):
+        if speculative:
+            text, _, _ = decode_speculative(decoder, stepper, ids[cached:], draft_tool_calls(user_input))
+        else:
+            text, _ = decoder.decode(stepper, ids[cached:])
+    if metrics.enabled:
+        # the KV cache never holds the last choice or the forced text after
+        # it (the closing brackets), so count the output itself
+        metrics.count("tokens_generated", len(tokenizer(text, add_special_tokens=False)["input_ids"]))
+    return text
+
+
+def generate_text(user_input: str) -> str:
+    """Unconstrained generation: the decoded free-form completion, without the prompt."""
+    return prefix_cache().generate(build_prompt(user_input), max_new_tokens=200)
+
+
+def generate_uncached(user_input: str) -> str:
+    """generate_text() without the prefix cache: prefills the whole prompt."""
+    import torch
+
+    tokenizer, model = ensure_loaded()
+    prompt = build_prompt(user_input)
+    inputs = tokenizer(prompt, return_tensors="pt").to(model.device)
+    with torch.no_grad():
+        outputs = model.generate(**inputs, max_new_tokens=200, do_sample=False)
+    return tokenizer.decode(outputs[0][inputs["input_ids"].shape[1]:], skip_special_tokens=True)
+
+
+def generate_many(user_inputs) -> list:
+    """generate_text() for several utterances as one batched decode."""
+    prompts = [build_prompt(user_input) for user_input in user_inputs]
+    return generate_batch(*ensure_loaded(), prompts, max_new_tokens=200)
+
+
+def apply_response(response: str, session_id=None):
+    """Dispatch the tool calls of a model response.
+
+    generate() returns exactly the JSON object; free-form text from
+    generate_text()/generate_many() still goes through _extract_json.
+    """
+    if not response.startswith("{"):
+        with metrics.stage("extract"):
+            response = _extract_json(response)
+    return dispatch(response, session_id)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--backend', default=None, help='see inference/load_model.py')
+    parser.add_argument('--snapshot', default=None, help='local model snapshot directory')
+    parser.add_argument('--variant', default=None, help='exported fine-tune to load, by name')
+    args = parser.parse_args()
+
+    try:
+        ensure_loaded(args.backend, args.snapshot, args.variant)
+    except Exception as e:
+        print("Model not available, exiting:", e)
+        return
+    while True:
+        user_input = input(">> ")
+        response = generate(user_input)
+        print("Model raw:", response)
+        try:
+            result = apply_response(response)
+            if result is not None:
+                print("Calculator:", result)
+        except Exception as e:
+            print("Dispatch error:", e)
+
+
 if __name__ == '__main__':
-    if tokenizer is None:
-        print("Model not available, exiting.")
-    else:
-        while True:
-            user_input = input(">> ")
-            prompt = build_prompt(user_input)
-            inputs = tokenizer(prompt, return_tensors="pt").to(model.device)
-            with torch.no_grad():
-                outputs = model.generate(**inputs, max_new_tokens=200, do_sample=False)
-            response = tokenizer.decode(outputs[0], skip_special_tokens=True)
-            print("Model raw:", response)
-            json_part = _extract_json(response)
-            try:
-                # dispatch expects a JSON string
-                result = dispatch(json_part)
-                if result is not None:
-                    print("Calculator:", result)
-            except Exception as e:
-                print("Dispatch error:", e)
+    main()
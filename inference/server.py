@@ -0,0 +1,310 @@
+"""Async local HTTP front end for the agent loop.
+
+  POST /utterance   {"text": "What is 7 and 9?", "session_id": "alice"}
+  GET  /stats
+  GET  /metrics     per-stage latency histograms, Prometheus text format
+
+Each utterance runs model generation and dispatch in a worker thread so the
+event loop stays responsive. At most ``max_concurrency`` utterances run at
+once and at most ``max_queue`` more wait; beyond that a request is rejected
+immediately with 429 rather than queued without bound.
+
+Runs fully offline against the locally cached model:
+
+  python -m inference.server --port 8088 --max_concurrency 2 --max_queue 16
+  python -m inference.server --unix /tmp/talkcalc.sock
+  python -m inference.server --max_batch 8 --max_wait_ms 10   # legacy, see below
+  python -m inference.server --metrics --metrics_prom /var/lib/node_exporter/talkcalc.prom
+  python -m inference.server --workers 4 --max_concurrency 8   # forked model workers
+  python -m inference.server --workers 4 --response_cache data/response_cache.sqlite
+
+With --workers every worker opens its own connection to the response cache;
+the metrics flags need a single process and are rejected.
+
+--max_batch is the legacy unconstrained path: utterances the fast path does
+not answer are micro-batched through run_agent.generate_many, free-form
+generation without the tool_calls schema or the response cache. It cannot
+be combined with --response_cache/--cache_slots.
+"""
+
+import argparse
+import asyncio
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from app import metrics
+
+_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 429: "Too Many Requests",
+            500: "Internal Server Error"}
+_MAX_BODY = 64 * 1024
+
+
+class Overloaded(Exception):
+    """Raised when both the worker slots and the wait queue are full."""
+
+
+def process_utterance(generate, apply_response, text, session_id=None):
+    """Generate and dispatch one utterance; returns the reply sent to the client.
+
+    A failed dispatch is reported in "error" next to the raw response; a
+    failed generation has no raw response ("raw" is None).
+    """
+    try:
+        response = generate(text)
+    except Exception as e:
+        return _failed_reply(session_id, f"Generation failed: {type(e).__name__}: {e}")
+    try:
+        result = apply_response(response, session_id)
+        error = None
+    except Exception as e:
+        result, error = None, str(e)
+    return {
+        "session_id": session_id,
+        "result": None if result is None else str(result),
+        "error": error,
+        "raw": response,
+    }
+
+
+class AgentServer:
+    """
+    Front end around a ``generate(text) -> response`` function and an
+    ``apply_response(response, session_id) -> result`` function (by default
+    inference.run_agent.generate / apply_response). ``process(text,
+    session_id) -> reply`` replaces both, e.g. a WorkerPool's.
+    """
+
+    def __init__(self, generate, apply_response, max_concurrency=2, max_queue=16, process=None):
+        self.generate = generate
+        self.apply_response = apply_response
+        self.process = process or self._process
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self._slots = asyncio.Semaphore(max_concurrency)
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency,
+                                            thread_name_prefix="agent")
+        self._pending = 0  # running + waiting
+        self._served = 0
+        self._rejected = 0
+        self._failed = 0
+
+    async def submit(self, text, session_id=None):
+        """Process one utterance; raises Overloaded when the queue is full."""
+        if self._pending >= self.max_concurrency + self.max_queue:
+            self._rejected += 1
+            raise Overloaded()
+        self._pending += 1
+        start = time.perf_counter()
+        try:
+            async with self._slots:
+                queued = time.perf_counter() - start
+                loop = asyncio.get_running_loop()
+                try:
+                    reply = await loop.run_in_executor(self._executor, self.process, text, session_id)
+                except Exception as e:  # a process() that raised instead of replying
+                    reply = _failed_reply(session_id, f"{type(e).__name__}: {e}")
+        finally:
+            self._pending -= 1
+        if reply["error"] is None:
+            self._served += 1
+        else:
+            self._failed += 1
+        reply["queue_ms"] = round(queued * 1e3, 3)
+        reply["latency_ms"] = round((time.perf_counter() - start) * 1e3, 3)
+        return reply
+
+    def stats(self):
+        return {
+            "pending": self._pending,
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "served": self._served,
+            "failed": self._failed,
+            "rejected": self._rejected,
+        }
+
+    async def serve(self, host="127.0.0.1", port=8088, unix_path=None):
+        if unix_path:
+            server = await asyncio.start_unix_server(self._handle, path=unix_path)
+        else:
+            server = await asyncio.start_server(self._handle, host, port)
+        async with server:
+            await server.serve_forever()
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    # Internal helpers (non-public) -------------------------------------
+
+    def _process(self, text, session_id):
+        """Worker thread: model generation then dispatch."""
+        return process_utterance(self.generate, self.apply_response, text, session_id)
+
+    async def _handle(self, reader, writer):
+        try:
+            status, body = await self._route(reader)
+        except (asyncio.IncompleteReadError, asyncio.TimeoutError, ConnectionError):
+            writer.close()
+            return
+        except ValueError as e:
+            status, body = 400, {"error": str(e)}
+        except Exception as e:
+            status, body = 500, {"error": f"{type(e).__name__}: {e}"}
+        if isinstance(body, str):
+            payload, content_type = body.encode(), "text/plain; version=0.0.4"
+        else:
+            payload, content_type = json.dumps(body).encode(), "application/json"
+        writer.write(
+            f"HTTP/1.1 {status} {_REASONS[status]}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Length: {len(payload)}\r\n"
+            f"Connection: close\r\n\r\n".encode() + payload
+        )
+        try:
+            await writer.drain()
+        finally:
+            writer.close()
+
+    async def _route(self, reader):
+        head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), timeout=10)
+        request_line, *header_lines = head.decode("latin-1").split("\r\n")
+        method, path, _ = request_line.split(" ", 2)
+        headers = {}
+        for line in header_lines:
+            if ":" in line:
+                key, value = line.split(":", 1)
+                headers[key.strip().lower()] = value.strip()
+
+        if method == "GET" and path == "/stats":
+            return 200, self.stats()
+        if method == "GET" and path == "/metrics":
+            return 200, metrics.prometheus_text()
+        if method != "POST" or path != "/utterance":
+            return 404, {"error": f"No route for {method} {path}"}
+
+        length = int(headers.get("content-length", 0))
+        if length > _MAX_BODY:
+            raise ValueError("Request body too large")
+        request = json.loads(await reader.readexactly(length) or b"{}")
+        if not isinstance(request, dict):
+            raise ValueError("Request body must be a JSON object")
+        text = request.get("text")
+        if not isinstance(text, str) or not text.strip():
+            raise ValueError("Missing 'text'")
+        try:
+            reply = await self.submit(text, request.get("session_id"))
+        except Overloaded:
+            return 429, {"error": "overloaded", **self.stats()}
+        # no raw response: generation itself failed, not the dispatch of its answer
+        return (500 if reply["raw"] is None else 200), reply
+
+
+def _failed_reply(session_id, error):
+    return {"session_id": session_id, "result": None, "error": error, "raw": None}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8088)
+    parser.add_argument('--unix', default=None, help='serve on a Unix socket path instead')
+    parser.add_argument('--max_concurrency', type=int, default=2)
+    parser.add_argument('--max_queue', type=int, default=16)
+    parser.add_argument('--backend', default=None, help='see inference/load_model.py')
+    parser.add_argument('--snapshot', default=None, help='local model snapshot directory')
+    parser.add_argument('--variant', default=None, help='exported fine-tune to serve, by name')
+    parser.add_argument('--response_cache', default=None,
+                        help='SQLite file for persistent cached responses, e.g. data/response_cache.sqlite')
+    parser.add_argument('--cache_slots', action='store_true',
+                        help='share cached responses between utterances that differ only in numbers')
+    parser.add_argument('--max_batch', type=int, default=1,
+                        help='legacy unconstrained path: micro-batch up to this many model fallbacks '
+                             'per free-form generate call')
+    parser.add_argument('--max_wait_ms', type=float, default=10.0,
+                        help='how long a micro-batch waits to fill')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='forked processes sharing the loaded model (see inference/worker_pool.py)')
+    parser.add_argument('--threads', type=int, default=None, help='torch threads per worker')
+    parser.add_argument('--request_timeout', type=float, default=60.0,
+                        help='with --workers, seconds before a request to a worker fails')
+    parser.add_argument('--metrics', action='store_true',
+                        help='record per-stage latency histograms (also CALC_METRICS=1)')
+    parser.add_argument('--metrics_jsonl', default=None, help='append metric summaries to this file')
+    parser.add_argument('--metrics_prom', default=None, help='keep a Prometheus text file up to date')
+    parser.add_argument('--metrics_interval', type=float, default=10.0,
+                        help='seconds between metric exports')
+    args = parser.parse_args()
+    if args.workers > 1 and args.max_batch > 1:
+        parser.error("--workers and --max_batch cannot be combined")
+    if args.max_batch > 1 and (args.response_cache or args.cache_slots):
+        parser.error("--max_batch (unconstrained batched decoding) cannot be combined with "
+                     "--response_cache/--cache_slots")
+    # metrics are recorded in the process that generates, so with workers
+    # /metrics and the exports would only ever see the parent's empty ones
+    if args.workers > 1 and (args.metrics or args.metrics_jsonl or args.metrics_prom):
+        parser.error("--workers and --metrics/--metrics_jsonl/--metrics_prom cannot be combined")
+
+    from inference import run_agent
+
+    try:
+        run_agent.ensure_loaded(args.backend, args.snapshot, args.variant)
+        run_agent.warm_up()
+    except Exception as e:
+        raise SystemExit(f"Model not available, exiting: {e}")
+    print("Startup: " + ", ".join(f"{k} {v:.2f}s" for k, v in run_agent.startup.items()))
+    metrics.reset()  # drop the warm-up pass, before workers fork with a copy
+
+    def open_response_cache():
+        from inference.response_cache import ResponseCache
+        run_agent.response_cache = ResponseCache(run_agent.model_identity(),
+                                                 path=args.response_cache, slots=args.cache_slots)
+
+    use_response_cache = bool(args.response_cache or args.cache_slots)
+    pool = process = None
+    if args.workers > 1:
+        from inference.worker_pool import WorkerPool
+        # fork before any SQLite connection or export thread exists; every
+        # worker opens its own connection to the response cache
+        pool = WorkerPool(args.workers, threads=args.threads,
+                          initializer=open_response_cache if use_response_cache else None)
+        process = partial(pool.process, timeout=args.request_timeout)
+        # each waiting request holds a front-end thread; keep every worker busy
+        args.max_concurrency = max(args.max_concurrency, 2 * args.workers)
+    elif use_response_cache:
+        open_response_cache()
+    stop_export = None
+    if args.metrics or args.metrics_jsonl or args.metrics_prom:
+        metrics.enable()
+    if args.metrics_jsonl or args.metrics_prom:
+        stop_export = metrics.export_every(args.metrics_interval, args.metrics_jsonl, args.metrics_prom)
+    generate, batcher = run_agent.generate, None
+    if args.max_batch > 1:
+        from inference.batching import MicroBatcher
+        batcher = MicroBatcher(run_agent.generate_many, args.max_batch, args.max_wait_ms)
+        # the rules still answer first; only their fallbacks are batched
+        generate = partial(run_agent.fast_path.answer, fallback=batcher)
+        # a batch can only fill if that many utterances run at once
+        args.max_concurrency = max(args.max_concurrency, args.max_batch)
+    server = AgentServer(generate, run_agent.apply_response,
+                         args.max_concurrency, args.max_queue,
+                         process=process)
+    where = args.unix or f"http://{args.host}:{args.port}"
+    print(f"Serving on {where} (concurrency={args.max_concurrency}, queue={args.max_queue})")
+    try:
+        asyncio.run(server.serve(args.host, args.port, args.unix))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+        if pool is not None:
+            pool.close()
+        if batcher is not None:
+            batcher.close()
+        if stop_export is not None:
+            stop_export()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+"""Speculative constrained decoding with a deterministic drafter.
+
+The tool_calls JSON is mostly predictable from the utterance: draft_tool_calls
+guesses it from the numbers in the text and a few operation keywords. The
+decoder then feeds the model the pending tokens plus every drafted token in
+one forward pass and checks each drafted choice against the model's own
+constrained greedy choice at that position:
+
+  - choices that match are accepted, several per forward pass
+  - at the first mismatch the model's choice is taken instead and the KV
+    cache is cropped back to that point
+  - if the whole draft is accepted, the last position also yields the next
+    choice for free
+
+Every choice is still the model's constrained argmax over the same prefix,
+so the result is the same as ConstrainedDecoder.decode (up to float rounding
+differences between batched and one-token forward passes); a bad draft only
+costs speed.
+
+  text, grammar, stats = decode_speculative(decoder, stepper, prompt_ids,
+                                            draft_tool_calls(utterance))
+  stats  # {"forwards": ..., "drafted": ..., "accepted": ...}
+"""
+
+import copy
+import json
+
+from inference.constrained import ToolCallGrammar
+from inference.fast_path import _json_number, read_number, tokenize
+
+# keyword -> tool for the numbers that follow it
+_KEYWORDS = {
+    "add": "add", "plus": "add", "and": None,
+    "subtract": "subtract", "minus": "subtract", "less": "subtract", "take": "subtract",
+    "multiply": "multiply", "times": "multiply",
+    "divide": "divide", "divided": "divide", "over": "divide",
+    "percent": "percent",
+}
+
+
+def draft_tool_calls(utterance):
+    """Best guess of the tool_calls JSON for an utterance; '' if none.
+
+    Each number becomes a call to the tool named by the closest keyword
+    before it ("add" by default). Without numbers, "total" drafts get_total
+    and "clear"/"reset" draft clear_all.
+    """
+    tokens = tokenize(utterance)
+    calls, tool = [], "add"
+    i = 0
+    while i < len(tokens):
+        number = read_number(tokens, i, signed=not calls)
+        if number is not None:
+            calls.append({"name": tool, "arguments": {"number": _json_number(number[0])}})
+            i = number[1]
+            continue
+        tool = _KEYWORDS.get(tokens[i]) or tool
+        i += 1
+    if not calls:
+        if "clear" in tokens or "reset" in tokens:
+            calls = [{"name": "clear_all", "arguments": {}}]
+        elif "total" in tokens:
+            calls = [{"name": "get_total", "arguments": {}}]
+        else:
+            return ""
+    return json.dumps({"tool_calls": calls}, separators=(",", ":"))
+
+
+def decode_speculative(decoder, stepper, prompt_ids, draft, max_calls=16, max_draft=64):
+    """Constrained greedy decoding that verifies ``draft`` in bulk.
+
+    ``stepper`` needs ``forward(ids)`` (scores after each id), ``crop(length)``
+    and ``length``, like constrained.ModelStepper. Returns the JSON text,
+    the grammar and counters: forward passes, drafted and accepted choices.
+    """
+    grammar = ToolCallGrammar(max_calls=max_calls)
+    pending = list(prompt_ids)
+    stats = {"forwards": 0, "drafted": 0, "accepted": 0}
+    while True:
+        forced = grammar.forced()
+        if forced:
+            pending.extend(decoder.encode(forced))
+            grammar.advance(forced)
+        if grammar.done:
+            return grammar.text, grammar, stats
+
+        # extend pending with the draft: (grammar before, piece, deciding index)
+        tokens, plan = pending, []
+        sim = copy.copy(grammar)
+        remaining = draft[len(sim.text):] if draft.startswith(sim.text) else ""
+        while remaining and len(plan) < max_draft:
+            piece = _draft_piece(decoder, sim, remaining)
+            if piece is None:
+                break
+            plan.append((copy.copy(sim), piece, len(tokens) - 1))
+            sim.advance(piece)
+            tokens.append(decoder.pieces[piece])
+            remaining = remaining[len(piece):]
+            forced = sim.forced()
+            if forced:
+                tokens.extend(decoder.encode(forced))
+                sim.advance(forced)
+                remaining = remaining[len(forced):] if remaining.startswith(forced) else ""
+            if sim.done:
+                break
+
+        base = stepper.length
+        scores = stepper.forward(tokens)
+        stats["forwards"] += 1
+        stats["drafted"] += len(plan)
+        for before, piece, index in plan:
+            choice = decoder.choose(before, scores[index])
+            if choice != piece:
+                # the model's own choice wins; forget everything drafted after it
+                stepper.crop(base + index + 1)
+                grammar = before
+                break
+            stats["accepted"] += 1
+        else:
+            grammar = sim
+            if grammar.done:
+                return grammar.text, grammar, stats
+            choice = decoder.choose(grammar, scores[-1])
+        grammar.advance(choice)
+        pending = [decoder.pieces[choice]]
+
+
+def _draft_piece(decoder, grammar, remaining):
+    """Longest valid piece at a choice point that the draft continues with."""
+    best = None
+    for piece in grammar.options(decoder):
+        if (remaining.startswith(piece) and piece in decoder.pieces and grammar.accepts(piece)
+                and (best is None or len(piece) > len(best))):
+            best = piece
+    return best
@@ -0,0 +1,362 @@
+"""Forked agent workers sharing one copy of the model.
+
+One process is bound by the GIL for tokenization, JSON extraction and
+dispatch, and torch's intra-op threads stop scaling after a few cores for a
+270M model at batch size 1. WorkerPool instead
+
+  - loads (and warms up) the model once in the parent, then forks the
+    workers: the weights are shared copy-on-write, and with a snapshot
+    (load_model) they are a memory-mapped file shared through the page
+    cache. gc.freeze() before forking keeps the collector from touching,
+    and so copying, the parent's objects
+  - gives every worker ``threads`` torch threads (cores / workers by
+    default) and, with ``pin_cpus``, its own cores
+  - routes each utterance by session id, so a session's Calculator always
+    lives in the same worker
+  - reports per-worker RSS and PSS (shared pages divided between the
+    processes that map them), the number that shows what forking saves
+  - notices a worker that died, fails the requests it held and forks a
+    replacement, so its sessions do not hang. Every worker answers on its
+    own pipe, so one killed mid-write cannot block the others
+
+  pool = WorkerPool(4, prepare=load_agent(snapshot="snapshots/int8"))
+  reply = pool.process("What is 7 and 9?", session_id="alice")
+  pool.close()
+
+  python -m inference.worker_pool --workers 4 --requests 200 --mode model
+  python -m inference.server --workers 4      # the HTTP front end on a pool
+
+Workers are forked, so this needs a platform with fork (Linux, macOS).
+"""
+
+import argparse
+import gc
+import itertools
+import multiprocessing
+import os
+import random
+import sys
+import threading
+import time
+import zlib
+from concurrent.futures import Future, TimeoutError
+from multiprocessing.connection import wait
+
+MODES = ("pipeline", "model")
+
+
+def agent_reply(text, session_id=None, mode="pipeline"):
+    """Generate and dispatch one utterance with run_agent; the reply AgentServer returns."""
+    from inference import run_agent
+    from inference.server import process_utterance
+
+    generate = run_agent.generate if mode == "pipeline" else run_agent.generate_model
+    return process_utterance(generate, run_agent.apply_response, text, session_id)
+
+
+def load_agent(backend=None, snapshot=None, variant=None):
+    """A ``prepare`` for WorkerPool: load and warm up run_agent's model in the parent."""
+    def prepare():
+        from inference import run_agent
+
+        run_agent.ensure_loaded(backend, snapshot, variant)
+        run_agent.warm_up()
+
+    return prepare
+
+
+class WorkerPool:
+    """
+    Forked workers answering utterances with session affinity.
+
+      - process(text, session_id=None, timeout=None)   # blocking; the handler's reply
+      - submit(text, session_id=None)    # concurrent.futures.Future of the reply
+      - worker_of(session_id)            # index of the worker owning the session
+      - stats()                          # per-worker pid, served, restarts, RSS and PSS
+      - close()
+
+    ``initializer()`` runs in every worker right after the fork, for what
+    must not be shared across fork() (e.g. SQLite connections). A worker
+    that dies (OOM kill, crash in a native op) fails its pending requests
+    and is forked again from the parent; the sessions it held start over.
+    """
+
+    def __init__(self, workers, handler=agent_reply, prepare=None, threads=None, pin_cpus=False,
+                 initializer=None):
+        if workers < 1:
+            raise ValueError("workers must be at least 1")
+        if prepare is not None:
+            prepare()
+        self.workers = workers
+        self.handler = handler
+        self.initializer = initializer
+        self._cores = sorted(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else \
+            list(range(os.cpu_count() or 1))
+        self.threads = threads or max(1, len(self._cores) // workers)
+        self.pin_cpus = pin_cpus
+        self._ids = itertools.count()
+        self._futures = {}  # request id -> (future, worker index)
+        self._served = [0] * workers
+        self._restarts = [0] * workers
+        self._lock = threading.Lock()
+        self._closing = False
+
+        self._context = multiprocessing.get_context("fork")
+        self._inboxes = [None] * workers
+        self._results = [None] * workers  # parent end of each worker's reply pipe
+        self._processes = [None] * workers
+        self._wakeup, self._stop = self._context.Pipe(duplex=False)
+        gc.freeze()  # objects created so far are never scanned again, so their pages stay shared
+        for index in range(workers):
+            self._start(index)
+        self._collector = threading.Thread(target=self._collect, name="agent-results", daemon=True)
+        self._collector.start()
+
+    def worker_of(self, session_id):
+        key = "" if session_id is None else str(session_id)
+        return zlib.crc32(key.encode()) % self.workers
+
+    def submit(self, text, session_id=None):
+        return self._submit(text, session_id)[1]
+
+    def process(self, text, session_id=None, timeout=None):
+        """The reply; raises TimeoutError after ``timeout`` seconds, RuntimeError if the worker died."""
+        request_id, future = self._submit(text, session_id)
+        try:
+            return future.result(timeout)
+        except TimeoutError:
+            with self._lock:
+                self._futures.pop(request_id, None)  # a late reply is dropped
+            raise
+
+    def stats(self):
+        with self._lock:
+            served, restarts, processes = list(self._served), list(self._restarts), list(self._processes)
+        workers = []
+        for index, process in enumerate(processes):
+            memory = process_memory(process.pid)
+            workers.append({"worker": index, "pid": process.pid, "alive": process.is_alive(),
+                            "served": served[index], "restarts": restarts[index], **memory})
+        return {"workers": workers, "threads_per_worker": self.threads,
+                "parent": process_memory(os.getpid())}
+
+    def close(self):
+        with self._lock:
+            self._closing = True
+        for inbox in self._inboxes:
+            inbox.put(None)
+        for process in self._processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+        self._stop.send(None)  # the collector delivers what is left, then returns
+        self._collector.join()
+        with self._lock:
+            for future, _ in self._futures.values():
+                future.set_exception(RuntimeError("Worker pool closed"))
+            self._futures.clear()
+        for connection in (*self._results, self._wakeup, self._stop):
+            connection.close()
+
+    # Internal helpers (non-public) -------------------------------------
+
+    def _submit(self, text, session_id):
+        future = Future()
+        index = self.worker_of(session_id)
+        with self._lock:
+            if self._closing:
+                raise RuntimeError("Worker pool closed")
+            request_id = next(self._ids)
+            self._futures[request_id] = (future, index)
+            # under the lock, so a restart cannot swap the inbox in between
+            self._inboxes[index].put((request_id, text, session_id))
+        return request_id, future
+
+    def _start(self, index):
+        cpus = None
+        if self.pin_cpus:
+            cores = self._cores
+            cpus = [cores[(index * self.threads + i) % len(cores)] for i in range(self.threads)]
+        # a fresh inbox and reply pipe: a dead worker may have died holding
+        # the old inbox's read lock or halfway through writing a reply
+        inbox = self._context.SimpleQueue()
+        results, reply_end = self._context.Pipe(duplex=False)
+        process = self._context.Process(
+            target=_work, name=f"agent-worker-{index}", daemon=True,
+            args=(self.handler, inbox, reply_end, self.threads, cpus, self.initializer))
+        process.start()
+        reply_end.close()  # only the worker writes; its exit then reads as EOF
+        self._inboxes[index], self._results[index], self._processes[index] = inbox, results, process
+
+    def _collect(self):
+        """Deliver replies, and restart workers that exit while the pool is open."""
+        with self._lock:
+            readers = {results: index for index, results in enumerate(self._results)}
+            sentinels = {process.sentinel: index for index, process in enumerate(self._processes)}
+        while True:
+            ready = wait([*readers, *sentinels, self._wakeup])
+            # replies first: a worker's last replies are read before it is declared dead
+            for results in ready:
+                if results in readers and not self._receive(readers[results], results):
+                    del readers[results]  # EOF: the worker exited
+            if self._wakeup in ready:
+                for results, index in readers.items():
+                    while results.poll() and self._receive(index, results):
+                        pass
+                return
+            for sentinel in ready:
+                index = sentinels.pop(sentinel, None)  # None for the reply pipes
+                if index is None:
+                    continue
+                readers = {results: i for results, i in readers.items() if i != index}
+                if self._restart(index):
+                    readers[self._results[index]] = index
+                    sentinels[self._processes[index].sentinel] = index
+
+    def _receive(self, index, results):
+        """Deliver one reply from ``results``; False at EOF."""
+        try:
+            request_id, reply, error = results.recv()
+        except (EOFError, OSError):
+            return False
+        with self._lock:
+            entry = self._futures.pop(request_id, None)
+            self._served[index] += 1
+        if entry is None:  # timed out, or failed when its worker was restarted
+            return True
+        if error is None:
+            entry[0].set_result(reply)
+        else:
+            entry[0].set_exception(RuntimeError(error))
+        return True
+
+    def _restart(self, index):
+        """Fail the requests of dead worker ``index`` and fork a replacement; False once closing."""
+        dead, results = self._processes[index], self._results[index]
+        dead.join()
+        while results.poll() and self._receive(index, results):
+            pass  # replies it finished before dying
+        with self._lock:
+            if self._closing:
+                return False
+            results.close()
+            error = RuntimeError(f"Worker {index} (pid {dead.pid}) exited with code {dead.exitcode}")
+            for request_id, (future, owner) in list(self._futures.items()):
+                if owner == index:
+                    del self._futures[request_id]
+                    future.set_exception(error)
+            self._restarts[index] += 1
+            self._start(index)
+            return True
+
+
+def process_memory(pid):
+    """RSS, PSS and private memory of a process in MB (Linux /proc; None elsewhere)."""
+    fields = {"Rss": None, "Pss": None, "Private_Clean": 0, "Private_Dirty": 0}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                key, _, value = line.partition(":")
+                if key in fields:
+                    fields[key] = int(value.split()[0]) * 1024
+    except OSError:
+        return {"rss_mb": None, "pss_mb": None, "private_mb": None}
+
+    def mb(value):
+        return None if value is None else value / 2 ** 20
+
+    return {"rss_mb": mb(fields["Rss"]), "pss_mb": mb(fields["Pss"]),
+            "private_mb": mb(fields["Private_Clean"] + fields["Private_Dirty"])}
+
+
+# Internal helpers (non-public) -------------------------------------
+
+def _work(handler, inbox, results, threads, cpus, initializer):
+    if cpus and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cpus)
+    if initializer is not None:
+        initializer()
+    torch = sys.modules.get("torch")  # only if prepare() loaded a model
+    if torch is not None:
+        torch.set_num_threads(threads)
+    while True:
+        item = inbox.get()
+        if item is None:
+            return
+        request_id, text, session_id = item
+        try:
+            results.send((request_id, handler(text, session_id), None))
+        except Exception as e:
+            results.send((request_id, None, f"{type(e).__name__}: {e}"))
+
+
+def _workload(n, sessions, seed=0):
+    from data.templates import ADD_TEMPLATES, CLEAR_TEMPLATES, TOTAL_TEMPLATES
+
+    rng = random.Random(seed)
+    for i in range(n):
+        pick = rng.random()
+        if pick < 0.7:
+            text = rng.choice(ADD_TEMPLATES).format(a=rng.randint(1, 99), b=rng.randint(1, 99),
+                                                    c=rng.randint(1, 99))
+        elif pick < 0.9:
+            text = rng.choice(TOTAL_TEMPLATES)
+        else:
+            text = rng.choice(CLEAR_TEMPLATES)
+        yield text, f"bench-{i % sessions}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Throughput and memory of a worker pool versus one process")
+    parser.add_argument('--workers', type=int, default=max(1, (os.cpu_count() or 1) // 2))
+    parser.add_argument('--threads', type=int, default=None, help='torch threads per worker (default: cores / workers)')
+    parser.add_argument('--pin_cpus', action='store_true', help='give every worker its own cores')
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--sessions', type=int, default=16)
+    parser.add_argument('--mode', default='model', choices=MODES,
+                        help='model: every utterance runs the model; pipeline: fast path and caches first')
+    parser.add_argument('--backend', default=None, help='see inference/load_model.py')
+    parser.add_argument('--snapshot', default=None, help='local model snapshot directory')
+    parser.add_argument('--variant', default=None, help='exported fine-tune to load, by name')
+    args = parser.parse_args()
+
+    def handler(text, session_id):
+        return agent_reply(text, session_id, args.mode)
+
+    load_agent(args.backend, args.snapshot, args.variant)()
+    workload = list(_workload(args.requests, args.sessions))
+
+    start = time.perf_counter()
+    for text, session_id in workload:
+        handler(text, session_id)
+    single = args.requests / (time.perf_counter() - start)
+    parent = process_memory(os.getpid())
+    print(f"single process: {single:7.1f} utterances/s  RSS {parent['rss_mb'] or 0:,.0f} MB")
+
+    pool = WorkerPool(args.workers, handler, threads=args.threads, pin_cpus=args.pin_cpus)
+    try:
+        for text, session_id in workload[:args.workers * 2]:  # warm up
+            pool.process(text, session_id)
+        start = time.perf_counter()
+        futures = [pool.submit(text, session_id) for text, session_id in workload]
+        for future in futures:
+            future.result()
+        pooled = args.requests / (time.perf_counter() - start)
+        stats = pool.stats()
+    finally:
+        pool.close()
+    print(f"{args.workers} workers x {stats['threads_per_worker']} threads: {pooled:7.1f} utterances/s "
+          f"({pooled / single:.2f}x)")
+    total_pss = 0.0
+    for worker in stats["workers"]:
+        total_pss += worker["pss_mb"] or 0
+        print(f"  worker {worker['worker']} pid {worker['pid']}: served {worker['served']:5d}  "
+              f"RSS {worker['rss_mb'] or 0:7,.0f} MB  PSS {worker['pss_mb'] or 0:7,.0f} MB  "
+              f"private {worker['private_mb'] or 0:7,.0f} MB")
+    total_pss += stats["parent"]["pss_mb"] or 0
+    print(f"  parent + workers PSS {total_pss:,.0f} MB "
+          f"(a private copy per worker would be about {(args.workers + 1) * (parent['rss_mb'] or 0):,.0f} MB)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+"""Load time, resident memory and tokens/sec for each inference backend.
+
+Each backend runs in a fresh subprocess so load time and memory are not
+skewed by the previous one. Tokens/sec is greedy generation of exactly
+``--new_tokens`` tokens for a template prompt. Needs torch and transformers
+(plus optimum[onnxruntime] for onnx, bitsandbytes and CUDA for
+bitsandbytes); a backend that cannot run is reported as skipped. This file
+is not collected by pytest. Run it from the repository root:
+
+  python -m tests.bench_backends
+  python -m tests.bench_backends --backends fp32 dynamic_int8 --new_tokens 64
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+
+def rss_bytes():
+    """Current resident set size of this process."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def measure(backend, new_tokens, repeat):
+    before = rss_bytes()
+    start = time.perf_counter()
+    import torch
+    from inference.load_model import load
+    from inference.prompt_builder import build_prompt
+
+    tokenizer, model = load(backend)
+    load_seconds = time.perf_counter() - start
+    loaded = rss_bytes()
+
+    inputs = tokenizer(build_prompt("What is 7 and 9?"), return_tensors="pt").to(model.device)
+    settings = dict(max_new_tokens=new_tokens, min_new_tokens=new_tokens, do_sample=False)
+    with torch.no_grad():
+        model.generate(**inputs, **settings)  # warm up
+        start = time.perf_counter()
+        for _ in range(repeat):
+            model.generate(**inputs, **settings)
+        elapsed = time.perf_counter() - start
+    return {
+        "backend": model.inference_backend,
+        "load_seconds": load_seconds,
+        "rss_mb": loaded / 2 ** 20,
+        "model_rss_mb": (loaded - before) / 2 ** 20,
+        "tokens_per_sec": new_tokens * repeat / elapsed,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--backends', nargs='+', default=["fp32", "dynamic_int8", "onnx", "bitsandbytes"])
+    parser.add_argument('--new_tokens', type=int, default=32)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--one', default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.one:
+        print(json.dumps(measure(args.one, args.new_tokens, args.repeat)))
+        return
+
+    print(f"{'backend':<14}{'load s':>9}{'RSS MB':>9}{'model MB':>10}{'tokens/s':>10}")
+    for backend in args.backends:
+        child = subprocess.run(
+            [sys.executable, "-m", "tests.bench_backends", "--one", backend,
+             "--new_tokens", str(args.new_tokens), "--repeat", str(args.repeat)],
+            capture_output=True, text=True, cwd=os.getcwd())
+        if child.returncode != 0:
+            reason = (child.stderr.strip().splitlines() or ["failed"])[-1]
+            print(f"{backend:<14} skipped: {reason}")
+            continue
+        r = json.loads(child.stdout.strip().splitlines()[-1])
+        print(f"{backend:<14}{r['load_seconds']:>9.2f}{r['rss_mb']:>9.0f}"
+              f"{r['model_rss_mb']:>10.0f}{r['tokens_per_sec']:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
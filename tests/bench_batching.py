@@ -0,0 +1,72 @@
+"""Utterances/sec of micro-batched generation versus one prompt at a time.
+
+Loads the model through inference.run_agent, then answers the same set of
+template utterances twice: sequentially with run_agent.generate_uncached, and from
+``--clients`` threads through a MicroBatcher over run_agent.generate_many.
+Needs torch, transformers and the cached model. This file is not collected
+by pytest. Run it from the repository root:
+
+  python -m tests.bench_batching
+  python -m tests.bench_batching --number 64 --max_batch 16 --max_wait_ms 20
+"""
+
+import argparse
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from data.templates import ADD_TEMPLATES, TOTAL_TEMPLATES
+
+
+def utterances(number, seed=0):
+    rng = random.Random(seed)
+    out = []
+    for _ in range(number):
+        if rng.random() < 0.8:
+            out.append(rng.choice(ADD_TEMPLATES).format(
+                a=rng.randint(1, 999), b=rng.randint(1, 999), c=rng.randint(1, 999)))
+        else:
+            out.append(rng.choice(TOTAL_TEMPLATES))
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--number', type=int, default=32)
+    parser.add_argument('--clients', type=int, default=8)
+    parser.add_argument('--max_batch', type=int, default=8)
+    parser.add_argument('--max_wait_ms', type=float, default=10.0)
+    args = parser.parse_args()
+
+    from inference import run_agent
+    from inference.batching import MicroBatcher
+
+    try:
+        run_agent.ensure_loaded()
+    except Exception as e:
+        raise SystemExit(f"Model not available, exiting: {e}")
+    texts = utterances(args.number)
+    run_agent.generate_uncached(texts[0])  # warm up
+
+    start = time.perf_counter()
+    sequential = [run_agent.generate_uncached(text) for text in texts]
+    one_at_a_time = time.perf_counter() - start
+
+    batcher = MicroBatcher(run_agent.generate_many, args.max_batch, args.max_wait_ms)
+    with ThreadPoolExecutor(max_workers=args.clients) as pool:
+        start = time.perf_counter()
+        batched = list(pool.map(batcher, texts))
+        micro = time.perf_counter() - start
+    stats = batcher.stats()
+    batcher.close()
+
+    same = sum(a == b for a, b in zip(sequential, batched))
+    print(f"one at a time: {args.number / one_at_a_time:8.2f} utterances/sec")
+    print(f"micro-batched: {args.number / micro:8.2f} utterances/sec "
+          f"(x{one_at_a_time / micro:.2f}, mean batch {stats['mean_batch']:.1f}, "
+          f"largest {stats['largest_batch']})")
+    print(f"identical outputs: {same}/{args.number}")
+
+
+if __name__ == '__main__':
+    main()
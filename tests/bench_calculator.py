@@ -0,0 +1,88 @@
+"""Microbenchmarks for the Calculator core.
+
+Reports operations per second for every arithmetic method, per operand type
+(int, float, str, Decimal) and per precision. Each timed step is the operation
+followed by a one-shot ``clear()`` so the total stays put between iterations.
+
+This file is not collected by pytest. Run it from the repository root:
+
+  python -m tests.bench_calculator
+  python -m tests.bench_calculator --number 50000 --precision 0 2 6 --repeat 3
+"""
+
+import argparse
+import time
+from decimal import Decimal
+
+from calculator import Calculator
+
+METHODS = [
+    "add",
+    "subtract",
+    "multiply",
+    "divide",
+    "percent",
+    "percent_add",
+    "percent_substract",
+]
+
+OPERANDS = {
+    "int": 7,
+    "float": 7.25,
+    "str": "7.25",
+    "Decimal": Decimal("7.25"),
+}
+
+
+def bench_method(method, operand, precision, number, repeat=5):
+    """Return ops/sec for ``method(operand)`` on a calculator at ``precision``.
+
+    The best of ``repeat`` timed runs is used to damp scheduler noise.
+    """
+    calc = Calculator(precision=precision, max_value=10 ** 12)
+    calc.add(123)
+    op = getattr(calc, method)
+    undo = calc.clear
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            op(operand)
+            undo()
+        best = min(best, time.perf_counter() - start)
+    return number / best
+
+
+def run(number=20000, precisions=(0, 2, 6), repeat=5):
+    """Run the full matrix and return a list of result dicts."""
+    results = []
+    for precision in precisions:
+        for method in METHODS:
+            for type_name, operand in OPERANDS.items():
+                ops = bench_method(method, operand, precision, number, repeat)
+                results.append({
+                    "method": method,
+                    "type": type_name,
+                    "precision": precision,
+                    "ops_per_sec": ops,
+                })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--number', type=int, default=20000)
+    parser.add_argument('--precision', type=int, nargs='+', default=[0, 2, 6])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    results = run(args.number, args.precision, args.repeat)
+    print(f"{'method':<18} {'type':<8} {'prec':>4} {'ops/sec':>12}")
+    for r in results:
+        print(f"{r['method']:<18} {r['type']:<8} {r['precision']:>4} {r['ops_per_sec']:>12,.0f}")
+    total = sum(r["ops_per_sec"] for r in results) / len(results)
+    print(f"mean ops/sec: {total:,.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""Throughput of CalculatorBank versus N scalar Calculator instances.
+
+Applies the same random batches of (session_id, name, value) rows to a list
+of Calculators, to CalculatorBank.apply() and to CalculatorBank.apply_columns()
+and reports rows per second for each. With --ints every operand is an int, so
+apply_columns() receives an int64 array and runs fully vectorized.
+
+This file is not collected by pytest. Run it from the repository root:
+
+  python -m tests.bench_calculator_bank
+  python -m tests.bench_calculator_bank --sessions 10000 --batch 50000 --ints
+"""
+
+import argparse
+import random
+import time
+
+import numpy as np
+
+from calculator import Calculator
+from calculator_bank import CalculatorBank
+
+MIX = ["add"] * 6 + ["subtract", "multiply", "divide", "percent_add"]
+VALUES = [7, 12, 3, "1.5", "0.25", "2.75", 9]
+INT_VALUES = [7, 12, 3, 2, 25, 9]
+
+
+def make_batches(sessions, batch, batches, values, seed=0):
+    rng = random.Random(seed)
+    return [
+        [(rng.randrange(sessions), rng.choice(MIX), rng.choice(values)) for _ in range(batch)]
+        for _ in range(batches)
+    ]
+
+
+def to_columns(batch, ints):
+    session_ids, names, values = zip(*batch)
+    values = np.array(values, dtype=np.int64) if ints else list(values)
+    return np.array(session_ids, dtype=np.int64), np.array(names), values
+
+
+def bench_scalar(sessions, batches, precision, max_value):
+    calcs = [Calculator(precision=precision, max_value=max_value) for _ in range(sessions)]
+    start = time.perf_counter()
+    for batch in batches:
+        for session_id, name, value in batch:
+            try:
+                getattr(calcs[session_id], name)(value)
+            except ValueError:
+                pass
+    return time.perf_counter() - start
+
+
+def bench_bank(sessions, batches, precision, max_value):
+    bank = CalculatorBank(sessions, precision=precision, max_value=max_value)
+    start = time.perf_counter()
+    for batch in batches:
+        bank.apply(batch)
+    return time.perf_counter() - start
+
+
+def bench_bank_columns(sessions, columns, precision, max_value):
+    bank = CalculatorBank(sessions, precision=precision, max_value=max_value)
+    start = time.perf_counter()
+    for session_ids, names, values in columns:
+        bank.apply_columns(session_ids, names, values)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sessions', type=int, default=5000)
+    parser.add_argument('--batch', type=int, default=20000)
+    parser.add_argument('--batches', type=int, default=5)
+    parser.add_argument('--precision', type=int, default=2)
+    parser.add_argument('--max_value', type=int, default=10 ** 9)
+    parser.add_argument('--ints', action='store_true', help='use only int operands')
+    args = parser.parse_args()
+
+    batches = make_batches(args.sessions, args.batch, args.batches, INT_VALUES if args.ints else VALUES)
+    columns = [to_columns(batch, args.ints) for batch in batches]
+    rows = args.batch * args.batches
+    scalar = bench_scalar(args.sessions, batches, args.precision, args.max_value)
+    bank = bench_bank(args.sessions, batches, args.precision, args.max_value)
+    bank_columns = bench_bank_columns(args.sessions, columns, args.precision, args.max_value)
+    print(f"sessions={args.sessions} rows={rows} precision={args.precision} ints={args.ints}")
+    print(f"scalar Calculators:           {rows / scalar:>12,.0f} rows/sec")
+    print(f"CalculatorBank.apply:         {rows / bank:>12,.0f} rows/sec ({scalar / bank:.2f}x)")
+    print(f"CalculatorBank.apply_columns: {rows / bank_columns:>12,.0f} rows/sec ({scalar / bank_columns:.2f}x)")
+
+
+if __name__ == '__main__':
+    main()
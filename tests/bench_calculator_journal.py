@@ -0,0 +1,61 @@
+"""Per-operation overhead of JournaledCalculator over a plain Calculator.
+
+Times add/multiply/divide/subtract on both, reports ops/sec and the added cost per
+call in nanoseconds, then the time to restore the session from its journal.
+This file is not collected by pytest. Run it from the repository root:
+
+  python -m tests.bench_calculator_journal
+  python -m tests.bench_calculator_journal --number 200000 --sync_every 1024
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+from calculator import Calculator
+from calculator_journal import CalculatorJournal, JournaledCalculator
+
+# (method, operand) pairs that keep the total bounded when cycled
+CYCLE = [("add", 7), ("multiply", 3), ("divide", 3), ("subtract", 7)]
+
+
+def bench(calc, number):
+    ops = [(getattr(calc, name), value) for name, value in CYCLE]
+    start = time.perf_counter()
+    for _ in range(number // len(ops)):
+        for op, value in ops:
+            op(value)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--number', type=int, default=100000)
+    parser.add_argument('--snapshot_every', type=int, default=1024)
+    parser.add_argument('--sync_every', type=int, default=4096)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.tcj")
+        plain = bench(Calculator(max_value=10 ** 9), args.number)
+        journal = CalculatorJournal(path, snapshot_every=args.snapshot_every, sync_every=args.sync_every)
+        journaled = bench(JournaledCalculator(journal, max_value=10 ** 9), args.number)
+        records = len(journal)
+        journal.close()
+
+        start = time.perf_counter()
+        journal = CalculatorJournal(path, snapshot_every=args.snapshot_every)
+        JournaledCalculator(journal, max_value=10 ** 9)
+        restore = time.perf_counter() - start
+        journal.close()
+        size = os.path.getsize(path)
+
+    print(f"plain Calculator:    {args.number / plain:>12,.0f} ops/sec")
+    print(f"JournaledCalculator: {args.number / journaled:>12,.0f} ops/sec")
+    print(f"overhead per op:     {(journaled - plain) / args.number * 1e9:>12,.0f} ns")
+    print(f"records: {records}  file: {size:,} bytes  restore: {restore * 1e3:.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
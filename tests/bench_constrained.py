@@ -0,0 +1,76 @@
+"""Constrained tool_calls decoding versus free-form generation.
+
+For the same template utterances, reports per request: latency, model
+forward steps (free-form: generated tokens; constrained: choice points) and
+how many outputs parse into valid tool calls. Needs torch, transformers and
+the cached model. This file is not collected by pytest. Run it from the
+repository root:
+
+  python -m tests.bench_constrained
+  python -m tests.bench_constrained --number 50
+"""
+
+import argparse
+import json
+import time
+
+from app.calculator_interface import validate_call
+from app.dispatcher import _calls_from_payload
+from tests.bench_batching import utterances
+
+
+def valid(text, extract):
+    try:
+        calls = _calls_from_payload(json.loads(extract(text)))
+        for call in calls:
+            validate_call(call["name"], call.get("arguments", {}))
+    except (ValueError, TypeError, KeyError):
+        return False
+    return bool(calls)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--number', type=int, default=20)
+    args = parser.parse_args()
+
+    from inference import run_agent
+    from inference.prompt_builder import build_prompt
+
+    try:
+        run_agent.ensure_loaded()
+    except Exception as e:
+        raise SystemExit(f"Model not available, exiting: {e}")
+    tokenizer, model = run_agent.ensure_loaded()
+    texts = utterances(args.number)
+    run_agent.generate(texts[0])  # warm up: prefix cache and token tables
+    run_agent.generate_text(texts[0])
+
+    free_time = free_steps = free_ok = 0
+    for text in texts:
+        start = time.perf_counter()
+        out = run_agent.generate_text(text)
+        free_time += time.perf_counter() - start
+        free_steps += len(tokenizer(out)["input_ids"]) - len(tokenizer(build_prompt(text))["input_ids"])
+        free_ok += valid(out, run_agent._extract_json)
+
+    decoder = run_agent.constrained_decoder()
+    cons_time = cons_steps = cons_ok = 0
+    for text in texts:
+        start = time.perf_counter()
+        ids = tokenizer(build_prompt(text))["input_ids"]
+        past, cached = run_agent.prefix_cache().past_for(ids)
+        out, grammar = decoder.decode(decoder.model_step(model, past, cached), ids[cached:])
+        cons_time += time.perf_counter() - start
+        cons_steps += grammar.steps
+        cons_ok += valid(out, lambda s: s)
+
+    n = len(texts)
+    print(f"free-form:   {free_time / n * 1e3:8.1f} ms/request  {free_steps / n:6.1f} steps  "
+          f"valid {free_ok}/{n}")
+    print(f"constrained: {cons_time / n * 1e3:8.1f} ms/request  {cons_steps / n:6.1f} steps  "
+          f"valid {cons_ok}/{n}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""Hit rate and latency of the rule-based fast path.
+
+Builds utterances from data/templates.py with numbers written as digits and
+as words (data.number_words.to_words), mixes in ``--other`` percent of
+utterances the rules should not take, and reports hit rate per route,
+accuracy of the numbers extracted and microseconds per utterance. With
+``--model`` the fallbacks also run through the model (needs torch and the
+cached model) so both paths' latencies can be compared. This file is not
+collected by pytest. Run it from the repository root:
+
+  python -m tests.bench_fast_path
+  python -m tests.bench_fast_path --number 200 --model
+"""
+
+import argparse
+import json
+import random
+import time
+
+from data.number_words import to_words
+from data.templates import ADD_TEMPLATES, CLEAR_TEMPLATES, TOTAL_TEMPLATES
+from inference.fast_path import FastPath
+
+OTHER = ["Subtract {a} from {b}", "Multiply {a} by {b}", "What is {a} percent of the total?",
+         "Divide the total by {a}", "Undo that"]
+
+
+def utterances(number, other, seed=0):
+    rng = random.Random(seed)
+    out = []
+    for _ in range(number):
+        values = [rng.randint(1, 100) for _ in range(3)]
+        spell = to_words if rng.random() < 0.5 else str
+        kwargs = dict(zip("abc", map(spell, values)))
+        pick = rng.random() * 100
+        if pick < other:
+            out.append((rng.choice(OTHER).format(**kwargs), None))
+        elif pick < other + (100 - other) * 0.7:
+            template = rng.choice(ADD_TEMPLATES)
+            expected = values[:3 if "{c}" in template else 2]
+            out.append((template.format(**kwargs), expected))
+        elif pick < other + (100 - other) * 0.85:
+            out.append((rng.choice(TOTAL_TEMPLATES), "get_total"))
+        else:
+            out.append((rng.choice(CLEAR_TEMPLATES), "clear_all"))
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--number', type=int, default=20000)
+    parser.add_argument('--other', type=float, default=10.0, help='percent of non-template utterances')
+    parser.add_argument('--threshold', type=float, default=0.9)
+    parser.add_argument('--model', action='store_true', help='send fallbacks to the model')
+    args = parser.parse_args()
+
+    fallback = lambda text: '{"tool_calls":[]}'
+    if args.model:
+        from inference import run_agent
+        try:
+            run_agent.ensure_loaded()
+        except Exception as e:
+            raise SystemExit(f"Model not available, exiting: {e}")
+        fallback = run_agent.generate_model
+
+    items = utterances(args.number, args.other)
+    fast = FastPath(args.threshold)
+    wrong = 0
+    start = time.perf_counter()
+    for text, expected in items:
+        calls = json.loads(fast.answer(text, fallback))["tool_calls"]
+        if isinstance(expected, list) and calls:
+            wrong += [c["arguments"]["number"] for c in calls] != expected
+        elif expected is None and calls and not args.model:
+            wrong += 1  # rules took an utterance meant for the model
+    elapsed = time.perf_counter() - start
+
+    stats = fast.stats()
+    print(f"utterances: {stats['requests']}  hit rate: {stats['hit_rate']:.1%}  "
+          f"wrong: {wrong}  {elapsed / len(items) * 1e6:.1f} us/utterance overall")
+    for route, hits in sorted(stats["hits"].items()):
+        print(f"  {route:<10} {hits:>8} hits")
+    print(f"  fallback   {stats['fallbacks']:>8}")
+    print(f"fast path mean: {stats['fast_mean_ms'] * 1e3:.1f} us   "
+          f"model mean: {stats['model_mean_ms']:.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
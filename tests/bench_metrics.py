@@ -0,0 +1,62 @@
+"""Cost of the per-stage instrumentation in app.metrics.
+
+Times the same dispatch() loop with metrics off and on, and the bare
+stage() context manager, so the overhead per utterance can be read off
+directly. This file is not collected by pytest. Run it from the repository
+root:
+
+  python -m tests.bench_metrics
+  python -m tests.bench_metrics --number 200000 --prom metrics.prom
+"""
+
+import argparse
+import json
+import time
+
+from app import metrics
+from app.calculator_interface import sessions
+from app.dispatcher import dispatch
+
+
+def per_call_ns(fn, number):
+    start = time.perf_counter()
+    for _ in range(number):
+        fn()
+    return (time.perf_counter() - start) / number * 1e9
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--number', type=int, default=50000)
+    parser.add_argument('--prom', default=None, help='also write the Prometheus text file here')
+    args = parser.parse_args()
+
+    response = json.dumps({"tool_calls": [{"name": "add", "arguments": {"number": 7}},
+                                          {"name": "subtract", "arguments": {"number": 7}},
+                                          {"name": "get_total", "arguments": {}}]})
+
+    def empty_stage():
+        with metrics.stage("bench"):
+            pass
+
+    def utterance():
+        dispatch(response, "bench-metrics")
+
+    results = {}
+    for state in ("off", "on"):
+        metrics.enable() if state == "on" else metrics.disable()
+        metrics.reset()
+        results[state] = (per_call_ns(empty_stage, args.number), per_call_ns(utterance, args.number))
+    sessions.drop("bench-metrics")
+
+    for state, (stage_ns, dispatch_ns) in results.items():
+        print(f"metrics {state:3s}: stage() {stage_ns:7.0f} ns   dispatch {dispatch_ns / 1e3:7.2f} us")
+    off, on = results["off"][1], results["on"][1]
+    print(f"overhead per dispatched utterance: {(on - off) / 1e3:.2f} us ({(on - off) / off:.1%})")
+    print(json.dumps(metrics.snapshot()["stages"], indent=1))
+    if args.prom:
+        metrics.export_prometheus(args.prom)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,48 @@
+"""Conversions/sec of data.number_words versus num2words.
+
+Converts the same numbers with num2words, to_words and back with to_number
+for a few ranges: the 1..100 the generator uses today, 0..999, integers up
+to a billion and two-decimal amounts (PLAN.md Phase 3). This file is not
+collected by pytest. Run it from the repository root:
+
+  python -m tests.bench_number_words
+  python -m tests.bench_number_words --number 200000
+"""
+
+import argparse
+import random
+import time
+
+from num2words import num2words
+
+from data.number_words import to_number, to_words
+
+
+def rate(fn, values):
+    start = time.perf_counter()
+    for value in values:
+        fn(value)
+    return len(values) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--number', type=int, default=50000)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    ranges = {
+        "1..100": [rng.randint(1, 100) for _ in range(args.number)],
+        "0..999": [rng.randint(0, 999) for _ in range(args.number)],
+        "< 1e9": [rng.randrange(10 ** 9) for _ in range(args.number)],
+        "2 decimals": [round(rng.uniform(0, 10 ** 6), 2) for _ in range(args.number)],
+    }
+    print(f"{'range':12s} {'num2words/s':>12s} {'to_words/s':>12s} {'speedup':>8s} {'to_number/s':>12s}")
+    for name, values in ranges.items():
+        slow, fast = rate(num2words, values), rate(to_words, values)
+        back = rate(to_number, [to_words(v) for v in values])
+        print(f"{name:12s} {slow:12,.0f} {fast:12,.0f} {fast / slow:7.1f}x {back:12,.0f}")
+
+
+if __name__ == '__main__':
+    main()
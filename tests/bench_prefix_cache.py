@@ -0,0 +1,73 @@
+"""Time to first token with and without the SYSTEM_PROMPT prefix cache.
+
+TTFT is measured as a one-token greedy generate: full prompt prefill versus
+suffix-only prefill on a copy of the cached prefix. Also checks that full
+generations are identical both ways. Needs torch, transformers and the
+cached model. This file is not collected by pytest. Run it from the
+repository root:
+
+  python -m tests.bench_prefix_cache
+  python -m tests.bench_prefix_cache --number 50 --check 5
+"""
+
+import argparse
+import statistics
+import time
+
+from tests.bench_batching import utterances
+
+
+def ttft(fn, texts):
+    times = []
+    for text in texts:
+        start = time.perf_counter()
+        fn(text)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times) * 1e3, statistics.mean(times) * 1e3
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--number', type=int, default=20)
+    parser.add_argument('--check', type=int, default=3, help='full generations to compare')
+    args = parser.parse_args()
+
+    import torch
+    from inference import run_agent
+    from inference.prompt_builder import build_prompt
+
+    try:
+        run_agent.ensure_loaded()
+    except Exception as e:
+        raise SystemExit(f"Model not available, exiting: {e}")
+    tokenizer, model = run_agent.ensure_loaded()
+    start = time.perf_counter()
+    cache = run_agent.prefix_cache()
+    build = time.perf_counter() - start
+    texts = utterances(args.number)
+
+    def uncached(text):
+        inputs = tokenizer(build_prompt(text), return_tensors="pt").to(model.device)
+        with torch.no_grad():
+            model.generate(**inputs, max_new_tokens=1, do_sample=False)
+
+    def cached(text):
+        cache.generate(build_prompt(text), max_new_tokens=1)
+
+    uncached(texts[0])  # warm up
+    cached(texts[0])
+    before = ttft(uncached, texts)
+    after = ttft(cached, texts)
+
+    same = sum(run_agent.generate_uncached(t) == run_agent.generate_text(t) for t in texts[:args.check])
+    prompt_tokens = len(tokenizer(build_prompt(texts[0]))["input_ids"])
+    print(f"prefix: {cache.stats()['prefix_tokens']} of ~{prompt_tokens} prompt tokens, "
+          f"prefilled once in {build * 1e3:.1f} ms")
+    print(f"TTFT without cache: median {before[0]:7.1f} ms  mean {before[1]:7.1f} ms")
+    print(f"TTFT with cache:    median {after[0]:7.1f} ms  mean {after[1]:7.1f} ms  "
+          f"(x{before[0] / after[0]:.2f})")
+    print(f"identical generations: {same}/{min(args.check, len(texts))}  {cache.stats()}")
+
+
+if __name__ == '__main__':
+    main()
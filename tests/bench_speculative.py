@@ -0,0 +1,69 @@
+"""Speculative versus plain constrained decoding.
+
+For template utterances plus operations the fast path does not take,
+decodes every utterance both ways and reports forward passes, draft
+acceptance rate, decode time and whether the outputs are identical. Needs
+torch, transformers and the cached model. This file is not collected by
+pytest. Run it from the repository root:
+
+  python -m tests.bench_speculative
+  python -m tests.bench_speculative --number 50
+"""
+
+import argparse
+import time
+
+from inference.speculative import decode_speculative, draft_tool_calls
+from tests.bench_batching import utterances
+from tests.bench_fast_path import OTHER
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--number', type=int, default=20)
+    args = parser.parse_args()
+
+    from inference import run_agent
+    from inference.prompt_builder import build_prompt
+
+    try:
+        tokenizer, model = run_agent.ensure_loaded()
+    except Exception as e:
+        raise SystemExit(f"Model not available, exiting: {e}")
+    texts = utterances(args.number // 2) + [
+        t.format(a=i + 2, b=3 * i + 5) for i, t in enumerate(OTHER * args.number)][:args.number - args.number // 2]
+    decoder = run_agent.constrained_decoder()
+    run_agent.generate_model(texts[0])  # warm up
+
+    plain_time = spec_time = plain_steps = 0
+    totals = {"forwards": 0, "drafted": 0, "accepted": 0}
+    same = 0
+    for text in texts:
+        ids = tokenizer(build_prompt(text))["input_ids"]
+
+        past, cached = run_agent.prefix_cache().past_for(ids)
+        start = time.perf_counter()
+        expected, grammar = decoder.decode(decoder.model_step(model, past, cached), ids[cached:])
+        plain_time += time.perf_counter() - start
+        plain_steps += grammar.steps
+
+        past, cached = run_agent.prefix_cache().past_for(ids)
+        start = time.perf_counter()
+        out, _, stats = decode_speculative(decoder, decoder.model_step(model, past, cached),
+                                           ids[cached:], draft_tool_calls(text))
+        spec_time += time.perf_counter() - start
+        for key in totals:
+            totals[key] += stats[key]
+        same += out == expected
+
+    n = len(texts)
+    rate = totals["accepted"] / totals["drafted"] if totals["drafted"] else 0.0
+    print(f"plain:       {plain_time / n * 1e3:8.1f} ms/request  {plain_steps / n:5.1f} forward passes")
+    print(f"speculative: {spec_time / n * 1e3:8.1f} ms/request  {totals['forwards'] / n:5.1f} forward passes  "
+          f"(x{plain_time / spec_time:.2f})")
+    print(f"draft acceptance: {rate:.1%} ({totals['accepted']}/{totals['drafted']} choices)  "
+          f"identical outputs: {same}/{n}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+"""Cold start to first model answer, broken down by stage.
+
+Each configuration runs in a fresh interpreter and reports:
+
+  import      importing inference.run_agent (should not touch torch)
+  torch       importing torch and transformers
+  load        weights: hub checkpoint + quantization, or a local snapshot
+  warm_up     prefix-cache prefill, decoder tables and one model answer
+  first       the next model answer (steady state)
+
+Needs torch, transformers and the cached model. This file is not collected
+by pytest. Run it from the repository root:
+
+  python -m tests.bench_startup --backend dynamic_int8
+  python -m tests.bench_startup --backend dynamic_int8 --snapshot snapshots/int8
+
+With ``--snapshot`` the snapshot is created first if it does not exist, and
+both the checkpoint and the snapshot start are reported.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+STAGES = ("import", "torch", "load", "warm_up", "first")
+
+
+def measure(backend, snapshot):
+    times = {}
+    start = time.perf_counter()
+    from inference import run_agent
+    times["import"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    import torch  # noqa: F401
+    import transformers  # noqa: F401
+    times["torch"] = time.perf_counter() - start
+
+    run_agent.ensure_loaded(backend, snapshot)
+    times["load"] = run_agent.startup["load"]
+    run_agent.warm_up()
+    times["warm_up"] = run_agent.startup["warm_up"]
+
+    start = time.perf_counter()
+    run_agent.generate_model("Add 12 and 30")
+    times["first"] = time.perf_counter() - start
+    return times
+
+
+def run_child(backend, snapshot):
+    command = [sys.executable, "-m", "tests.bench_startup", "--one", "--backend", backend]
+    if snapshot:
+        command += ["--snapshot", snapshot]
+    start = time.perf_counter()
+    child = subprocess.run(command, capture_output=True, text=True, cwd=os.getcwd())
+    wall = time.perf_counter() - start
+    if child.returncode != 0:
+        raise SystemExit(child.stderr.strip().splitlines()[-1] if child.stderr else "failed")
+    times = json.loads(child.stdout.strip().splitlines()[-1])
+    times["process"] = wall
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--backend', default='dynamic_int8')
+    parser.add_argument('--snapshot', default=None)
+    parser.add_argument('--one', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.one:
+        print(json.dumps(measure(args.backend, args.snapshot)))
+        return
+
+    runs = [("checkpoint", run_child(args.backend, None))]
+    if args.snapshot:
+        if not os.path.isdir(args.snapshot):
+            subprocess.run([sys.executable, "-m", "inference.load_model", "--backend", args.backend,
+                            "--save_snapshot", args.snapshot], check=True)
+        runs.append(("snapshot", run_child(args.backend, args.snapshot)))
+
+    print(f"{'start':<12}" + "".join(f"{s:>10}" for s in STAGES + ("process",)))
+    for name, times in runs:
+        print(f"{name:<12}" + "".join(f"{times[s]:>10.2f}" for s in STAGES + ("process",)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+import threading
+import time
+
+import pytest
+
+from inference.batching import MicroBatcher
+
+
+def test_collects_concurrent_items_into_one_batch():
+    calls = []
+    batcher = MicroBatcher(lambda items: calls.append(list(items)) or [i * 2 for i in items],
+                           max_batch_size=4, max_wait_ms=200)
+    futures = [batcher.submit(i) for i in range(4)]
+    assert [f.result(timeout=5) for f in futures] == [0, 2, 4, 6]
+    batcher.close()
+    assert calls == [[0, 1, 2, 3]]
+    assert batcher.stats()["largest_batch"] == 4
+
+
+def test_window_closes_after_max_wait():
+    batcher = MicroBatcher(lambda items: items, max_batch_size=64, max_wait_ms=5)
+    start = time.perf_counter()
+    assert batcher("solo") == "solo"
+    assert time.perf_counter() - start < 2
+    batcher.close()
+
+
+def test_fans_results_back_to_threads():
+    batcher = MicroBatcher(lambda items: [s.upper() for s in items], max_batch_size=8, max_wait_ms=20)
+    results = {}
+
+    def worker(text):
+        results[text] = batcher(text)
+
+    threads = [threading.Thread(target=worker, args=(f"u{i}",)) for i in range(20)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    batcher.close()
+    assert results == {f"u{i}": f"U{i}" for i in range(20)}
+    assert batcher.stats()["items"] == 20
+
+
+def test_batch_failure_reaches_every_caller():
+    def boom(items):
+        raise RuntimeError("model failed")
+
+    batcher = MicroBatcher(boom, max_batch_size=2, max_wait_ms=100)
+    futures = [batcher.submit(1), batcher.submit(2)]
+    for f in futures:
+        with pytest.raises(RuntimeError):
+            f.result(timeout=5)
+    batcher.close()
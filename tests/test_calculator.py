@@ -0,0 +1,108 @@
+from decimal import Decimal, localcontext
+import pytest
+from calculator import Calculator
+
+
+def test_round_half_even():
+    calc = Calculator(precision=2)
+    calc.add("0.125")
+    assert calc.get_total() == Decimal("0.12")
+    calc.add("0.010")
+    calc.add("0.005")
+    assert calc.get_total() == Decimal("0.14")
+
+
+def test_int_fast_path_matches_quantized_result():
+    calc = Calculator(precision=2)
+    res = calc.add(7)
+    assert str(res) == "7.00"
+    res = calc.subtract(7)
+    assert str(res) == "0.00"
+
+
+def test_max_value_is_magnitude_limit():
+    calc = Calculator(precision=2, max_value=100)
+    calc.add(60)
+    with pytest.raises(ValueError):
+        calc.add(50)
+    assert calc.get_total() == Decimal("60.00")
+    with pytest.raises(ValueError):
+        calc.subtract(200)
+    assert calc.get_total() == Decimal("60.00")
+
+
+def test_clear_is_one_shot_undo():
+    calc = Calculator()
+    calc.add(5)
+    calc.multiply(3)
+    assert calc.clear() == Decimal("5.00")
+    assert calc.clear() == Decimal("5.00")
+    calc.clear_all()
+    assert calc.get_total() == Decimal("0.00")
+    assert calc.clear() == Decimal("0.00")
+
+
+def test_percent_operations():
+    calc = Calculator()
+    calc.add(200)
+    assert calc.percent_add(10) == Decimal("220.00")
+    assert calc.percent_substract(50) == Decimal("110.00")
+    assert calc.percent(25) == Decimal("27.50")
+
+
+def test_ignores_caller_decimal_context():
+    calc = Calculator(precision=2)
+    calc.add(10)
+    with localcontext() as ctx:
+        ctx.prec = 3
+        assert calc.divide(3) == Decimal("3.33")
+        assert calc.multiply("123.45") == Decimal("411.09")
+
+
+def test_rejects_unsupported_types():
+    calc = Calculator()
+    with pytest.raises(TypeError):
+        calc.add(None)
+    with pytest.raises(ValueError):
+        calc.add("0x10")
+
+
+def test_run_commits_once_and_undoes_whole_program():
+    calc = Calculator()
+    calc.add(2)
+    assert calc.run([("add", 7), ("multiply", 3), ("get_total",)]) == Decimal("27.00")
+    assert calc.clear() == Decimal("2.00")
+
+
+def test_run_is_atomic_on_overflow():
+    calc = Calculator(max_value=100)
+    calc.add(10)
+    calc.add(5)
+    with pytest.raises(ValueError):
+        calc.run([("add", 50), ("multiply", 3), ("subtract", 100)])
+    assert calc.get_total() == Decimal("15.00")
+    assert calc.clear() == Decimal("10.00")
+
+
+def test_run_validates_before_evaluating():
+    calc = Calculator()
+    with pytest.raises(ValueError):
+        calc.run([("add", 1), ("divide", 0)])
+    with pytest.raises(ValueError):
+        calc.run([("add", 1), ("sqrt", 4)])
+    with pytest.raises(TypeError):
+        calc.run([("add", 1), ("add", None)])
+    assert calc.get_total() == Decimal("0.00")
+
+
+def test_run_clear_all_leaves_no_undo():
+    calc = Calculator()
+    calc.add(4)
+    assert calc.run([("add", 1), ("clear_all",)]) == Decimal("0.00")
+    assert calc.clear() == Decimal("0.00")
+
+
+def test_subtract_zero_from_negative_zero():
+    calc = Calculator()
+    assert str(calc.multiply(-3)) == "-0.00"
+    assert str(calc.subtract(0)) == "0.00"
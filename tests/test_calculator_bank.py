@@ -0,0 +1,101 @@
+import random
+from decimal import Decimal, InvalidOperation
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from calculator import Calculator
+from calculator_bank import CalculatorBank
+
+OPS = ["add", "subtract", "multiply", "divide", "percent", "percent_add",
+       "percent_substract", "clear", "clear_all"]
+
+
+def _operand(rng):
+    x = rng.uniform(-300, 300)
+    return rng.choice([
+        int(x),
+        round(x, rng.randrange(4)),
+        str(round(x, rng.randrange(6))),
+        Decimal(str(round(x, 3))),
+        rng.choice([3, 7, "0.333", "1.5", "-2"]),
+    ])
+
+
+def _replay(calcs, batch):
+    overflow = []
+    for row in batch:
+        session_id, name = row[0], row[1]
+        try:
+            getattr(calcs[session_id], name)(*row[2:])
+            overflow.append(False)
+        except (ValueError, InvalidOperation):
+            # the bank reports results too large for the precision as overflow
+            overflow.append(True)
+    return overflow
+
+
+@pytest.mark.parametrize("precision,max_value", [
+    (0, 1000), (2, 1000), (2, 10 ** 6), (4, "12345.678"), (20, 10 ** 10),
+])
+def test_bank_matches_scalar_calculator(precision, max_value):
+    rng = random.Random(precision)
+    n = 16
+    bank = CalculatorBank(n, precision=precision, max_value=max_value)
+    calcs = [Calculator(precision=precision, max_value=max_value) for _ in range(n)]
+    for _ in range(30):
+        batch = []
+        for _ in range(rng.randint(1, 60)):
+            name = rng.choice(OPS)
+            session_id = rng.randrange(n)
+            if name in ("clear", "clear_all"):
+                batch.append((session_id, name))
+            else:
+                value = _operand(rng)
+                if name == "divide" and Decimal(str(value)) == 0:
+                    value = 7
+                batch.append((session_id, name, value))
+        expected_overflow = _replay(calcs, batch)
+        if rng.random() < 0.5:
+            overflow = bank.apply(batch)
+        else:
+            overflow = bank.apply_columns(
+                [row[0] for row in batch],
+                [row[1] for row in batch],
+                [row[2] if len(row) == 3 else None for row in batch],
+            )
+        assert list(overflow) == expected_overflow
+        for session_id, calc in enumerate(calcs):
+            assert str(bank.get_total(session_id)) == str(calc.get_total())
+    assert [str(t) for t in bank.totals()] == [str(c.get_total()) for c in calcs]
+
+
+def test_bank_divide_near_tie_matches_decimal():
+    bank = CalculatorBank(1, precision=2, max_value=10 ** 6)
+    calc = Calculator(precision=2, max_value=10 ** 6)
+    bank.apply([(0, "add", "0.03"), (0, "divide", "2.000000000000000000000000001")])
+    calc.add("0.03")
+    calc.divide("2.000000000000000000000000001")
+    assert bank.get_total(0) == calc.get_total()
+
+
+def test_bank_rejects_invalid_batch_without_applying():
+    bank = CalculatorBank(2)
+    with pytest.raises(ValueError):
+        bank.apply([(0, "add", 5), (1, "divide", 0)])
+    with pytest.raises(ValueError):
+        bank.apply([(0, "add", 5), (2, "add", 1)])
+    with pytest.raises(ValueError):
+        bank.apply([(0, "add", 5), (1, "sqrt", 4)])
+    assert bank.totals() == [Decimal("0.00"), Decimal("0.00")]
+
+
+def test_apply_columns_int_array():
+    bank = CalculatorBank(3, precision=2, max_value=100)
+    overflow = bank.apply_columns(
+        np.array([0, 1, 2, 0, 1]),
+        np.array(["add", "add", "subtract", "multiply", "clear"]),
+        np.array([7, 9, 4, 20, 0]),
+    )
+    assert list(overflow) == [False, False, False, True, False]
+    assert bank.totals() == [Decimal("7.00"), Decimal("0.00"), Decimal("-4.00")]
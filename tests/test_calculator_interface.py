@@ -1,6 +1,6 @@
 from decimal import Decimal
 import pytest
-from app.calculator_interface import call_tool
+from app.calculator_interface import call_tool, call_tools, validate_call
 
 
 def setup_function():
@@ -29,3 +29,40 @@ def test_unknown_tool_raises():
     call_tool("clear_all", {})
     with pytest.raises(ValueError):
         call_tool("unknown", {})
+
+
+def test_registry_covers_calculator_tools():
+    call_tool("add", {"number": 10})
+    call_tool("subtract", {"number": 4})
+    call_tool("multiply", {"number": 3})
+    call_tool("divide", {"number": 2})
+    call_tool("percent_add", {"number": 50})
+    call_tool("percent_substract", {"number": 50})
+    call_tool("percent", {"number": 200})
+    assert float(call_tool("get_total", {})) == 13.5
+    call_tool("clear", {})
+    assert float(call_tool("get_total", {})) == 6.75
+
+
+def test_invalid_number_argument_raises():
+    with pytest.raises(ValueError):
+        call_tool("add", {})
+    with pytest.raises(ValueError):
+        call_tool("add", {"number": [1, 2]})
+    with pytest.raises(ValueError):
+        call_tool("add", {"number": True})
+
+
+@pytest.mark.parametrize("number", ["nan", "Infinity", "-inf", float("nan"), float("inf"), "abc"])
+def test_non_finite_numbers_are_rejected(number):
+    with pytest.raises(ValueError, match="Invalid 'number'"):
+        validate_call("add", {"number": number})
+
+
+def test_out_of_range_numbers_raise_value_error():
+    before = call_tool("get_total", {})
+    with pytest.raises(ValueError, match="out of range"):
+        call_tool("add", {"number": "1e999999"})
+    with pytest.raises(ValueError, match="out of range"):
+        call_tools([{"name": "add", "arguments": {"number": "1e999999"}}])
+    assert call_tool("get_total", {}) == before
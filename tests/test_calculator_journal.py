@@ -0,0 +1,107 @@
+import random
+from decimal import Decimal
+import pytest
+from calculator_journal import SNAPSHOT, CalculatorJournal, JournaledCalculator
+
+
+def _open(path, **kwargs):
+    return JournaledCalculator(CalculatorJournal(path, **kwargs))
+
+
+def test_restore_after_reopen(tmp_path):
+    path = tmp_path / "session.tcj"
+    calc = _open(path)
+    calc.add(7)
+    calc.multiply("1.5")
+    calc.journal.close()
+
+    restored = _open(path)
+    assert restored.get_total() == Decimal("10.50")
+    # one-shot undo survives the restart
+    assert restored.clear() == Decimal("7.00")
+
+
+def test_recovers_records_without_close(tmp_path):
+    path = tmp_path / "session.tcj"
+    calc = _open(path, sync_every=10 ** 6)
+    calc.add(3)
+    calc.add(4)
+    # no close()/sync(): a second mapping of the file still sees the records
+    restored = _open(path)
+    assert restored.get_total() == Decimal("7.00")
+
+
+def test_multi_level_undo(tmp_path):
+    calc = _open(tmp_path / "session.tcj")
+    for n in (1, 2, 3, 4):
+        calc.add(n)
+    assert calc.undo() == Decimal("6.00")
+    assert calc.undo(2) == Decimal("1.00")
+    assert calc.clear() == Decimal("1.00")  # undo leaves no one-shot undo
+    calc.journal.close()
+    restored = _open(tmp_path / "session.tcj")
+    assert restored.get_total() == Decimal("1.00")
+    assert restored.undo() == Decimal("0.00")
+
+
+def test_restart_after_undo_keeps_the_undo_history(tmp_path):
+    path = tmp_path / "session.tcj"
+    calc = JournaledCalculator(CalculatorJournal(path, snapshot_every=2), undo_depth=3)
+    for n in (1, 2, 3, 4):
+        calc.add(n)
+    calc.undo(2)
+    calc.add(5)
+    calc.journal.close()
+    restored = JournaledCalculator(CalculatorJournal(path, snapshot_every=2), undo_depth=3)
+    assert list(restored._history) == list(calc._history) == [Decimal("1.00"), Decimal("3.00")]
+
+    rng = random.Random(0)
+    for session in range(100):
+        path = tmp_path / f"fuzz-{session}.tcj"
+        calc = JournaledCalculator(CalculatorJournal(path, snapshot_every=3), undo_depth=4)
+        for _ in range(rng.randint(1, 30)):
+            pick = rng.random()
+            if pick < 0.6:
+                calc.add(rng.randint(1, 9))
+            elif pick < 0.85:
+                calc.undo(rng.randint(1, 3))
+            else:
+                calc.clear_all()
+        calc.journal.close()
+        restored = JournaledCalculator(CalculatorJournal(path, snapshot_every=3), undo_depth=4)
+        assert list(restored._history) == list(calc._history), session
+        restored.journal.close()
+
+
+def test_snapshots_bound_the_replayed_tail(tmp_path):
+    path = tmp_path / "session.tcj"
+    calc = _open(path, snapshot_every=8)
+    for _ in range(50):
+        calc.add(1)
+    kinds = [rec.kind for rec in calc.journal.records()]
+    assert kinds.count(SNAPSHOT) == 1 + 50 // 8
+    calc.journal.close()
+    journal = CalculatorJournal(path, snapshot_every=8)
+    assert journal._replay_start(undo_depth=0) >= len(journal) - 9
+    assert JournaledCalculator(journal).get_total() == Decimal("50.00")
+
+
+def test_overflow_and_run_are_journaled(tmp_path):
+    path = tmp_path / "session.tcj"
+    calc = _open(path)
+    calc.add(5)
+    calc.add(10)
+    with pytest.raises(ValueError):
+        calc.add(5000)
+    calc.run([("add", 1), ("multiply", 2)])
+    calc.journal.close()
+    restored = _open(path)
+    assert restored.get_total() == Decimal("32.00")
+    assert restored.clear() == Decimal("15.00")
+
+
+def test_precision_mismatch_is_rejected(tmp_path):
+    path = tmp_path / "session.tcj"
+    CalculatorJournal(path, precision=2).close()
+    with pytest.raises(ValueError):
+        CalculatorJournal(path, precision=3)
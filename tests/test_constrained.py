@@ -0,0 +1,93 @@
+import json
+
+import pytest
+
+from inference.constrained import ConstrainedDecoder, ToolCallGrammar
+
+
+class CharTokenizer:
+    """Single-character vocabulary plus a few multi-character pieces."""
+
+    def __init__(self):
+        chars = list('{}[]",:._-0123456789abcdefghijklmnopqrstuvwxyz')
+        extra = ["add", "get", "clear", "_all", "percent", "12", "3.5", "▁x", "<eos>"]
+        self.vocab = {piece: i for i, piece in enumerate(chars + extra)}
+        self.all_special_tokens = ["<eos>"]
+
+    def get_vocab(self):
+        return self.vocab
+
+    def __call__(self, text, add_special_tokens=True):
+        return {"input_ids": [self.vocab[c] for c in text]}
+
+
+def scripted(tokenizer, pieces):
+    """A step function whose top-scoring token follows ``pieces``."""
+    order = iter(pieces)
+    fed = []
+
+    def step(ids):
+        fed.append(list(ids))
+        scores = [0.0] * len(tokenizer.vocab)
+        scores[tokenizer.vocab[next(order)]] = 1.0
+        return scores
+
+    return step, fed
+
+
+def test_decodes_calls_with_forced_structure():
+    tok = CharTokenizer()
+    decoder = ConstrainedDecoder(tok)
+    step, fed = scripted(tok, ["a", "12", "}", ",", "get", "]"])
+    text, grammar = decoder.decode(step, [0, 1])
+    assert json.loads(text) == {"tool_calls": [
+        {"name": "add", "arguments": {"number": 12}},
+        {"name": "get_total", "arguments": {}},
+    ]}
+    # six model steps; everything else was forced
+    assert grammar.steps == 6 and len(fed) == 6
+    assert fed[0][:2] == [0, 1]
+
+
+def test_invalid_tokens_never_win():
+    tok = CharTokenizer()
+    decoder = ConstrainedDecoder(tok)
+    # the model prefers 'z' and '<eos>' everywhere; the grammar ignores them
+    order = iter(["percent", "_", "a", "3.5", "}", "]"])
+
+    def step(ids):
+        scores = [0.0] * len(tok.vocab)
+        scores[tok.vocab["z"]] = scores[tok.vocab["<eos>"]] = 9.0
+        scores[tok.vocab[next(order)]] = 1.0
+        return scores
+
+    text, _ = decoder.decode(step, [0])
+    assert text == '{"tool_calls":[{"name":"percent_add","arguments":{"number":3.5}}]}'
+
+
+def test_numbers_must_be_json_numbers():
+    grammar = ToolCallGrammar()
+    grammar.advance(grammar.forced())
+    grammar.advance("add")
+    grammar.advance(grammar.forced())
+    assert not grammar.accepts("}")  # empty number
+    assert not grammar.accepts(".")
+    grammar.advance("0")
+    assert not grammar.accepts("7")  # no leading zeros
+    assert grammar.accepts(".")
+    grammar.advance(".")
+    assert not grammar.accepts("}")
+    grammar.advance("5")
+    assert grammar.accepts("}")
+    with pytest.raises(ValueError):
+        grammar.advance("x")
+
+
+def test_max_calls_closes_object():
+    grammar = ToolCallGrammar(max_calls=1)
+    grammar.advance(grammar.forced())
+    grammar.advance("clear")
+    grammar.advance('"')
+    grammar.advance(grammar.forced())
+    assert grammar.done
+    assert json.loads(grammar.text) == {"tool_calls": [{"name": "clear", "arguments": {}}]}
@@ -0,0 +1,60 @@
+import json
+
+from data.dataset_store import DatasetStore, expected_total, operation_of, read_jsonl
+
+
+def _add(user, *numbers, template=None):
+    return {"user": user, "template": template,
+            "tool_calls": [{"name": "add", "arguments": {"number": n}} for n in numbers]}
+
+
+def test_ingest_skips_duplicates_and_computes_add_results(tmp_path):
+    store = DatasetStore(tmp_path / "d.sqlite", batch_size=2)
+    examples = [_add("What is 7 and 9?", 7, 9, template="What is {a} and {b}?"),
+                _add("What is 7 and 9?", 7, 9, template="What is {a} and {b}?"),
+                _add("Add 1.5 and 2", 1.5, 2),
+                _add("Add 999 and 999", 999, 999),
+                _add("Add 1,234.56 and 7.89", 1234.56, 7.89),
+                {"user": "Reset calculator", "tool_calls": [{"name": "clear_all", "arguments": {}}]}]
+    assert store.ingest(examples, split="train") == 5
+    assert store.ingest(examples, split="train") == 0
+
+    rows = list(store.iter_examples())
+    assert [row["add_results"] for row in rows] == ["16.00", "3.50", "1998.00", "1242.45", "0.00"]
+    assert rows[0]["tool_calls"] == examples[0]["tool_calls"]
+    assert store.count(template="What is {a} and {b}?") == 1
+    assert store.count(operation="clear_all") == 1
+    assert store.stats()["split"] == {"train": 5}
+    store.close()
+
+
+def test_split_is_deterministic_by_content(tmp_path):
+    examples = [_add(f"What is {n} and 1?", n, 1) for n in range(400)]
+    splits = []
+    for name in ("a", "b"):
+        store = DatasetStore(tmp_path / f"{name}.sqlite", batch_size=64)
+        store.ingest(reversed(examples) if name == "b" else examples, eval_fraction=0.25)
+        splits.append(sorted(row["user"] for row in store.iter_examples(split="eval")))
+        store.close()
+    assert splits[0] == splits[1]
+    assert 60 < len(splits[0]) < 140
+
+
+def test_iter_examples_reads_while_ingesting(tmp_path):
+    store = DatasetStore(tmp_path / "d.sqlite", batch_size=10)
+    store.ingest([_add(f"Add {n}", n) for n in range(50)], split="eval")
+    reader = store.iter_examples(split="eval")
+    first = next(reader)
+    store.ingest([_add(f"Add {n}", n) for n in range(50, 60)], split="eval")  # WAL: not blocked
+    assert first["user"] == "Add 0"
+    assert len(list(reader)) >= 49
+    store.close()
+
+
+def test_helpers(tmp_path):
+    assert expected_total([{"name": "add", "arguments": {"number": 2}},
+                           {"name": "nope", "arguments": {}}]) is None
+    assert operation_of([{"name": "subtract"}, {"name": "add"}, {"name": "add"}]) == "add+subtract"
+    path = tmp_path / "x.jsonl"
+    path.write_text(json.dumps(_add("Add 1", 1)) + "\n\n")
+    assert [e["user"] for e in read_jsonl(path)] == ["Add 1"]
@@ -0,0 +1,75 @@
+from decimal import Decimal
+import pytest
+from app.calculator_interface import call_tool
+from app.dispatcher import StreamDispatcher, dispatch
+
+
+def setup_function():
+    call_tool("clear_all", {})
+
+
+def test_dispatch_tool_calls():
+    out = dispatch('{"tool_calls":[{"name":"add","arguments":{"number":7}},'
+                   '{"name":"add","arguments":{"number":9}},'
+                   '{"name":"get_total","arguments":{}}]}')
+    assert out == Decimal("16.00")
+
+
+def test_dispatch_returns_none_unless_last_call_is_get_total():
+    assert dispatch('[{"name":"add","arguments":{"number":2}}]') is None
+    assert call_tool("get_total", {}) == Decimal("2.00")
+
+
+def test_dispatch_rejects_whole_list_on_bad_call():
+    call_tool("add", {"number": 5})
+    with pytest.raises(ValueError):
+        dispatch('{"tool_calls":[{"name":"add","arguments":{"number":7}},'
+                 '{"name":"add","arguments":{}}]}')
+    assert call_tool("get_total", {}) == Decimal("5.00")
+
+
+OUTPUT = ('{"tool_calls":[{"name":"add","arguments":{"number":7}},'
+          '{"name":"multiply","arguments":{"number":"1.5"}},'
+          '{"name":"get_total","arguments":{}}]}')
+
+
+def test_stream_dispatcher_applies_calls_as_they_close():
+    stream = StreamDispatcher()
+    first = OUTPUT.index("},") + 2  # just past the first call object
+    assert stream.feed(OUTPUT[:first]) == [None]
+    assert call_tool("get_total", {}) == Decimal("7.00")
+    assert stream.feed(OUTPUT[first:]) == [None, Decimal("10.50")]
+    assert stream.close() == Decimal("10.50")
+    assert stream.errors == []
+
+
+def test_stream_dispatcher_any_chunking():
+    for size in (1, 2, 5, 13):
+        call_tool("clear_all", {})
+        stream = StreamDispatcher()
+        for i in range(0, len(OUTPUT), size):
+            stream.feed(OUTPUT[i:i + size])
+        assert stream.close() == Decimal("10.50")
+
+
+def test_stream_dispatcher_keeps_calls_before_malformed_tail():
+    stream = StreamDispatcher()
+    stream.feed('Sure! {"tool_calls":[{"name":"add","arguments":{"number":4}},'
+                '{"name":"sqrt","arguments":{"number":9}},'
+                '{"name":"add","arguments":{"number":')
+    assert stream.close() is None
+    assert call_tool("get_total", {}) == Decimal("4.00")
+    assert len(stream.errors) == 2
+
+
+def test_stream_dispatcher_records_nan_and_out_of_range_numbers():
+    stream = StreamDispatcher()
+    stream.feed('{"tool_calls":[{"name":"add","arguments":{"number":"nan"}},'
+                '{"name":"add","arguments":{"number":"1e999999"}},'
+                '{"name":"add","arguments":{"number":NaN}},'
+                '{"name":"add","arguments":{"number":2}}]}')
+    assert stream.close() is None
+    assert len(stream.errors) == 3 and all(isinstance(e, ValueError) for _, e in stream.errors)
+    assert call_tool("get_total", {}) == Decimal("2.00")
+    with pytest.raises(ValueError):
+        dispatch('[{"name":"add","arguments":{"number":"nan"}}]')
@@ -0,0 +1,71 @@
+import json
+
+from data.dataset_store import expected_total
+from inference.evaluate import evaluate, iter_examples, parse_calls, score, template_of
+
+
+def _example(user, numbers):
+    return {"user": user, "tool_calls": [{"name": "add", "arguments": {"number": n}} for n in numbers]}
+
+
+def echo_run(utterances):
+    """Answers "What is A and B?" correctly, except that 13 is misread as 31."""
+    responses = []
+    for utterance in utterances:
+        numbers = [int(word.strip("?,")) for word in utterance.split() if word.strip("?,").isdigit()]
+        numbers = [31 if n == 13 else n for n in numbers]
+        calls = [{"name": "add", "arguments": {"number": n}} for n in numbers]
+        responses.append(json.dumps({"tool_calls": calls}))
+    return responses, [1.0] * len(utterances)
+
+
+def test_template_of_matches_generated_sentences():
+    assert template_of({"user": "Add seven, nine and twelve, show total"}) == "Add {a}, {b} and {c}, show total"
+    assert template_of({"user": "Add 1 plus 2 plus  3 what does that come to?"}).startswith("Add {a} plus")
+    assert template_of({"user": "Reset calculator"}) == "Reset calculator"
+    assert template_of({"user": "Something else", "template": "custom"}) == "custom"
+    assert template_of({"user": "Something else"}) == "other"
+
+
+def test_parse_calls_compares_numbers_by_value():
+    assert parse_calls('{"tool_calls":[{"name":"add","arguments":{"number":7.0}}]}') == \
+        parse_calls('[{"name": "add", "arguments": {"number": 7}}]')
+    assert parse_calls("Sure! not json") is None
+    assert parse_calls('{"tool_calls": "add"}') is None
+    for payload in ('{"tool_calls": 5}', "5", '{"tool_calls": {"name": "add"}}', '"add"'):
+        assert parse_calls(payload) is None
+
+
+def test_score_exact_versus_total():
+    example = _example("What is 2 and 3?", [2, 3])
+    swapped = json.dumps({"tool_calls": [{"name": "add", "arguments": {"number": 3}},
+                                         {"name": "add", "arguments": {"number": 2}}]})
+    record = score(example, swapped)
+    assert record == {"template": "What is {a} and {b}?", "operations": ["add"],
+                      "exact": False, "total": True}
+    assert score(example, "garbage")["total"] is False
+    # totals past the app Calculator's max_value of 1000 are still scored
+    large = {"user": "Add 1,234.56 and 7.89", "template": None,
+             "tool_calls": [{"name": "add", "arguments": {"number": 1234.56}},
+                            {"name": "add", "arguments": {"number": 7.89}}]}
+    reordered = json.dumps({"tool_calls": large["tool_calls"][::-1]})
+    assert score(large, reordered)["total"] is True
+    assert str(expected_total(parse_calls(json.dumps(large["tool_calls"])))) == "1242.45"
+
+
+def test_evaluate_reports_per_template_and_operation(tmp_path):
+    path = tmp_path / "heldout.jsonl"
+    with open(path, "w") as f:
+        for a, b in [(1, 2), (13, 4), (5, 6), (7, 8)]:
+            f.write(json.dumps(_example(f"What is {a} and {b}?", [a, b])) + "\n")
+        f.write(json.dumps({"user": "Reset calculator",
+                            "tool_calls": [{"name": "clear_all", "arguments": {}}]}) + "\n")
+
+    summary = evaluate(iter_examples(path), echo_run, batch_size=2).summary()
+    assert summary["count"] == 5
+    assert summary["by_template"]["What is {a} and {b}?"] == {"count": 4, "exact": 0.75, "total": 0.75}
+    assert summary["by_operation"]["clear_all"]["exact"] == 0.0
+    assert summary["latency_ms"]["p50"] == 1.0
+
+    parallel = evaluate(iter_examples(path, limit=4), echo_run, workers=2, batch_size=1).summary()
+    assert parallel["count"] == 4 and parallel["exact"] == 0.75
@@ -0,0 +1,85 @@
+import json
+import random
+from decimal import Decimal
+
+import pytest
+
+from inference.fast_path import FastPath, parse, read_number, tokenize
+
+
+def numbers(result):
+    return [call["arguments"]["number"] for call in result.tool_calls]
+
+
+def test_number_words_invert_to_words():
+    to_words = pytest.importorskip("data.number_words").to_words
+    rng = random.Random(0)
+    for n in list(range(0, 1200)) + [rng.randint(0, 10 ** 18 - 1) for _ in range(500)]:
+        tokens = tokenize(to_words(n))
+        assert read_number(tokens, 0)[:2] == (n, len(tokens))
+
+
+@pytest.mark.parametrize("text, value", [
+    ("1,234.56", Decimal("1234.56")),
+    ("one thousand two hundred point five", Decimal("1200.5")),
+    ("zero point zero five", Decimal("0.05")),
+    ("minus five", Decimal("-5")),
+    ("-3", Decimal("-3")),
+    ("twenty-one", Decimal("21")),
+    ("two quadrillion, five hundred thousand and one", Decimal(2 * 10 ** 15 + 500001)),
+])
+def test_read_number_forms(text, value):
+    assert read_number(tokenize(text), 0)[0] == value
+
+
+def test_template_routes():
+    add = parse("Add seven, nine and twelve")
+    assert add.route == "add" and add.confidence == 1.0
+    assert numbers(add) == [7, 9, 12]
+    assert numbers(parse("What is 7 and 9?")) == [7, 9]
+    assert numbers(parse("Add 1,234.56 plus one thousand two hundred point five")) == [1234.56, 1200.5]
+    assert parse("Reset calculator").tool_calls == [{"name": "clear_all", "arguments": {}}]
+    assert parse("What is the total?").route == "get_total"
+
+
+def test_unsure_utterances_are_not_confident():
+    assert parse("Subtract 4 from 9").confidence < 0.9
+    assert parse("multiply 3 by 4").confidence < 0.9
+    # "one hundred and five" could also be 100 and 5
+    assert parse("Add one hundred and five").confidence < 0.9
+    assert parse("What is 10 minus 3?").confidence < 0.9  # a subtraction
+    assert numbers(parse("Add minus five and 3")) == [-5, 3]
+    assert parse("tell me a joke").route is None
+
+
+@pytest.mark.parametrize("text", [
+    "What is 10 - 3?", "What is 10-3?", "10 * 3", "10 / 2", "What is 6 % 50?", "2^8", "7 = 9",
+    "What is 1.2.3 and 4", "Add .5 and 1",
+])
+def test_operator_utterances_go_to_the_model(text):
+    assert parse(text).confidence < 0.9
+
+
+def test_tokenize_keeps_unknown_characters():
+    assert tokenize("What is 10 - 3?") == ["what", "is", "10", "-", "3"]
+    assert tokenize("10-3, -4 & 2^8") == ["10", "-", "3", ",", "-4", "&", "2", "^", "8"]
+    assert tokenize("What is 1.2.3 and 4.") == ["what", "is", "1.2", ".", "3", "and", "4"]
+
+
+def test_answer_falls_back_and_counts():
+    fast = FastPath(threshold=0.9)
+    model_calls = []
+
+    def model(text):
+        model_calls.append(text)
+        return '{"tool_calls":[]}'
+
+    out = json.loads(fast.answer("What is 7 and 9?", model))
+    assert out == {"tool_calls": [{"name": "add", "arguments": {"number": 7}},
+                                  {"name": "add", "arguments": {"number": 9}}]}
+    fast.answer("Current total?", model)
+    fast.answer("Divide 10 by 2", model)
+    assert model_calls == ["Divide 10 by 2"]
+    stats = fast.stats()
+    assert stats["hits"] == {"add": 1, "get_total": 1}
+    assert stats["fallbacks"] == 1 and stats["requests"] == 3
@@ -4,3 +4,41 @@ def test_make_add_example():
     assert "user" in ex and "tool_calls" in ex
     assert isinstance(ex["tool_calls"], list)
     assert ex["tool_calls"][0]["name"] == "add"
+
+
+def test_import_writes_nothing(tmp_path, monkeypatch):
+    import importlib
+
+    import data.generate_dataset
+    monkeypatch.chdir(tmp_path)
+    importlib.reload(data.generate_dataset)
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_write_dataset_is_seeded_sharded_and_unique(tmp_path):
+    import gzip
+    import json
+
+    from data.generate_dataset import parse_mix, write_dataset
+
+    mix = parse_mix("add=8,total=1,clear=1")
+    one = write_dataset(str(tmp_path / "a.jsonl"), 300, shards=3, seed=7, mix=mix, chunk_size=64)
+    two = write_dataset(str(tmp_path / "b.jsonl"), 300, shards=3, workers=2, seed=7, mix=mix,
+                        chunk_size=64, compress=True)
+    assert one["written"] == two["written"] == 300
+    assert two["paths"][1].endswith("b-00001-of-00003.jsonl.gz")
+    lines = []
+    for plain, packed in zip(one["paths"], two["paths"]):
+        with open(plain) as f, gzip.open(packed, "rt") as g:
+            shard = f.read()
+            assert shard == g.read()  # independent of workers and compression
+        lines += shard.splitlines()
+    assert len(lines) == len(set(lines)) == 300
+    assert {json.loads(line)["tool_calls"][0]["name"] for line in lines} == {"add", "get_total", "clear_all"}
+
+
+def test_write_dataset_stops_when_mix_is_exhausted(tmp_path):
+    from data.generate_dataset import parse_mix, write_dataset
+
+    stats = write_dataset(str(tmp_path / "t.jsonl"), 100, mix=parse_mix("total"), chunk_size=16)
+    assert stats["written"] == 2  # TOTAL_TEMPLATES has two sentences
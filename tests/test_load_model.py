@@ -0,0 +1,18 @@
+import pytest
+
+from inference import load_model
+
+
+def test_variants_are_found_by_name(tmp_path, monkeypatch):
+    monkeypatch.setattr(load_model, "VARIANTS_DIR", str(tmp_path))
+    assert load_model.list_variants() == []
+    (tmp_path / "phase4").mkdir()
+    (tmp_path / "phase4" / "snapshot.json").write_text("{}")
+    (tmp_path / "half-written").mkdir()  # no manifest yet
+    assert load_model.list_variants() == ["phase4"]
+    assert load_model.variant_path("phase4") == str(tmp_path / "phase4")
+
+    with pytest.raises(ValueError, match="available: phase4"):
+        load_model.load_variant("phase1")
+    with pytest.raises(ValueError):
+        load_model.variant_path("../elsewhere")
@@ -0,0 +1,74 @@
+import json
+
+import pytest
+
+from app import metrics
+from app.calculator_interface import sessions
+from app.dispatcher import dispatch
+
+
+@pytest.fixture(autouse=True)
+def fresh_metrics():
+    metrics.reset()
+    yield
+    metrics.disable()
+    metrics.reset()
+
+
+def test_disabled_records_nothing():
+    metrics.disable()
+    assert metrics.stage("dispatch") is metrics.stage("tokenize")
+    with metrics.stage("dispatch"):
+        pass
+    metrics.count("tokens_generated", 5)
+    assert metrics.snapshot() == {"stages": {}, "counters": {}}
+
+
+def test_dispatch_and_call_tool_are_timed():
+    metrics.enable()
+    dispatch(json.dumps({"tool_calls": [{"name": "add", "arguments": {"number": 2}}]}), "metrics-a")
+    dispatch('{"name": "get_total", "arguments": {}}', "metrics-a")
+    stages = metrics.snapshot()["stages"]
+    assert stages["dispatch"]["count"] == 2
+    assert stages["call_tool"]["count"] == 2
+    assert stages["call_tool"]["p50_ms"] <= stages["call_tool"]["max_ms"]
+    sessions.drop("metrics-a")
+
+
+def test_quantiles_come_from_buckets():
+    metrics.enable()
+    for _ in range(99):
+        metrics.observe("decode", 0.001)
+    metrics.observe("decode", 1.0)
+    summary = metrics.snapshot()["stages"]["decode"]
+    assert summary["count"] == 100
+    assert 1.0 <= summary["p50_ms"] <= 2.1  # within one doubling bucket
+    assert summary["p99_ms"] <= 2.1
+    assert summary["max_ms"] == pytest.approx(1000.0)
+
+
+def test_prometheus_text_is_cumulative(tmp_path):
+    metrics.enable()
+    metrics.observe("prefill", 3e-6)
+    metrics.observe("prefill", 100.0)  # above the largest bucket
+    metrics.count("tokens_generated", 7)
+    text = metrics.prometheus_text()
+    assert 'calc_stage_seconds_bucket{stage="prefill",le="4e-06"} 1' in text
+    assert 'calc_stage_seconds_bucket{stage="prefill",le="+Inf"} 2' in text
+    assert 'calc_stage_seconds_count{stage="prefill"} 2' in text
+    assert "calc_tokens_generated_total 7" in text
+
+    metrics.export_prometheus(tmp_path / "m.prom")
+    assert (tmp_path / "m.prom").read_text() == text
+
+
+def test_export_jsonl_appends(tmp_path):
+    metrics.enable()
+    metrics.observe("extract", 0.002)
+    path = tmp_path / "m.jsonl"
+    metrics.export_jsonl(path)
+    metrics.export_jsonl(path)
+    lines = [json.loads(line) for line in path.read_text().splitlines()]
+    assert len(lines) == 4
+    assert lines[0]["stage"] == "extract" and lines[0]["count"] == 1
+    assert lines[1]["counters"] == {}
@@ -0,0 +1,48 @@
+import random
+from decimal import Decimal
+
+import pytest
+from num2words import num2words
+
+from data.number_words import WORDS, read_words, to_number, to_words
+
+
+def test_matches_num2words():
+    rng = random.Random(0)
+    numbers = list(range(0, 3000)) + [10 ** k for k in range(3, 18)]
+    numbers += [rng.randrange(10 ** 18) for _ in range(2000)] + [-rng.randrange(10 ** 9) for _ in range(200)]
+    numbers += [round(rng.uniform(-1e6, 1e6), 2) for _ in range(1000)] + [Decimal("1234.56"), 2.0, 1e-05]
+    for n in numbers:
+        if -1 < n < 0:
+            continue
+        assert to_words(n) == num2words(n), n
+
+
+def test_examples():
+    assert len(WORDS) == 1000 and WORDS[21] == "twenty-one"
+    assert to_words(101000) == "one hundred and one thousand"
+    assert to_words(1000100) == "one million, one hundred"
+    assert to_words(-0.5) == "minus zero point five"  # num2words drops this sign
+
+
+def test_to_number_inverts_to_words():
+    for n in [0, 5, 21, 105, 1005, 1100, 101000, 1234567, -42, 10 ** 15 + 1]:
+        assert to_number(to_words(n)) == n
+    assert to_number("one thousand, two hundred and thirty-four point five six") == Decimal("1234.56")
+    assert to_number("Minus zero point five") == Decimal("-0.5")
+
+
+@pytest.mark.parametrize("text", ["", "seven eight", "thousand", "one thousand million",
+                                  "one point", "one and", "two hundred and"])
+def test_to_number_rejects(text):
+    with pytest.raises(ValueError):
+        to_number(text)
+
+
+def test_read_words_stops_where_the_number_ends():
+    assert read_words("add seven and nine".split(), 1) == (7, 2)
+    assert read_words("one thousand and two thousand".split()) == (1000, 2)
+    assert read_words("one hundred and five apples".split()) == (105, 4)
+    assert read_words("zero point zero five".split()) == (Decimal("0.05"), 4)
+    assert read_words("one point x".split()) == (1, 1)
+    assert read_words(["total"]) is None
@@ -0,0 +1,82 @@
+import json
+
+import numpy as np
+import pytest
+
+from training.packing import PackedDataset, TokenCache, cache_key, collate_packed, pack, padding_report
+
+
+class WordTokenizer:
+    """Whitespace tokenizer hashing words into 100 ids; id 1 is BOS, 2 is EOS."""
+
+    name_or_path = "word-tokenizer"
+    eos_token_id = 2
+
+    def get_vocab(self):
+        return {f"<{i}>": i for i in range(103)}
+
+    def __call__(self, texts, add_special_tokens=True):
+        ids = []
+        for text in texts:
+            row = [1] if add_special_tokens else []
+            row += [3 + sum(map(ord, word)) % 100 for word in text.split()]
+            ids.append(row)
+        return {"input_ids": ids}
+
+
+def _examples(n):
+    return [{"user": "add " + " ".join(["x"] * (i % 4)),
+             "tool_calls": [{"name": "add", "arguments": {"number": i}}]} for i in range(n)]
+
+
+def test_cache_masks_prompt_and_maps_files(tmp_path):
+    tokenizer = WordTokenizer()
+    cache = TokenCache.build(tokenizer, _examples(5), str(tmp_path / "c"), batch_size=2)
+    assert len(cache) == 5 and cache.meta["examples"] == 5
+    ids, targets = cache.example(1)
+    # <bos> User: add x Assistant: | {json} <eos>
+    assert list(targets) == [0, 0, 0, 0, 0, 1, 1]
+    assert ids[-1] == 2 and isinstance(cache.tokens, np.memmap)
+    assert not (tmp_path / "c.tmp").exists()
+    reopened = TokenCache(str(tmp_path / "c"))
+    assert list(reopened.lengths) == list(cache.lengths)
+
+
+def test_build_or_load_reuses_cache(tmp_path):
+    data = tmp_path / "d.jsonl"
+    data.write_text("".join(json.dumps(e) + "\n" for e in _examples(3)))
+    tokenizer = WordTokenizer()
+    first = TokenCache.build_or_load(tokenizer, str(data), str(tmp_path / "cache"))
+    second = TokenCache.build_or_load(tokenizer, str(data), str(tmp_path / "cache"))
+    assert first.path == second.path and second.meta["build_seconds"] == first.meta["build_seconds"]
+    assert cache_key(tokenizer, str(data)).startswith("v1-")
+
+
+def test_pack_and_padding_report():
+    assert list(pack([3, 3, 3, 9, 1], block_size=6)) == [0, 2, 3, 4, 5]
+    report = padding_report([2, 4, 2, 4], block_size=6, batch_size=2)
+    assert report["unpacked_padding"] == pytest.approx(1 - 12 / 16)
+    assert report["packed_blocks"] == 2 and report["packed_padding"] == 0.0
+
+
+def test_packed_items_restart_positions(tmp_path):
+    cache = TokenCache.build(WordTokenizer(), _examples(6), str(tmp_path / "c"))
+    dataset = PackedDataset(cache, block_size=20)
+    item = dataset[0]
+    lengths = [int(n) for n in cache.lengths[dataset.bounds[0]:dataset.bounds[1]]]
+    assert len(item["input_ids"]) == sum(lengths) <= 20
+    assert item["position_ids"] == [p for n in lengths for p in range(n)]
+    assert sum(label != -100 for label in item["labels"]) == sum(
+        int(cache.example(i)[1].sum()) for i in range(dataset.bounds[0], dataset.bounds[1]))
+
+
+def test_collate_blocks_attention_between_examples():
+    torch = pytest.importorskip("torch")
+    features = [{"input_ids": [5, 6, 7, 8], "labels": [-100, 6, -100, 8], "position_ids": [0, 1, 0, 1]},
+                {"input_ids": [9], "labels": [9], "position_ids": [0]}]
+    batch = collate_packed(features)
+    allowed = batch["attention_mask"][0, 0] == 0
+    assert allowed.tolist() == [[True, False, False, False], [True, True, False, False],
+                                [False, False, True, False], [False, False, True, True]]
+    assert batch["labels"][1].tolist() == [9, -100, -100, -100]
+    assert torch.equal(batch["position_ids"][0], torch.tensor([0, 1, 0, 1]))
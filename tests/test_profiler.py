@@ -0,0 +1,56 @@
+import json
+
+import pytest
+
+from training.profiler import StepProfiler, count_parameters, format_summary, parse_steps
+
+
+class _Parameter:
+    def __init__(self, n, requires_grad):
+        self.n, self.requires_grad = n, requires_grad
+
+    def numel(self):
+        return self.n
+
+
+class _Model:
+    def parameters(self):
+        return [_Parameter(1000, False), _Parameter(24, True), _Parameter(8, True)]
+
+
+def _step(profiler, micro_batches=1, tokens=16):
+    for _ in range(micro_batches):
+        profiler.forward_begin(tokens)
+        profiler.forward_end()
+    profiler.optimizer_begin()
+    profiler.optimizer_end()
+    profiler.step_end()
+
+
+def test_steps_split_into_phases(tmp_path):
+    profiler = StepProfiler(report_path=str(tmp_path / "profile.json"), skip_steps=1)
+    profiler.attach(_Model())
+    _step(profiler)
+    _step(profiler, micro_batches=3)
+    _step(profiler, micro_batches=2, tokens=8)
+
+    assert [step["tokens"] for step in profiler.steps] == [16, 48, 16]
+    for step in profiler.steps:
+        parts = sum(step[phase] for phase in ("data", "forward", "backward", "optimizer"))
+        assert parts == pytest.approx(step["total"], abs=1e-3)
+        assert step["peak_rss"] > 0
+
+    summary = profiler.finish()
+    assert summary["steps"] == 3 and summary["timed_steps"] == 2
+    assert summary["tokens_per_step"] == 32
+    assert summary["parameters"] == {"total": 1032, "trainable": 32, "trainable_fraction": 32 / 1032}
+    report = json.loads((tmp_path / "profile.json").read_text())
+    assert len(report["steps"]) == 3 and report["summary"]["timed_steps"] == 2
+    assert "32 trainable of 1,032" in format_summary(summary)
+
+
+def test_count_parameters_and_step_windows():
+    assert count_parameters(_Model())["trainable"] == 32
+    assert parse_steps("5:8") == (5, 8) and parse_steps("3") == (3, 3)
+    with pytest.raises(ValueError):
+        parse_steps("8:5")
@@ -0,0 +1,90 @@
+import json
+
+from inference.response_cache import ResponseCache, normalize
+
+
+def calls(*numbers):
+    return json.dumps({"tool_calls": [{"name": "add", "arguments": {"number": n}} for n in numbers]},
+                      separators=(",", ":"))
+
+
+def test_normalize():
+    assert normalize("  What IS 7,  and 9?? ") == ("what is 7 and 9", [])
+    key, numbers = normalize("Add seven and 1,234.5", slots=True)
+    assert key == "add # and #"
+    assert numbers == [7, 1234.5]
+
+
+def test_lru_eviction_and_stats():
+    cache = ResponseCache("m1", max_entries=2)
+    generated = []
+
+    def model(text):
+        generated.append(text)
+        return calls(len(generated))
+
+    for text in ["a 1", "A 1!", "b 2", "c 3", "a 1"]:
+        cache.get_or_generate(text, model)
+    assert generated == ["a 1", "b 2", "c 3", "a 1"]  # "a 1" was evicted by "c 3"
+    stats = cache.stats()
+    assert stats["hits_memory"] == 1 and stats["misses"] == 4 and stats["evictions"] == 2
+
+
+def test_slots_substitute_numbers():
+    cache = ResponseCache("m1", slots=True)
+    cache.put("add 7 and 9", calls(7, 9))
+    assert json.loads(cache.get("Add three and 4")) == json.loads(calls(3, 4))
+    assert cache.stats()["hits_slot"] == 1
+    # a response whose numbers are not the utterance's is only cached exactly
+    cache.put("double 5 and 6", calls(10, 12))
+    assert cache.get("double 1 and 2") is None
+    # repeated numbers make the mapping ambiguous
+    cache.put("add 5 and 5", calls(5, 5))
+    assert cache.get("add 5 and 6") == calls(5, 6)  # from "add 7 and 9"
+    assert cache.get("add 2 and 2") is not None
+
+
+def test_sqlite_tier_and_identity(tmp_path):
+    path = tmp_path / "responses.sqlite"
+    cache = ResponseCache("model-a", path=path)
+    cache.put("what is 7 and 9", calls(7, 9))
+    cache.close()
+
+    reopened = ResponseCache("model-a", path=path)
+    assert reopened.get("What is 7 and 9?") == calls(7, 9)
+    assert reopened.stats()["hits_disk"] == 1
+    reopened.set_identity("model-a+adapter")
+    assert reopened.get("What is 7 and 9?") is None
+    # a response of the model switched away from is neither stored nor served
+    reopened.get_or_generate("what is 1 and 2", lambda text: calls(1, 2), identity="model-a")
+    assert reopened.get("what is 1 and 2") is None
+    reopened.set_identity("model-a")
+    assert reopened.get("What is 7 and 9?", identity="model-a+adapter") is None
+    reopened.invalidate()
+    assert reopened.get("What is 7 and 9?") is None
+    reopened.close()
+
+
+def test_operators_do_not_share_entries(tmp_path):
+    texts = ["What is 10 - 3?", "what is 10 * 3", "what is 10 / 3", "What is 10 and 3?", "what is 10 -3"]
+    assert len({normalize(text)[0] for text in texts}) == len(texts)
+    assert len({normalize(text, slots=True)[0] for text in texts}) == len(texts)
+    assert normalize("ten minus three", slots=True)[0] == "# minus #"
+
+    cache = ResponseCache("m1", path=tmp_path / "responses.sqlite", slots=True)
+    cache.put("What is 10 - 3?", '{"tool_calls":[{"name":"subtract","arguments":{"number":3}}]}')
+    for text in texts[1:]:
+        assert cache.get(text) is None
+    cache.close()
+
+
+def test_template_keys_are_not_utterance_keys(tmp_path):
+    cache = ResponseCache("m1", path=tmp_path / "responses.sqlite", slots=True)
+    cache.put("add 7 and 9", calls(7, 9))
+    for text in ["add # and #", "Add # and #?", "?add # and #"]:
+        assert cache.get(text) is None
+    assert cache.get("add 1 and 2") == calls(1, 2)
+    cache.close()
+    reopened = ResponseCache("m1", path=tmp_path / "responses.sqlite", slots=True)
+    assert reopened.get("add # and #") is None and reopened.get("add 3 and 4") == calls(3, 4)
+    reopened.close()
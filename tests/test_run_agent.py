@@ -0,0 +1,90 @@
+import subprocess
+import sys
+
+
+def test_import_is_lazy_and_fast_path_needs_no_model():
+    code = (
+        "import sys\n"
+        "from inference import run_agent\n"
+        "out = run_agent.generate('What is 7 and 9?')\n"
+        "assert run_agent.model is None, 'model was loaded'\n"
+        "assert 'torch' not in sys.modules and 'transformers' not in sys.modules\n"
+        "print(out)\n"
+    )
+    child = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True)
+    assert child.returncode == 0, child.stderr
+    assert '"number":9' in child.stdout
+
+
+class _Model:
+    name_or_path = "base"
+    inference_backend = "dynamic_int8"
+
+    def __init__(self, variant=None):
+        self.variant = variant
+
+
+def test_use_variant_swaps_model_and_keeps_tokenizer(monkeypatch):
+    from inference import run_agent
+    from inference.response_cache import ResponseCache
+
+    loaded = []
+
+    def load_variant(name, tokenizer=None):
+        loaded.append((name, tokenizer))
+        return tokenizer, _Model(name)
+
+    base = _Model()
+    monkeypatch.setattr(run_agent, "tokenizer", "shared-tokenizer")
+    monkeypatch.setattr(run_agent, "model", base)
+    monkeypatch.setattr(run_agent, "load_variant", load_variant)
+    monkeypatch.setattr(run_agent, "_variants", {})
+    monkeypatch.setattr(run_agent, "_prefix_caches", {None: "base-prefix", "phase4": "phase4-prefix"})
+    monkeypatch.setattr(run_agent, "response_cache", ResponseCache(run_agent.model_identity()))
+    base_identity = run_agent.response_cache.identity
+
+    before = run_agent.snapshot()
+    phase4 = run_agent.use_variant("phase4")
+    assert run_agent.model is phase4 and phase4.variant == "phase4"
+    assert run_agent.snapshot() == (phase4, "phase4-prefix", run_agent.model_identity(phase4))
+    assert before == (base, "base-prefix", base_identity)  # an utterance in flight keeps its model
+    assert run_agent.response_cache.identity != base_identity
+    # ...and its response is not cached under the new model's identity
+    run_agent.response_cache.put("What is 7 minus 2?", '{"tool_calls":[]}', identity=before.identity)
+    assert run_agent.response_cache.get("What is 7 minus 2?") is None
+    assert run_agent.use_variant(None) is base
+    assert run_agent.response_cache.identity == base_identity
+    assert run_agent.use_variant("phase4") is phase4
+    assert loaded == [("phase4", "shared-tokenizer")]  # loaded once, with the shared tokenizer
+
+
+def test_tokens_generated_counts_the_output(monkeypatch):
+    from app import metrics
+    from inference import run_agent
+
+    class Stepper:
+        length = 0
+
+    class Decoder:
+        def model_step(self, model, past, cached):
+            return Stepper()
+
+    class PrefixCache:
+        def past_for(self, ids):
+            return None, len(ids)  # the whole prompt is cached; nothing is fed
+
+    def tokenizer(text, add_special_tokens=True):
+        return {"input_ids": text.split()}
+
+    output = '{"tool_calls": [ {"name": "get_total", "arguments": {}} ]}'
+    monkeypatch.setattr(run_agent, "tokenizer", tokenizer)
+    monkeypatch.setattr(run_agent, "constrained_decoder", Decoder)
+    monkeypatch.setattr(run_agent, "decode_speculative", lambda *args: (output, None, None))
+    monkeypatch.setattr(metrics, "enabled", True)
+    metrics.reset()
+    try:
+        current = run_agent.Snapshot(_Model(), PrefixCache(), "test")
+        assert run_agent._generate_on(current, "What is the total?") == output
+        assert metrics.snapshot()["counters"]["tokens_generated"] == len(output.split())
+    finally:
+        metrics.reset()
@@ -0,0 +1,145 @@
+import asyncio
+import json
+import subprocess
+import sys
+import threading
+
+import pytest
+
+from app.calculator_interface import sessions
+from inference.server import AgentServer, Overloaded
+
+
+def _apply(response, session_id):
+    from app.dispatcher import dispatch
+    return dispatch(response, session_id)
+
+
+def test_submit_routes_through_dispatch():
+    def generate(text):
+        n = int(text.split()[-1])
+        return json.dumps({"tool_calls": [{"name": "add", "arguments": {"number": n}},
+                                          {"name": "get_total", "arguments": {}}]})
+
+    async def scenario():
+        server = AgentServer(generate, _apply, max_concurrency=2, max_queue=2)
+        try:
+            await server.submit("add 5", "srv-a")
+            return await server.submit("add 7", "srv-a"), server.stats()
+        finally:
+            server.close()
+
+    reply, stats = asyncio.run(scenario())
+    assert reply["result"] == "12.00" and reply["error"] is None
+    assert stats["served"] == 2 and stats["pending"] == 0
+    sessions.drop("srv-a")
+
+
+def test_rejects_when_queue_full():
+    release = threading.Event()
+
+    def generate(text):
+        release.wait(5)
+        return '{"name": "get_total", "arguments": {}}'
+
+    async def scenario():
+        server = AgentServer(generate, _apply, max_concurrency=1, max_queue=1)
+        try:
+            first = asyncio.ensure_future(server.submit("a", "srv-b"))
+            second = asyncio.ensure_future(server.submit("b", "srv-b"))
+            await asyncio.sleep(0.05)
+            with pytest.raises(Overloaded):
+                await server.submit("c", "srv-b")
+            release.set()
+            await asyncio.gather(first, second)
+            return server.stats()
+        finally:
+            server.close()
+
+    stats = asyncio.run(scenario())
+    assert stats["served"] == 2 and stats["rejected"] == 1
+    sessions.drop("srv-b")
+
+
+def test_http_round_trip():
+    async def scenario():
+        server = AgentServer(lambda text: "no json here", _apply)
+        listener = await asyncio.start_server(server._handle, "127.0.0.1", 0)
+        port = listener.sockets[0].getsockname()[1]
+
+        async def request(raw):
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.write(raw)
+            await writer.drain()
+            data = await reader.read()
+            writer.close()
+            head, body = data.split(b"\r\n\r\n", 1)
+            return int(head.split(b" ")[1]), json.loads(body)
+
+        try:
+            async with listener:
+                body = b'{"text": "hello", "session_id": "srv-c"}'
+                post = await request(b"POST /utterance HTTP/1.1\r\nContent-Length: "
+                                     + str(len(body)).encode() + b"\r\n\r\n" + body)
+                missing = await request(b"POST /utterance HTTP/1.1\r\nContent-Length: 2\r\n\r\n{}")
+                stats = await request(b"GET /stats HTTP/1.1\r\n\r\n")
+                return post, missing, stats
+        finally:
+            server.close()
+
+    post, missing, stats = asyncio.run(scenario())
+    assert post[0] == 200 and post[1]["error"] and post[1]["raw"] == "no json here"
+    assert missing[0] == 400
+    assert stats[0] == 200 and stats[1]["failed"] == 1
+
+
+def test_generation_errors_and_bad_bodies():
+    def generate(text):
+        raise ValueError("model exploded")
+
+    def process(text, session_id):
+        raise RuntimeError("worker died")
+
+    async def scenario():
+        server = AgentServer(generate, _apply)
+        broken_pool = AgentServer(None, None, process=process)
+        listener = await asyncio.start_server(server._handle, "127.0.0.1", 0)
+        port = listener.sockets[0].getsockname()[1]
+
+        async def request(body):
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.write(b"POST /utterance HTTP/1.1\r\nContent-Length: "
+                         + str(len(body)).encode() + b"\r\n\r\n" + body)
+            await writer.drain()
+            data = await reader.read()
+            writer.close()
+            head, payload = data.split(b"\r\n\r\n", 1)
+            return int(head.split(b" ")[1]), json.loads(payload)
+
+        try:
+            async with listener:
+                failed = await request(b'{"text": "hello"}')
+                not_object = await request(b"[1]")
+                pooled = await broken_pool.submit("hello", "srv-d")
+                return failed, not_object, pooled, server.stats(), broken_pool.stats()
+        finally:
+            server.close()
+            broken_pool.close()
+
+    failed, not_object, pooled, stats, pool_stats = asyncio.run(scenario())
+    assert failed[0] == 500 and "model exploded" in failed[1]["error"] and failed[1]["raw"] is None
+    assert not_object[0] == 400 and "JSON object" in not_object[1]["error"]
+    assert pooled["error"] == "RuntimeError: worker died"
+    assert stats["failed"] == 1 and pool_stats["failed"] == 1
+
+
+@pytest.mark.parametrize("flags, message", [
+    (["--max_batch", "4", "--response_cache", "x.sqlite"], "--max_batch"),
+    (["--max_batch", "4", "--cache_slots"], "--max_batch"),
+    (["--workers", "2", "--max_batch", "4"], "--workers"),
+    (["--workers", "2", "--metrics"], "--workers"),
+])
+def test_rejected_flag_combinations(flags, message):
+    child = subprocess.run([sys.executable, "-m", "inference.server", *flags],
+                           capture_output=True, text=True, timeout=60)
+    assert child.returncode == 2 and message in child.stderr
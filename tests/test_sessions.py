@@ -0,0 +1,79 @@
+import threading
+from decimal import Decimal
+from calculator import Calculator
+from app.calculator_interface import call_tool
+from app.dispatcher import dispatch
+from app.sessions import SessionManager
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_sessions_are_isolated():
+    call_tool("add", {"number": 7}, session_id="alice")
+    call_tool("add", {"number": 2}, session_id="bob")
+    dispatch('[{"name":"add","arguments":{"number":1}}]', session_id="alice")
+    assert call_tool("get_total", {}, session_id="alice") == Decimal("8.00")
+    assert call_tool("get_total", {}, session_id="bob") == Decimal("2.00")
+
+
+def test_lru_eviction():
+    manager = SessionManager(Calculator, max_sessions=2)
+    for session_id in ("a", "b"):
+        with manager.session(session_id) as calc:
+            calc.add(1)
+    with manager.session("a"):
+        pass
+    with manager.session("c"):
+        pass
+    assert "a" in manager and "c" in manager and "b" not in manager
+    assert manager.stats()["evicted_lru"] == 1
+
+
+def test_idle_ttl_eviction():
+    clock = FakeClock()
+    manager = SessionManager(Calculator, idle_ttl=10, clock=clock)
+    with manager.session("a") as calc:
+        calc.add(5)
+    clock.now = 11
+    with manager.session("b") as calc:
+        assert calc.get_total() == Decimal("0.00")
+    assert "a" not in manager
+    assert manager.stats()["evicted_idle"] == 1
+
+
+def test_session_in_use_is_not_evicted():
+    manager = SessionManager(Calculator, max_sessions=1)
+    with manager.session("a") as calc:
+        calc.add(3)
+        with manager.session("b"):
+            pass
+        assert "a" in manager
+
+
+def test_memory_cap_limits_sessions():
+    manager = SessionManager(Calculator, max_memory_bytes=1)
+    assert manager.max_sessions == 1
+
+
+def test_concurrent_updates_to_one_session():
+    manager = SessionManager(Calculator)
+
+    def work():
+        for _ in range(200):
+            with manager.session("shared") as calc:
+                calc.add(1)
+
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    with manager.session("shared") as calc:
+        assert calc.get_total() == Decimal("800.00")
+    assert manager.stats()["created"] == 1
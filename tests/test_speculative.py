@@ -0,0 +1,84 @@
+import json
+
+import pytest
+
+from inference.constrained import ConstrainedDecoder
+from inference.speculative import decode_speculative, draft_tool_calls
+from test_constrained import CharTokenizer
+
+
+class FakeLM:
+    """Prefers the longest piece continuing ``target``; keeps a croppable 'cache'."""
+
+    def __init__(self, tokenizer, target, prompt_len):
+        self.id_to_piece = {i: p for p, i in tokenizer.vocab.items()}
+        self.vocab_size = len(tokenizer.vocab)
+        self.target = target
+        self.prompt_len = prompt_len
+        self.cache = []
+        self.forwards = 0
+
+    @property
+    def length(self):
+        return len(self.cache)
+
+    def _scores(self):
+        text = "".join(self.id_to_piece[i] for i in self.cache[self.prompt_len:])
+        scores = [0.0] * self.vocab_size
+        if self.target.startswith(text):
+            want = self.target[len(text):]
+            for piece, i in ((p, i) for i, p in self.id_to_piece.items()):
+                if want.startswith(piece):
+                    scores[i] = float(len(piece))
+        return scores
+
+    def forward(self, ids):
+        self.forwards += 1
+        out = []
+        for token in ids:
+            self.cache.append(token)
+            out.append(self._scores())
+        return out
+
+    def __call__(self, ids):
+        return self.forward(ids)[-1]
+
+    def crop(self, length):
+        del self.cache[length:]
+
+
+TARGET = '{"tool_calls":[{"name":"add","arguments":{"number":12}},{"name":"subtract","arguments":{"number":3}}]}'
+
+
+@pytest.mark.parametrize("draft", [
+    TARGET,
+    '{"tool_calls":[{"name":"add","arguments":{"number":12}},{"name":"add","arguments":{"number":3}}]}',
+    '{"tool_calls":[{"name":"multiply","arguments":{"number":7}}]}',
+    "",
+])
+def test_speculative_matches_plain_greedy(draft):
+    tok = CharTokenizer()
+    decoder = ConstrainedDecoder(tok)
+    prompt = [0, 1, 2]
+
+    plain = FakeLM(tok, TARGET, len(prompt))
+    expected, _ = decoder.decode(plain, prompt)
+    assert expected == TARGET
+
+    spec = FakeLM(tok, TARGET, len(prompt))
+    text, grammar, stats = decode_speculative(decoder, spec, prompt, draft)
+    assert text == expected
+    assert stats["forwards"] == spec.forwards
+    if draft == TARGET:
+        assert stats["accepted"] == stats["drafted"] == grammar.steps
+        assert spec.forwards == 1 < plain.forwards
+
+
+def test_draft_tool_calls():
+    assert json.loads(draft_tool_calls("What is 10 minus 3?")) == {"tool_calls": [
+        {"name": "add", "arguments": {"number": 10}},
+        {"name": "subtract", "arguments": {"number": 3}}]}
+    assert json.loads(draft_tool_calls("Add seven and 1,234.5"))["tool_calls"][1] == {
+        "name": "add", "arguments": {"number": 1234.5}}
+    assert "get_total" in draft_tool_calls("Current total?")
+    assert draft_tool_calls("hello there") == ""
@@ -0,0 +1,106 @@
+import os
+import signal
+import time
+from concurrent.futures import TimeoutError
+
+import pytest
+
+from inference.worker_pool import WorkerPool, process_memory
+
+_parent_state = list(range(1000))  # created before forking, visible in every worker
+
+
+_worker_state = {}
+
+
+def _init_worker():
+    _worker_state["initialized_in"] = os.getpid()
+
+
+def _echo(text, session_id):
+    if text == "boom":
+        raise ValueError("bad utterance")
+    if text == "die":
+        os._exit(3)
+    if text == "slow":
+        time.sleep(1)
+    if text == "kill":
+        os.kill(os.getpid(), signal.SIGKILL)
+    if text == "big":
+        return "x" * (1 << 20)  # more than a pipe buffer: written in several chunks
+    return {"pid": os.getpid(), "session_id": session_id, "text": text, "shared": len(_parent_state)}
+
+
+def test_sessions_stay_on_one_worker():
+    pool = WorkerPool(3, _echo, threads=1)
+    try:
+        sessions = [f"s{i}" for i in range(12)]
+        futures = [(s, pool.submit(f"hi {n}", s)) for n in range(3) for s in sessions]
+        pids = {}
+        for session, future in futures:
+            reply = future.result(timeout=10)
+            assert reply["session_id"] == session and reply["shared"] == 1000
+            pids.setdefault(session, set()).add(reply["pid"])
+        assert all(len(p) == 1 for p in pids.values())
+        assert len({p for ps in pids.values() for p in ps}) == len({pool.worker_of(s) for s in sessions}) > 1
+        assert os.getpid() not in {p for ps in pids.values() for p in ps}
+
+        with pytest.raises(RuntimeError, match="bad utterance"):
+            pool.process("boom", "s1")
+        stats = pool.stats()
+        assert sum(w["served"] for w in stats["workers"]) == 37
+        assert all(w["alive"] for w in stats["workers"]) and stats["threads_per_worker"] == 1
+    finally:
+        pool.close()
+    assert not any(p.is_alive() for p in pool._processes)
+
+
+def test_dead_worker_fails_its_requests_and_is_restarted():
+    pool = WorkerPool(2, _echo, threads=1, initializer=_init_worker)
+    try:
+        with pytest.raises(RuntimeError, match="exited with code 3"):
+            pool.process("die", "s1", timeout=10)
+        reply = pool.process("hi", "s1", timeout=10)
+        assert reply["text"] == "hi"
+        with pytest.raises(TimeoutError):
+            pool.process("slow", "s1", timeout=0.1)
+        assert pool.process("after", "s1", timeout=10)["text"] == "after"
+        workers = pool.stats()["workers"]
+        assert workers[pool.worker_of("s1")]["restarts"] == 1 and all(w["alive"] for w in workers)
+    finally:
+        pool.close()
+
+
+def test_killed_worker_does_not_block_the_others():
+    pool = WorkerPool(2, _echo, threads=1)
+    try:
+        doomed = next(f"s{i}" for i in range(100) if pool.worker_of(f"s{i}") == 0)
+        other = next(f"s{i}" for i in range(100) if pool.worker_of(f"s{i}") == 1)
+        for _ in range(3):
+            big = [pool.submit("big", other) for _ in range(5)]
+            with pytest.raises(RuntimeError, match="exited"):
+                pool.process("kill", doomed, timeout=10)
+            assert all(len(future.result(timeout=10)) == 1 << 20 for future in big)
+        assert pool.process("hi", doomed, timeout=10)["text"] == "hi"
+        assert [w["restarts"] for w in pool.stats()["workers"]] == [3, 0]
+    finally:
+        pool.close()
+
+
+def test_initializer_runs_in_every_worker():
+    def handler(text, session_id):
+        return _worker_state.get("initialized_in") == os.getpid()
+
+    pool = WorkerPool(2, handler, threads=1, initializer=_init_worker)
+    try:
+        assert all(pool.process("hi", f"s{i}", timeout=10) for i in range(8))
+    finally:
+        pool.close()
+    assert "initialized_in" not in _worker_state
+
+
+def test_process_memory_reports_shared_pages():
+    memory = process_memory(os.getpid())
+    if memory["rss_mb"] is None:
+        pytest.skip("no /proc/<pid>/smaps_rollup")
+    assert 0 < memory["pss_mb"] <= memory["rss_mb"] and memory["private_mb"] <= memory["rss_mb"]
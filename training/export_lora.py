@@ -0,0 +1,128 @@
+"""Merge trained LoRA adapters into the base model and export an inference variant.
+
+run_small_finetune.py saves only the PEFT adapters. Serving the model with
+the adapters attached adds two small matmuls per adapted projection to every
+decode step; merging folds W + B @ A * scale into the base weights once, so
+the fine-tune decodes exactly as fast as the base model. The merged fp32
+model is then re-quantized (dynamic_int8 by default) and written as a
+load_model snapshot in VARIANTS_DIR/<name>, which inference can pick by name:
+
+  python -m training.export_lora --adapter training_out --name phase4
+  python -m training.export_lora --adapter phase1_out --name phase1 --compare
+  python -m inference.run_agent --variant phase4
+  CALC_VARIANT=phase4 python -m inference.server
+
+--compare reports decode tokens/sec with the adapters unmerged, merged
+(fp32) and as the exported variant.
+
+The adapters are merged into the fp32 base, not the 8-bit bitsandbytes model
+they were trained against: merging into int8 weights would round the update
+away, and the base must be full precision to be re-quantized afterwards.
+"""
+
+import argparse
+import json
+import os
+import time
+
+from inference.load_model import MODEL_ID, load_variant, quantize_dynamic_int8, save_snapshot, variant_path
+
+EXPORT_BACKENDS = ("dynamic_int8", "fp32")
+
+
+def adapter_base(adapter_dir):
+    """The base model an adapter directory was trained on (adapter_config.json)."""
+    path = os.path.join(adapter_dir, "adapter_config.json")
+    if not os.path.isfile(path):
+        raise ValueError(f"No adapter_config.json in {adapter_dir}; is it a PEFT output directory?")
+    with open(path) as f:
+        return json.load(f).get("base_model_name_or_path")
+
+
+def load_with_adapter(adapter_dir):
+    """The fp32 base model with the adapters of ``adapter_dir`` attached (not merged)."""
+    import torch
+    from peft import PeftModel
+    from transformers import AutoModelForCausalLM
+
+    base = adapter_base(adapter_dir)
+    if base not in (None, MODEL_ID):
+        # variants must share MODEL_ID's tokenizer to be hot-swappable
+        raise ValueError(f"Adapter {adapter_dir} was trained on {base}, not {MODEL_ID}")
+    model = AutoModelForCausalLM.from_pretrained(MODEL_ID, torch_dtype=torch.float32)
+    model = PeftModel.from_pretrained(model, adapter_dir)
+    model.eval()
+    return model
+
+
+def merge_adapter(model):
+    """Fold the adapters of a PeftModel into its base weights; returns the plain model."""
+    merged = model.merge_and_unload()
+    merged.eval()
+    return merged
+
+
+def decode_tokens_per_sec(tokenizer, model, new_tokens=32, repeat=3):
+    """Greedy decode speed on a fixed prompt (one warm-up run first)."""
+    import torch
+    from inference.prompt_builder import build_prompt
+
+    inputs = tokenizer(build_prompt("What is 7 and 9?"), return_tensors="pt").to(model.device)
+    settings = dict(max_new_tokens=new_tokens, min_new_tokens=new_tokens, do_sample=False)
+    with torch.no_grad():
+        model.generate(**inputs, **settings)
+        start = time.perf_counter()
+        for _ in range(repeat):
+            model.generate(**inputs, **settings)
+        elapsed = time.perf_counter() - start
+    return new_tokens * repeat / elapsed
+
+
+def export_variant(adapter_dir, name, backend="dynamic_int8", compare=False, new_tokens=32):
+    """Merge, re-quantize and save ``adapter_dir`` as variant ``name``; returns a report."""
+    from transformers import AutoTokenizer
+
+    if backend not in EXPORT_BACKENDS:
+        raise ValueError(f"Variants are exported as {' or '.join(EXPORT_BACKENDS)}, not {backend!r}")
+    path = variant_path(name)
+    tokenizer = AutoTokenizer.from_pretrained(MODEL_ID)
+    report = {"variant": name, "path": path, "backend": backend}
+
+    model = load_with_adapter(adapter_dir)
+    if compare:
+        report["unmerged_tokens_per_sec"] = decode_tokens_per_sec(tokenizer, model, new_tokens)
+    start = time.perf_counter()
+    model = merge_adapter(model)
+    report["merge_seconds"] = time.perf_counter() - start
+    if compare:
+        report["merged_fp32_tokens_per_sec"] = decode_tokens_per_sec(tokenizer, model, new_tokens)
+    if backend == "dynamic_int8":
+        model = quantize_dynamic_int8(model)
+    model.inference_backend = backend
+    save_snapshot(tokenizer, model, path,
+                  info={"variant": name, "adapter": os.path.abspath(adapter_dir), "merged": True})
+    if compare:
+        _, exported = load_variant(name, tokenizer)
+        report["exported_tokens_per_sec"] = decode_tokens_per_sec(tokenizer, exported, new_tokens)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--adapter', required=True, help='run_small_finetune output directory')
+    parser.add_argument('--name', required=True, help='variant name, e.g. phase4')
+    parser.add_argument('--backend', default='dynamic_int8', choices=EXPORT_BACKENDS)
+    parser.add_argument('--compare', action='store_true', help='measure decode tokens/s unmerged vs merged')
+    parser.add_argument('--new_tokens', type=int, default=32)
+    args = parser.parse_args()
+
+    report = export_variant(args.adapter, args.name, args.backend, args.compare, args.new_tokens)
+    print(f"Exported variant {report['variant']} ({report['backend']}) to {report['path']}; "
+          f"merged in {report['merge_seconds']:.1f}s")
+    for key in ("unmerged_tokens_per_sec", "merged_fp32_tokens_per_sec", "exported_tokens_per_sec"):
+        if key in report:
+            print(f"  {key.replace('_tokens_per_sec', ''):12s} {report[key]:8.1f} tokens/s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,323 @@
+"""Pre-tokenized, packed training data with the loss on the tool_calls only.
+
+run_small_finetune used to rebuild and re-tokenize every example on each
+run and train on one short, separately padded example per step, with the
+loss over the prompt as well. This module instead
+
+  - tokenizes the corpus once into a cache directory of flat memory-mapped
+    arrays (token ids, a per-token "is target" flag, example offsets), keyed
+    by the tokenizer, TEMPLATE_VERSION and the dataset file, so later runs
+    only map the files
+  - packs consecutive examples into sequences of at most ``block_size``
+    tokens; position ids restart at every example and collate_packed()
+    builds a block-diagonal causal attention mask, so packed examples never
+    attend to each other
+  - sets the labels of the prompt ("User: ...\\nAssistant:") to -100, so
+    only the " {tool_calls JSON}\\n" + EOS span is learned
+
+  cache = TokenCache.build_or_load(tokenizer, "calculator_dataset.jsonl", "training/cache")
+  dataset = PackedDataset(cache, block_size=512)
+  trainer = Trainer(..., train_dataset=dataset, data_collator=collate_packed)
+
+  python -m training.packing --dataset calculator_dataset.jsonl --block_size 512 --batch_size 8
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+
+# bump when the text format below (or how it is tokenized) changes
+TEMPLATE_VERSION = 1
+
+PROMPT_FORMAT = "User: {user}\nAssistant:"
+TARGET_FORMAT = " {calls}\n"
+
+_TOKENS = "tokens.bin"     # int32 token ids of all examples back to back
+_TARGETS = "targets.bin"   # uint8, 1 where the token is part of the target
+_OFFSETS = "offsets.bin"   # int64, example i is tokens[offsets[i]:offsets[i + 1]]
+_META = "meta.json"
+
+
+def example_texts(example):
+    """(prompt, target) text of one {"user", "tool_calls"} example."""
+    calls = json.dumps(example.get("tool_calls", []), separators=(",", ":"))
+    return PROMPT_FORMAT.format(user=example.get("user", "")), TARGET_FORMAT.format(calls=calls)
+
+
+def encode_examples(tokenizer, examples):
+    """[(int32 token ids, uint8 target flags)] for a batch of examples.
+
+    The prompt is tokenized with special tokens (BOS), the target without,
+    and EOS is appended to the target.
+    """
+    texts = [example_texts(example) for example in examples]
+    prompts = tokenizer([p for p, _ in texts], add_special_tokens=True)["input_ids"]
+    answers = tokenizer([t for _, t in texts], add_special_tokens=False)["input_ids"]
+    eos = getattr(tokenizer, "eos_token_id", None)
+    out = []
+    for prompt, answer in zip(prompts, answers):
+        answer = list(answer) + ([eos] if eos is not None else [])
+        ids = np.asarray(list(prompt) + answer, np.int32)
+        flags = np.concatenate([np.zeros(len(prompt), np.uint8), np.ones(len(answer), np.uint8)])
+        out.append((ids, flags))
+    return out
+
+
+def packed_item(pieces, block_size):
+    """One PackedDataset item from consecutive (ids, flags) examples."""
+    ids = np.concatenate([p[0] for p in pieces])[:block_size].astype(np.int64)
+    flags = np.concatenate([p[1] for p in pieces])[:block_size]
+    positions = np.concatenate([np.arange(len(p[0])) for p in pieces])[:block_size]
+    labels = np.where(flags == 1, ids, -100)
+    return {"input_ids": ids.tolist(), "labels": labels.tolist(), "position_ids": positions.tolist()}
+
+
+def tokenizer_fingerprint(tokenizer):
+    """What the token ids depend on: tokenizer identity, vocabulary and a probe encoding."""
+    probe = tokenizer(["User: Add twenty-one and 3.5\nAssistant:"], add_special_tokens=True)["input_ids"][0]
+    parts = [type(tokenizer).__name__, getattr(tokenizer, "name_or_path", ""),
+             len(tokenizer.get_vocab()), getattr(tokenizer, "eos_token_id", None), list(probe)]
+    return hashlib.sha1(json.dumps(parts, default=str).encode()).hexdigest()[:16]
+
+
+def cache_key(tokenizer, dataset_path):
+    """Cache directory name for ``dataset_path`` tokenized by ``tokenizer``."""
+    stat = os.stat(dataset_path)
+    source = json.dumps([os.path.abspath(dataset_path), stat.st_size, stat.st_mtime_ns])
+    digest = hashlib.sha1(source.encode()).hexdigest()[:12]
+    return f"v{TEMPLATE_VERSION}-{tokenizer_fingerprint(tokenizer)}-{digest}"
+
+
+def read_examples(dataset_path, split="train"):
+    """Examples of a JSONL(.gz) file or of one split of a .sqlite store."""
+    from data.dataset_store import DatasetStore, read_jsonl
+
+    if str(dataset_path).endswith((".sqlite", ".db")):
+        store = DatasetStore(dataset_path)
+        try:
+            yield from store.iter_examples(split=split)
+        finally:
+            store.close()
+    else:
+        yield from read_jsonl(dataset_path)
+
+
+class TokenCache:
+    """
+    Tokenized examples in memory-mapped files.
+
+      - TokenCache.build(tokenizer, examples, path)     # tokenize once
+      - TokenCache.build_or_load(tokenizer, dataset_path, cache_root)
+      - len(cache), cache.example(i)   # (token ids, target flags) arrays
+      - cache.lengths                  # tokens per example
+      - cache.meta                     # counts and build tokens/sec
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, _META)) as f:
+            self.meta = json.load(f)
+        self.tokens = _map(path, _TOKENS, np.int32)
+        self.targets = _map(path, _TARGETS, np.uint8)
+        self.offsets = _map(path, _OFFSETS, np.int64)
+        self.lengths = np.diff(self.offsets)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def example(self, i):
+        start, end = self.offsets[i], self.offsets[i + 1]
+        return self.tokens[start:end], self.targets[start:end]
+
+    @classmethod
+    def build(cls, tokenizer, examples, path, batch_size=1024):
+        """Tokenize ``examples`` into a new cache at ``path``.
+
+        Files are written to ``path``.tmp and renamed when complete, so an
+        interrupted build never leaves a cache that looks valid.
+        """
+        start = time.perf_counter()
+        tmp = path + ".tmp"
+        shutil.rmtree(tmp, ignore_errors=True)
+        os.makedirs(tmp)
+        count = total = target_tokens = 0
+        with open(os.path.join(tmp, _TOKENS), "wb") as tokens, \
+                open(os.path.join(tmp, _TARGETS), "wb") as targets, \
+                open(os.path.join(tmp, _OFFSETS), "wb") as offsets:
+            offsets.write(np.zeros(1, np.int64).tobytes())
+            for batch in _batches(examples, batch_size):
+                ends = []
+                for ids, flags in encode_examples(tokenizer, batch):
+                    tokens.write(ids.tobytes())
+                    targets.write(flags.tobytes())
+                    total += len(ids)
+                    target_tokens += int(flags.sum())
+                    ends.append(total)
+                offsets.write(np.asarray(ends, np.int64).tobytes())
+                count += len(batch)
+        seconds = time.perf_counter() - start
+        meta = {"template_version": TEMPLATE_VERSION, "examples": count, "tokens": total,
+                "target_tokens": target_tokens, "build_seconds": seconds,
+                "tokens_per_sec": total / seconds if seconds else 0.0}
+        with open(os.path.join(tmp, _META), "w") as f:
+            json.dump(meta, f, indent=1)
+        shutil.rmtree(path, ignore_errors=True)
+        os.replace(tmp, path)
+        return cls(path)
+
+    @classmethod
+    def build_or_load(cls, tokenizer, dataset_path, cache_root, split="train"):
+        path = os.path.join(cache_root, cache_key(tokenizer, dataset_path) + f"-{split}")
+        if os.path.isfile(os.path.join(path, _META)):
+            return cls(path)
+        os.makedirs(cache_root, exist_ok=True)
+        return cls.build(tokenizer, read_examples(dataset_path, split), path)
+
+
+def pack(lengths, block_size):
+    """Group consecutive examples into blocks of at most ``block_size`` tokens.
+
+    Returns an int64 array of block boundaries in example indices: block j
+    holds examples ``bounds[j]:bounds[j + 1]``. An example longer than
+    ``block_size`` gets a block of its own (and is truncated).
+    """
+    bounds = [0]
+    used = 0
+    for i, length in enumerate(lengths):
+        if used and used + length > block_size:
+            bounds.append(i)
+            used = 0
+        used += length
+    if len(lengths):
+        bounds.append(len(lengths))
+    return np.asarray(bounds, np.int64)
+
+
+def padding_report(lengths, block_size, batch_size):
+    """Padding fraction and optimizer steps per epoch, unpacked versus packed.
+
+    Unpacked: batches of ``batch_size`` consecutive examples padded to their
+    longest. Packed: blocks from pack(), each padded to ``block_size``.
+    """
+    lengths = np.minimum(np.asarray(lengths, np.int64), block_size)
+    real = int(lengths.sum())
+    n = len(lengths)
+    padded = sum(int(lengths[i:i + batch_size].max()) * len(lengths[i:i + batch_size])
+                 for i in range(0, n, batch_size))
+    blocks = len(pack(lengths, block_size)) - 1
+    return {
+        "examples": n,
+        "tokens": real,
+        "unpacked_padding": 1 - real / padded if padded else 0.0,
+        "unpacked_steps": -(-n // batch_size),
+        "packed_blocks": blocks,
+        "packed_padding": 1 - real / (blocks * block_size) if blocks else 0.0,
+        "packed_steps": -(-blocks // batch_size),
+    }
+
+
+class PackedDataset:
+    """
+    Map-style dataset of packed blocks over a TokenCache.
+
+    Each item is ``{"input_ids", "labels", "position_ids"}`` (lists, not
+    padded); labels are -100 outside the target spans. Use collate_packed
+    as the data collator.
+    """
+
+    def __init__(self, cache, block_size=512):
+        self.cache = cache
+        self.block_size = block_size
+        self.bounds = pack(cache.lengths, block_size)
+
+    def __len__(self):
+        return len(self.bounds) - 1
+
+    def __getitem__(self, index):
+        first, last = self.bounds[index], self.bounds[index + 1]
+        return packed_item([self.cache.example(i) for i in range(first, last)], self.block_size)
+
+
+def collate_packed(features, pad_token_id=0):
+    """Pad a batch of PackedDataset items and build their attention masks.
+
+    The mask is 4D, (batch, 1, length, length), 0.0 where a token may attend
+    and the dtype minimum elsewhere: causal, and only within its own example
+    (a new example starts wherever position_ids goes back to 0). Padding
+    attends nowhere and has label -100.
+    """
+    import torch
+
+    length = max(len(f["input_ids"]) for f in features)
+    batch = len(features)
+    input_ids = torch.full((batch, length), pad_token_id, dtype=torch.long)
+    labels = torch.full((batch, length), -100, dtype=torch.long)
+    position_ids = torch.zeros((batch, length), dtype=torch.long)
+    allowed = torch.zeros((batch, length, length), dtype=torch.bool)
+    causal = torch.ones((length, length), dtype=torch.bool).tril()
+    for row, feature in enumerate(features):
+        n = len(feature["input_ids"])
+        input_ids[row, :n] = torch.tensor(feature["input_ids"])
+        labels[row, :n] = torch.tensor(feature["labels"])
+        positions = torch.tensor(feature["position_ids"])
+        position_ids[row, :n] = positions
+        segments = torch.cumsum(positions == 0, dim=0)
+        allowed[row, :n, :n] = (segments[:, None] == segments[None, :]) & causal[:n, :n]
+        # padding rows still attend to themselves so softmax stays finite
+        allowed[row, n:, n:] = torch.eye(length - n, dtype=torch.bool)
+    mask = torch.zeros((batch, 1, length, length), dtype=torch.float32)
+    mask.masked_fill_(~allowed[:, None], torch.finfo(torch.float32).min)
+    return {"input_ids": input_ids, "labels": labels, "position_ids": position_ids, "attention_mask": mask}
+
+
+# Internal helpers (non-public) -------------------------------------
+
+def _map(path, name, dtype):
+    full = os.path.join(path, name)
+    if os.path.getsize(full) == 0:
+        return np.zeros(0, dtype)
+    return np.memmap(full, dtype=dtype, mode="r")
+
+
+def _batches(examples, size):
+    batch = []
+    for example in examples:
+        batch.append(example)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--model_id', default='google/functiongemma-270m-it')
+    parser.add_argument('--dataset', default='calculator_dataset.jsonl')
+    parser.add_argument('--split', default='train', help='split to use when --dataset is .sqlite')
+    parser.add_argument('--cache_dir', default='training/cache')
+    parser.add_argument('--block_size', type=int, default=512)
+    parser.add_argument('--batch_size', type=int, default=1, help='per-device batch size to compare steps at')
+    args = parser.parse_args()
+
+    from transformers import AutoTokenizer
+
+    tokenizer = AutoTokenizer.from_pretrained(args.model_id)
+    start = time.perf_counter()
+    cache = TokenCache.build_or_load(tokenizer, args.dataset, args.cache_dir, args.split)
+    print(f"Cache {cache.path}: {len(cache)} examples, {cache.meta['tokens']} tokens "
+          f"({cache.meta['target_tokens']} in targets); tokenized at {cache.meta['tokens_per_sec']:,.0f} tokens/s, "
+          f"ready in {time.perf_counter() - start:.2f}s")
+    report = padding_report(cache.lengths, args.block_size, args.batch_size)
+    print(f"unpacked: padding {report['unpacked_padding']:.1%}, {report['unpacked_steps']} steps/epoch")
+    print(f"packed:   padding {report['packed_padding']:.1%}, {report['packed_steps']} steps/epoch "
+          f"({report['packed_blocks']} blocks of {args.block_size})")
+
+
+if __name__ == '__main__':
+    main()
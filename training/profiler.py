@@ -0,0 +1,267 @@
+"""Where the time and memory of a fine-tuning run go.
+
+The Trainer only logs the loss every ``logging_steps``. StepProfiler
+records every optimizer step instead, split into
+
+  data        previous step end -> first forward of this step (loading, collation)
+  forward     inside model.forward (a forward pre/post hook on the model)
+  backward    forward end -> optimizer (and between gradient-accumulation micro-batches)
+  optimizer   optimizer.step() (on_pre_optimizer_step -> on_optimizer_step)
+
+with the input tokens of each step, and reports per-phase mean/p50/p95,
+tokens/sec, the peak resident memory (and peak CUDA memory when training on
+a GPU) and trainable (LoRA) versus total parameter counts. Optionally a
+torch.profiler trace of a window of steps is written for TensorBoard or
+chrome://tracing. With a transformers version that has no
+on_pre_optimizer_step, optimizer time is counted in backward.
+
+  profiler = StepProfiler(report_path="training_out/profile.json", trace_steps=(5, 8))
+  trainer = Trainer(..., callbacks=[profiler_callback(profiler)])
+  trainer.train()            # the summary is printed and written at the end
+
+or ``python -m training.run_small_finetune --profile --profile_trace 5:8``.
+"""
+
+import json
+import resource
+import sys
+import time
+
+PHASES = ("data", "forward", "backward", "optimizer")
+
+
+def count_parameters(model):
+    """Total and trainable parameter counts (trainable is the LoRA adapters under PEFT)."""
+    total = trainable = 0
+    for parameter in model.parameters():
+        total += parameter.numel()
+        if parameter.requires_grad:
+            trainable += parameter.numel()
+    return {"total": total, "trainable": trainable,
+            "trainable_fraction": trainable / total if total else 0.0}
+
+
+def parse_steps(text):
+    """(first, last) optimizer steps from "5:8" or "5"."""
+    first, _, last = text.partition(":")
+    first, last = int(first), int(last or first)
+    if first < 1 or last < first:
+        raise ValueError(f"Bad step window {text!r}; expected FIRST[:LAST] with 1 <= FIRST <= LAST")
+    return first, last
+
+
+class StepProfiler:
+    """
+    Per-step timing, throughput and memory of a training run.
+
+      - attach(model)                   # count parameters, hook model.forward
+      - forward_begin(tokens), forward_end()
+      - optimizer_begin(), optimizer_end()
+      - step_end()                      # close the step's record
+      - finish()                        # summary(), also written to report_path
+      - steps                           # one dict per step, times in seconds
+    """
+
+    def __init__(self, report_path=None, trace_steps=None, trace_dir="training_out/trace", skip_steps=1):
+        self.report_path = report_path
+        self.trace_steps = trace_steps
+        self.trace_dir = trace_dir
+        self.skip_steps = skip_steps   # first steps left out of the timings (lazy init, allocator warm-up)
+        self.steps = []
+        self.parameters = None
+        self._hooks = []
+        self._trace = None
+        self._reset(time.perf_counter())
+
+    def attach(self, model):
+        self.parameters = count_parameters(model)
+        if hasattr(model, "register_forward_pre_hook"):
+            self._hooks = [model.register_forward_pre_hook(self._pre_hook, with_kwargs=True),
+                           model.register_forward_hook(self._post_hook)]
+        if self.trace_steps:
+            self._trace = _start_trace(self.trace_steps, self.trace_dir)
+        self._reset(time.perf_counter())
+
+    def forward_begin(self, tokens=0):
+        now = _now()
+        if self._forward_end is None:
+            self._current["data"] += now - self._last
+        else:  # next micro-batch of a gradient-accumulation step
+            self._current["backward"] += now - self._forward_end
+        self._current["tokens"] += tokens
+        self._forward_start = now
+
+    def forward_end(self):
+        now = _now()
+        if self._forward_start is not None:
+            self._current["forward"] += now - self._forward_start
+        self._forward_start, self._forward_end = None, now
+
+    def optimizer_begin(self):
+        now = _now()
+        self._close_backward(now)
+        self._optimizer_start = now
+
+    def optimizer_end(self):
+        if self._optimizer_start is not None:
+            self._current["optimizer"] += _now() - self._optimizer_start
+            self._optimizer_start = None
+
+    def step_end(self):
+        now = _now()
+        self._close_backward(now)
+        self._current["total"] = now - self._last
+        self._current["peak_rss"] = peak_rss_bytes()
+        self.steps.append(self._current)
+        if self._trace is not None:
+            self._trace.step()
+        self._reset(now)
+
+    def summary(self):
+        steps = self.steps[self.skip_steps:] or self.steps
+        total = sum(step["total"] for step in steps)
+        tokens = sum(step["tokens"] for step in steps)
+        phases = {}
+        for phase in PHASES + ("total",):
+            values = sorted(step[phase] * 1e3 for step in steps)
+            phases[phase] = {
+                "mean_ms": sum(values) / len(values) if values else 0.0,
+                "p50_ms": _percentile(values, 0.50),
+                "p95_ms": _percentile(values, 0.95),
+                "share": sum(values) / 1e3 / total if total else 0.0,
+            }
+        summary = {
+            "steps": len(self.steps),
+            "timed_steps": len(steps),
+            "phases": phases,
+            "tokens_per_sec": tokens / total if total else 0.0,
+            "tokens_per_step": tokens / len(steps) if steps else 0.0,
+            "peak_rss_mb": peak_rss_bytes() / 2 ** 20,
+            "parameters": self.parameters,
+        }
+        cuda_peak = _cuda_peak_bytes()
+        if cuda_peak is not None:
+            summary["peak_cuda_mb"] = cuda_peak / 2 ** 20
+        return summary
+
+    def finish(self):
+        if self._trace is not None:
+            self._trace.stop()
+            self._trace = None
+        for hook in self._hooks:
+            hook.remove()
+        self._hooks = []
+        summary = self.summary()
+        if self.report_path:
+            with open(self.report_path, "w") as f:
+                json.dump({"summary": summary, "steps": self.steps}, f, indent=1)
+        return summary
+
+    # Internal helpers (non-public) -------------------------------------
+
+    def _reset(self, now):
+        self._last = now
+        self._current = dict.fromkeys(PHASES, 0.0)
+        self._current["tokens"] = 0
+        self._forward_start = self._forward_end = self._optimizer_start = None
+
+    def _close_backward(self, now):
+        if self._forward_end is not None:
+            self._current["backward"] += now - self._forward_end
+            self._forward_end = None
+
+    def _pre_hook(self, module, args, kwargs):
+        input_ids = kwargs.get("input_ids", args[0] if args else None)
+        self.forward_begin(input_ids.numel() if hasattr(input_ids, "numel") else 0)
+
+    def _post_hook(self, module, args, output):
+        self.forward_end()
+
+
+def profiler_callback(profiler):
+    """A transformers TrainerCallback feeding ``profiler``; prints its summary at the end."""
+    from transformers import TrainerCallback
+
+    class _ProfilerCallback(TrainerCallback):
+        def on_train_begin(self, args, state, control, model=None, **kwargs):
+            profiler.attach(model)
+
+        def on_pre_optimizer_step(self, args, state, control, **kwargs):
+            profiler.optimizer_begin()
+
+        def on_optimizer_step(self, args, state, control, **kwargs):
+            profiler.optimizer_end()
+
+        def on_step_end(self, args, state, control, **kwargs):
+            profiler.step_end()
+
+        def on_train_end(self, args, state, control, **kwargs):
+            print(format_summary(profiler.finish()))
+
+    return _ProfilerCallback()
+
+
+def format_summary(summary):
+    """The summary as a short text table."""
+    lines = [f"{summary['steps']} steps ({summary['timed_steps']} timed), "
+             f"{summary['tokens_per_sec']:,.0f} tokens/s, {summary['tokens_per_step']:,.0f} tokens/step, "
+             f"peak RSS {summary['peak_rss_mb']:,.0f} MB"
+             + (f", peak CUDA {summary['peak_cuda_mb']:,.0f} MB" if "peak_cuda_mb" in summary else "")]
+    for phase, row in summary["phases"].items():
+        lines.append(f"  {phase:9s} mean {row['mean_ms']:9.1f} ms  p50 {row['p50_ms']:9.1f} ms  "
+                     f"p95 {row['p95_ms']:9.1f} ms  {row['share']:6.1%}")
+    if summary["parameters"]:
+        p = summary["parameters"]
+        lines.append(f"  parameters: {p['trainable']:,} trainable of {p['total']:,} "
+                     f"({p['trainable_fraction']:.2%})")
+    return "\n".join(lines)
+
+
+def peak_rss_bytes():
+    """High-water mark of this process's resident memory."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+# Internal helpers (non-public) -------------------------------------
+
+def _now():
+    # CUDA kernels run asynchronously; wait for them so time lands in the right phase
+    torch = _torch()
+    if torch is not None and torch.cuda.is_available() and torch.cuda.is_initialized():
+        torch.cuda.synchronize()
+    return time.perf_counter()
+
+
+def _torch():
+    return sys.modules.get("torch")  # only if the training run already imported it
+
+
+def _cuda_peak_bytes():
+    torch = _torch()
+    if torch is not None and torch.cuda.is_available() and torch.cuda.is_initialized():
+        return torch.cuda.max_memory_allocated()
+    return None
+
+
+def _percentile(values, q):
+    return values[min(len(values) - 1, int(q * len(values)))] if values else 0.0
+
+
+def _start_trace(steps, trace_dir):
+    import torch
+
+    first, last = steps
+    activities = [torch.profiler.ProfilerActivity.CPU]
+    if torch.cuda.is_available():
+        activities.append(torch.profiler.ProfilerActivity.CUDA)
+    trace = torch.profiler.profile(
+        activities=activities,
+        # step() is called at each step end: skip to FIRST, warm up one step, record FIRST..LAST
+        schedule=torch.profiler.schedule(wait=max(first - 2, 0), warmup=1 if first > 1 else 0,
+                                         active=last - first + 1, repeat=1),
+        on_trace_ready=torch.profiler.tensorboard_trace_handler(trace_dir),
+        record_shapes=True,
+        profile_memory=True,
+    )
+    trace.start()
+    return trace
@@ -11,6 +11,33 @@ Example:
       --output_dir ./training_out \
       --epochs 1
 
+The dataset may also be a data/dataset_store.py SQLite file; its --split
+rows are streamed into the datasets cache instead of being read into memory.
+Run it as a module from the repository root so ``data`` is importable:
+
+  python -m training.run_small_finetune --dataset data/calculator.sqlite --split train
+
+With --packed the dataset is tokenized once into a memory-mapped cache,
+packed into --block_size sequences and the loss is limited to the
+tool_calls span (see training/packing.py):
+
+  python -m training.run_small_finetune --packed --per_device_train_batch_size 4
+
+With --stream no dataset file is read: examples are generated, tokenized and
+packed in background workers while training runs (training/streaming.py),
+a new deterministic set of --stream_examples per epoch. A stream has no
+length, so --max_steps is required:
+
+  python -m training.run_small_finetune --stream --stream_examples 50000 --max_steps 2000 \
+      --mix add=8,total=1,clear=1 --workers 2
+
+--profile records per-step data/forward/backward/optimizer time, tokens/s,
+peak memory and LoRA versus total parameters (training/profiler.py) and
+writes them to <output_dir>/profile.json; --profile_trace 5:8 also saves a
+torch profiler trace of steps 5 to 8:
+
+  python -m training.run_small_finetune --packed --profile --max_steps 30
+
 Note: This script does not push any changes or artifacts.
 """
 
@@ -55,6 +82,18 @@ def build_text_examples(examples):
     return texts
 
 
+def iter_store_texts(path, split):
+    """build_text_examples() over one split of a DatasetStore, streamed."""
+    from data.dataset_store import DatasetStore
+
+    store = DatasetStore(path)
+    try:
+        for example in store.iter_examples(split=split):
+            yield from build_text_examples([example])
+    finally:
+        store.close()
+
+
 def tokenize_function(examples, tokenizer, block_size=512):
     # Tokenize and concatenate prompt+target as single sequence for causal LM
     return tokenizer(examples['text'], truncation=True, max_length=block_size)
@@ -64,28 +103,66 @@ def main():
     parser = argparse.ArgumentParser()
     parser.add_argument('--model_id', default='google/functiongemma-270m-it')
     parser.add_argument('--dataset', default='../calculator_dataset.jsonl')
+    parser.add_argument('--split', default='train', help='split to train on when --dataset is .sqlite')
     parser.add_argument('--output_dir', default='./training_out')
     parser.add_argument('--per_device_train_batch_size', type=int, default=1)
     parser.add_argument('--epochs', type=int, default=1)
     parser.add_argument('--lr', type=float, default=5e-5)
     parser.add_argument('--block_size', type=int, default=512)
+    parser.add_argument('--packed', action='store_true',
+                        help='train on packed, pre-tokenized blocks with prompt tokens masked from the loss')
+    parser.add_argument('--cache_dir', default='training/cache', help='token cache location for --packed')
+    parser.add_argument('--stream', action='store_true',
+                        help='train on examples generated on the fly instead of --dataset')
+    parser.add_argument('--stream_examples', type=int, default=50000, help='generated examples per epoch')
+    parser.add_argument('--mix', default='add=1', help='template families for --stream, e.g. add=8,total=1')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workers', type=int, default=1, help='generator/tokenizer processes for --stream')
+    parser.add_argument('--max_steps', type=int, default=-1, help='required with --stream')
+    parser.add_argument('--profile', action='store_true', help='write a step-time/memory report to output_dir')
+    parser.add_argument('--profile_trace', default=None,
+                        help='FIRST:LAST steps to capture with torch.profiler (implies --profile)')
     args = parser.parse_args()
 
     data_path = Path(args.dataset).expanduser()
-    if not data_path.exists():
+    if args.stream:
+        if args.max_steps <= 0:
+            raise SystemExit("--stream needs --max_steps")
+    elif not data_path.exists():
         raise SystemExit(f"Dataset not found: {data_path}")
 
-    raw = load_jsonl(str(data_path))
-    texts = build_text_examples(raw)
-    ds = Dataset.from_list(texts)
-
     tokenizer = AutoTokenizer.from_pretrained(args.model_id)
     # Ensure tokenizer has pad token for batching
     if tokenizer.pad_token is None:
         tokenizer.pad_token = tokenizer.eos_token
 
-    tokenized = ds.map(lambda ex: tokenize_function(ex, tokenizer, args.block_size), batched=True, remove_columns=['text'])
-    tokenized.set_format(type='torch', columns=['input_ids', 'attention_mask'])
+    if args.stream:
+        from data.generate_dataset import parse_mix
+        from training.streaming import GeneratedStream, as_torch_dataset
+
+        stream = GeneratedStream(tokenizer, args.stream_examples, parse_mix(args.mix), args.seed,
+                                 args.workers, block_size=args.block_size)
+        tokenized = as_torch_dataset(stream)
+    elif args.packed:
+        from training.packing import PackedDataset, TokenCache, padding_report
+
+        cache = TokenCache.build_or_load(tokenizer, str(data_path), args.cache_dir, args.split)
+        tokenized = PackedDataset(cache, args.block_size)
+        report = padding_report(cache.lengths, args.block_size, args.per_device_train_batch_size)
+        print(f"Token cache {cache.path}: {cache.meta['tokens']} tokens, "
+              f"tokenized at {cache.meta['tokens_per_sec']:,.0f} tokens/s")
+        print(f"Padding {report['unpacked_padding']:.1%} over {report['unpacked_steps']} steps unpacked, "
+              f"{report['packed_padding']:.1%} over {report['packed_steps']} steps packed")
+    else:
+        if data_path.suffix in ('.sqlite', '.db'):
+            ds = Dataset.from_generator(iter_store_texts,
+                                        gen_kwargs={'path': str(data_path), 'split': args.split})
+        else:
+            raw = load_jsonl(str(data_path))
+            texts = build_text_examples(raw)
+            ds = Dataset.from_list(texts)
+        tokenized = ds.map(lambda ex: tokenize_function(ex, tokenizer, args.block_size), batched=True, remove_columns=['text'])
+        tokenized.set_format(type='torch', columns=['input_ids', 'attention_mask'])
 
     # Load model in 8-bit if possible to save memory
     bnb = BitsAndBytesConfig(load_in_8bit=True)
@@ -109,12 +186,19 @@ def main():
         print("Install peft and retry: pip install peft")
         raise
 
-    data_collator = DataCollatorForLanguageModeling(tokenizer=tokenizer, mlm=False)
+    if args.packed or args.stream:
+        from functools import partial
+        from training.packing import collate_packed
+
+        data_collator = partial(collate_packed, pad_token_id=tokenizer.pad_token_id)
+    else:
+        data_collator = DataCollatorForLanguageModeling(tokenizer=tokenizer, mlm=False)
 
     training_args = TrainingArguments(
         output_dir=args.output_dir,
         per_device_train_batch_size=args.per_device_train_batch_size,
         num_train_epochs=args.epochs,
+        max_steps=args.max_steps,
         learning_rate=args.lr,
         logging_steps=10,
         save_strategy='no',  # avoid saving for quick local runs unless desired
@@ -122,15 +206,32 @@ def main():
         remove_unused_columns=False,
     )
 
+    callbacks = []
+    if args.profile or args.profile_trace:
+        from training.profiler import StepProfiler, parse_steps, profiler_callback
+
+        os.makedirs(args.output_dir, exist_ok=True)
+        profiler = StepProfiler(
+            report_path=os.path.join(args.output_dir, 'profile.json'),
+            trace_steps=parse_steps(args.profile_trace) if args.profile_trace else None,
+            trace_dir=os.path.join(args.output_dir, 'trace'),
+        )
+        callbacks.append(profiler_callback(profiler))
+
     trainer = Trainer(
         model=model,
         args=training_args,
         train_dataset=tokenized,
         data_collator=data_collator,
+        callbacks=callbacks,
     )
 
     print("Starting training. This may take time depending on hardware.")
     trainer.train()
+    if args.stream:
+        stats = stream.stats()
+        print(f"Streamed {stats['examples']} examples ({stats['tokens']} tokens); "
+              f"training waited {stats['wait_seconds']:.1f}s for data")
     print("Training finished. Saving model to output_dir")
     trainer.save_model(args.output_dir)
 
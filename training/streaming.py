@@ -0,0 +1,201 @@
+"""Training examples generated on the fly instead of read from a corpus.
+
+data/generate_dataset.py can produce any number of examples, so for long
+runs there is no need to write, store and re-read a dataset file at all.
+GeneratedStream draws examples straight from its template families:
+
+  - worker processes generate and tokenize whole chunks
+    (generate_dataset.chunk_examples, then packing.encode_examples)
+  - a background thread collects the chunks in order into a bounded queue,
+    so generation overlaps the training steps and at most ``prefetch``
+    chunks are ever held in memory, however long the run
+  - the trainer's thread only packs encoded examples into ``block_size``
+    items, the same items as training/packing.py's PackedDataset (loss on
+    the tool_calls only), to be batched with packing.collate_packed
+
+Every epoch is a fixed, different sequence of examples: chunk ``i`` of
+epoch ``e`` is generated with Random(f"{seed}:{e}:{i}"), whatever the
+number of workers.
+
+  stream = GeneratedStream(tokenizer, examples_per_epoch=100_000, mix={"add": 8, "total": 1})
+  trainer = Trainer(..., train_dataset=as_torch_dataset(stream),
+                    data_collator=collate_packed, args=TrainingArguments(max_steps=..., ...))
+
+  python -m training.streaming --model_id google/functiongemma-270m-it --examples 20000 --workers 2
+"""
+
+import argparse
+import queue
+import threading
+import time
+
+from data.generate_dataset import DEFAULT_MIX, chunk_examples, parse_mix
+from training.packing import encode_examples, packed_item
+
+
+class GeneratedStream:
+    """
+    Packed training items generated, tokenized and prefetched in the background.
+
+      - iter(stream)          # the packed items of the current epoch
+      - set_epoch(epoch)      # choose the epoch (Trainer calls this)
+      - stats()               # examples, tokens, items, seconds waited on the queue
+    """
+
+    def __init__(self, tokenizer, examples_per_epoch, mix=None, seed=0, workers=1,
+                 prefetch=8, chunk_size=256, block_size=512):
+        if examples_per_epoch < 1 or prefetch < 1 or chunk_size < 1 or block_size < 1:
+            raise ValueError("examples_per_epoch, prefetch, chunk_size and block_size must be positive")
+        self.tokenizer = tokenizer
+        self.examples_per_epoch = examples_per_epoch
+        self.mix = mix or DEFAULT_MIX
+        self.seed = seed
+        self.workers = workers
+        self.prefetch = prefetch
+        self.chunk_size = chunk_size
+        self.block_size = block_size
+        self.epoch = 0
+        self._stats = {"examples": 0, "tokens": 0, "items": 0, "wait_seconds": 0.0}
+
+    def set_epoch(self, epoch):
+        self.epoch = epoch
+
+    def stats(self):
+        return dict(self._stats)
+
+    def __iter__(self):
+        epoch, self.epoch = self.epoch, self.epoch + 1
+        chunks = queue.Queue(self.prefetch)
+        stop = threading.Event()
+        feeder = threading.Thread(target=self._feed, args=(epoch, chunks, stop), daemon=True)
+        feeder.start()
+        try:
+            pieces, length = [], 0
+            while True:
+                start = time.perf_counter()
+                chunk = chunks.get()
+                self._stats["wait_seconds"] += time.perf_counter() - start
+                if isinstance(chunk, BaseException):
+                    raise chunk
+                if chunk is None:
+                    break
+                self._stats["examples"] += len(chunk)
+                for ids, flags in chunk:
+                    self._stats["tokens"] += len(ids)
+                    if pieces and length + len(ids) > self.block_size:
+                        self._stats["items"] += 1
+                        yield packed_item(pieces, self.block_size)
+                        pieces, length = [], 0
+                    pieces.append((ids, flags))
+                    length += len(ids)
+            if pieces:
+                self._stats["items"] += 1
+                yield packed_item(pieces, self.block_size)
+        finally:
+            stop.set()
+            feeder.join()
+
+    # Internal helpers (non-public) -------------------------------------
+
+    def _tasks(self, epoch):
+        for index, start in enumerate(range(0, self.examples_per_epoch, self.chunk_size)):
+            size = min(self.chunk_size, self.examples_per_epoch - start)
+            yield (f"{self.seed}:{epoch}", index, size, self.mix)
+
+    def _feed(self, epoch, chunks, stop):
+        def put(item):
+            # blocks while the queue is full, but gives up once the consumer is gone
+            while not stop.is_set():
+                try:
+                    chunks.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    pass
+            return False
+
+        try:
+            for chunk in self._encoded_chunks(epoch):
+                if not put(chunk):
+                    return
+            put(None)
+        except BaseException as exc:  # re-raised in the consumer's thread
+            put(exc)
+
+    def _encoded_chunks(self, epoch):
+        if self.workers <= 1:
+            for task in self._tasks(epoch):
+                yield _encode_chunk(task, self.tokenizer)
+            return
+
+        import multiprocessing
+        from collections import deque
+
+        with multiprocessing.Pool(self.workers, initializer=_set_tokenizer,
+                                  initargs=(self.tokenizer,)) as pool:
+            pending = deque()
+            for task in self._tasks(epoch):
+                pending.append(pool.apply_async(_encode_chunk, (task,)))
+                if len(pending) >= 2 * self.workers:
+                    yield pending.popleft().get()
+            while pending:
+                yield pending.popleft().get()
+
+
+def as_torch_dataset(stream):
+    """Wrap a GeneratedStream in a torch IterableDataset for Trainer (needs max_steps)."""
+    from torch.utils.data import IterableDataset
+
+    class _Stream(IterableDataset):
+        def __iter__(self):
+            return iter(stream)
+
+        def set_epoch(self, epoch):
+            stream.set_epoch(epoch)
+
+    return _Stream()
+
+
+# Internal helpers (non-public) -------------------------------------
+
+_tokenizer = None
+
+
+def _set_tokenizer(tokenizer):
+    global _tokenizer
+    _tokenizer = tokenizer
+
+
+def _encode_chunk(task, tokenizer=None):
+    seed, index, size, mix = task
+    return encode_examples(tokenizer or _tokenizer, list(chunk_examples(seed, index, size, mix)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure how fast training items can be streamed")
+    parser.add_argument('--model_id', default='google/functiongemma-270m-it')
+    parser.add_argument('--examples', type=int, default=20000, help='examples per epoch')
+    parser.add_argument('--mix', default='add=1', help='template families, e.g. add=8,total=1,clear=1')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--prefetch', type=int, default=8, help='encoded chunks buffered ahead')
+    parser.add_argument('--chunk_size', type=int, default=256)
+    parser.add_argument('--block_size', type=int, default=512)
+    args = parser.parse_args()
+
+    from transformers import AutoTokenizer
+
+    tokenizer = AutoTokenizer.from_pretrained(args.model_id)
+    stream = GeneratedStream(tokenizer, args.examples, parse_mix(args.mix), args.seed, args.workers,
+                             args.prefetch, args.chunk_size, args.block_size)
+    start = time.perf_counter()
+    for _ in stream:
+        pass
+    seconds = time.perf_counter() - start
+    stats = stream.stats()
+    print(f"{stats['examples']} examples, {stats['tokens']} tokens in {stats['items']} items, "
+          f"{seconds:.2f}s ({stats['tokens'] / seconds:,.0f} tokens/s), "
+          f"waited {stats['wait_seconds']:.2f}s on the queue")
+
+
+if __name__ == '__main__':
+    main()